@@ -0,0 +1,60 @@
+"""
+Benchmark of get_product_assembly_summary: filtering its result afterwards,
+as the summary dialog used to, against passing the filters as parameters.
+
+    python bench/assembly_summary.py [--dsn URL] [--repeat 10]
+
+Run it against a database loaded at a realistic `assembly` size, e.g. by bench/generate_data.py.
+"""
+import argparse
+
+from psycopg import sql
+
+from common import connect, time_query, summarize
+
+LEVELS = [None, 'enterprise_total', 'workshop_by_category', 'section_by_category']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dsn')
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    with connect(args.dsn) as conn, conn.cursor() as cur:
+        cur.execute("SELECT min(end_date), max(end_date) FROM products")
+        start, end = cur.fetchone()
+        cur.execute("SELECT count(*) FROM assembly")
+        print(f"assembly rows: {cur.fetchone()[0]}, products completed {start} .. {end}")
+        cur.execute("SELECT w.name, min(s.name) FROM workshops w JOIN sections s ON s.workshop_id = w.wsh_id "
+                    "GROUP BY w.name ORDER BY w.name LIMIT 1")
+        workshop, section = cur.fetchone() or (None, None)
+
+        cases = []
+        for level in LEVELS:
+            cases.append({'agg_level': level})
+            cases.append({'agg_level': level, 'workshop': workshop})
+        cases.append({'agg_level': None, 'workshop': workshop, 'section': section})
+
+        print(f"{'filters':<60} {'post-filter p50':>16} {'pushdown p50':>14} {'speedup':>8}")
+        for filters in cases:
+            filters = {k: v for k, v in filters.items() if v is not None}
+            where = sql.SQL(' AND ').join(sql.SQL("{} = %s").format(sql.Identifier(k)) for k in filters)
+            post_filter = sql.SQL("SELECT * FROM get_product_assembly_summary(%s, %s)")
+            if filters:
+                post_filter = sql.SQL("{} WHERE {}").format(post_filter, where)
+            pushdown = sql.SQL("SELECT * FROM get_product_assembly_summary(p_start_date => %s, p_end_date => %s{})").format(
+                sql.SQL('').join(sql.SQL(", {} => %s").format(sql.Identifier('p_' + k)) for k in filters)
+            )
+            params = [start, end, *filters.values()]
+            # the function's filter parameters are arrays
+            pushdown_params = [start, end, *([v] for v in filters.values())]
+            before = summarize(time_query(cur, post_filter, params, args.repeat))
+            after = summarize(time_query(cur, pushdown, pushdown_params, args.repeat))
+            label = ', '.join(f"{k}={v}" for k, v in filters.items()) or '(none)'
+            print(f"{label:<60} {before['p50_ms']:>13.1f} ms {after['p50_ms']:>11.1f} ms "
+                  f"{before['p50_ms'] / max(after['p50_ms'], 1e-6):>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
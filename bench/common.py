@@ -0,0 +1,77 @@
+"""Helpers shared by the database benchmarks in this directory."""
+import os
+import statistics
+import sys
+import time
+
+import psycopg
+from psycopg import sql
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from config import DSN_ADMIN  # noqa: E402
+
+
+def connect(dsn=None, **kwargs):
+    """Connection to the benchmark database: --dsn, else BENCH_DATABASE_URL, else the admin DSN."""
+    dsn = dsn or os.getenv('BENCH_DATABASE_URL') or DSN_ADMIN
+    if not dsn:
+        sys.exit('No database: pass --dsn or set BENCH_DATABASE_URL / ADMIN_DATABASE_URL')
+    return psycopg.connect(dsn, autocommit=True, **kwargs)
+
+
+def time_query(cur, query, params=None, repeat=5, warmup=1):
+    """Milliseconds of each of `repeat` runs of a query, rows fetched included, after `warmup` runs."""
+    timings = []
+    for i in range(warmup + repeat):
+        started = time.perf_counter()
+        cur.execute(query, params)
+        if cur.description is not None:
+            cur.fetchall()
+        if i >= warmup:
+            timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))]
+
+
+def summarize(timings):
+    return {
+        'p50_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'min_ms': round(min(timings), 3),
+    }
+
+
+def explain(cur, query, params=None) -> dict:
+    """Top plan node of EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) for a query, with its timing fields."""
+    cur.execute(sql.SQL("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {}").format(
+        sql.SQL(query) if isinstance(query, str) else query
+    ), params)
+    return cur.fetchone()[0][0]
+
+
+def plan_nodes(node):
+    """Yield every node of a JSON plan tree, depth first."""
+    yield node
+    for child in node.get('Plans', []):
+        yield from plan_nodes(child)
+
+
+def plan_shape(plan) -> list[str]:
+    """Scans and joins of a plan, e.g. ['Hash Join', 'Seq Scan on assembly', 'Index Scan on products']."""
+    shape = []
+    for node in plan_nodes(plan['Plan']):
+        if 'Scan' in node['Node Type'] or 'Join' in node['Node Type'] or node['Node Type'] == 'Nested Loop':
+            relation = node.get('Relation Name')
+            shape.append(f"{node['Node Type']} on {relation}" if relation else node['Node Type'])
+    return shape
+
+
+def plan_buffers(plan) -> dict:
+    """Shared buffers hit and read by a whole plan, as EXPLAIN (ANALYZE, BUFFERS) sums them at the top node."""
+    top = plan['Plan']
+    return {'shared_hit': top.get('Shared Hit Blocks', 0), 'shared_read': top.get('Shared Read Blocks', 0)}
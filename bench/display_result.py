@@ -0,0 +1,91 @@
+"""
+Micro-benchmark of turning fetched rows into ui.table rows (ui_common.prepare_rows).
+
+Compares the previous per-cell loop with the current path on the same tuple rows, with and
+without an array column. The dict_row case includes building the dicts, as
+psycopg.rows.dict_row does while fetching (dict(zip(names, values)) per row), so it is the
+cost of fetching with dict_row and preparing, not of preparing dicts that are already there.
+No database is needed:
+
+    python bench/display_result.py --rows 100000
+"""
+import argparse
+import datetime
+import gc
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from ui_common import prepare_rows  # noqa: E402
+
+COLS = ['p_id', 'name', 'category', 'start_date', 'end_date', 'workshop', 'products']
+
+
+def legacy_prepare_rows(cols, data):
+    prepared_rows = []
+    for row_tuple in data:
+        row_dict = {}
+        for i, col_name in enumerate(cols):
+            cell_value = row_tuple[i]
+            if isinstance(cell_value, list):
+                row_dict[col_name] = ', '.join(map(str, cell_value))
+            else:
+                row_dict[col_name] = cell_value
+        prepared_rows.append(row_dict)
+    return prepared_rows
+
+
+def make_rows(n, with_array):
+    start = datetime.date(2024, 1, 1)
+    return [
+        (i, f'product {i}', 'vehicles', start, None, f'workshop {i % 7}',
+         [f'product {j}' for j in range(i % 4)] if with_array else None)
+        for i in range(n)
+    ]
+
+
+def fetch_dict_rows(rows):
+    """The rows as psycopg.rows.dict_row makes them while fetching."""
+    return [dict(zip(COLS, row)) for row in rows]
+
+
+def rate(fn, n, repeat):
+    """Rows per second of the best of `repeat` runs, with the garbage collector off as timeit does."""
+    best = float('inf')
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - started)
+    finally:
+        gc.enable()
+    return n / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    for with_array in (False, True):
+        tuples = make_rows(args.rows, with_array)
+        arrays = ['products'] if with_array else []
+        cases = {
+            'legacy loop, tuple rows': lambda: legacy_prepare_rows(COLS, tuples),
+            'prepare_rows, tuple rows': lambda: prepare_rows(COLS, tuples, arrays),
+            'dict_row + prepare_rows': lambda: prepare_rows(COLS, fetch_dict_rows(tuples), arrays),
+        }
+        print(f"{args.rows} rows, {'with' if with_array else 'without'} an array column")
+        legacy = None
+        for name, fn in cases.items():
+            rows_per_s = rate(fn, args.rows, args.repeat)
+            legacy = legacy or rows_per_s
+            print(f"  {name:<28} {rows_per_s:>12,.0f} rows/s {rows_per_s / legacy:>6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,365 @@
+"""
+Deterministic synthetic data at production volume, loaded with COPY.
+
+Scales up the seed data of data/*.csv. The lookup tables it loaded (workshops, sections, labs,
+workshop_labs, equipment, grades, categories, worker and work types) are kept, and about
+--scale rows are added to each of employees, employee_movements, assembly and test, with the
+rows those need: brigades, products, the subtype row of every employee and product, and the
+testers of every test. The same --seed and --scale against the same seeded database always
+produce the same rows.
+
+    python bench/generate_data.py [--dsn URL] [--scale 1e5] [--seed 42]
+
+Scales from 10^4 to 10^7 are the intended range. Everything is loaded in one transaction,
+through the triggers and constraints, so the data keeps the rules data entered in the app does:
+  - every employee has the subtype row of its worker type, every product that of its category;
+  - a brigade has one brigadier, and brigadiers belong to a brigade;
+  - an employee's movements chain from grade to grade and end at the employee's grade, so
+    fix_grade_change_employees finds nothing to change;
+  - masters come from ete through master_insert_on_ete_create, sections_products and
+    assembly_daily_rollup from assembly through its triggers;
+  - assembly and test dates fall within the lifetime of their product.
+"""
+import argparse
+import datetime
+import random
+import time
+from array import array
+
+from psycopg import sql
+
+from common import connect
+
+# The generated data's "today", fixed so the rows don't depend on the day they are generated
+REFERENCE_DATE = datetime.date(2025, 6, 30)
+FIRST_DATE = datetime.date(2005, 1, 1)
+
+# Subtype table of each product category and of each worker type, by name
+PRODUCT_SUBTYPES = {'Воздушные суда': 'vehicles', 'Ракеты': 'missiles', 'Другой': 'other'}
+EMPLOYEE_SUBTYPES = {'Рабочий': 'workers', 'Инженер': 'ete', 'Тестировщик': 'testers'}
+# Out of every 20 employees: 12 workers, 5 engineers, 3 testers
+EMPLOYEE_MIX = ['workers'] * 12 + ['ete'] * 5 + ['testers'] * 3
+# Movements per employee and their weights: one per employee on average
+MOVEMENT_COUNTS, MOVEMENT_WEIGHTS = [0, 1, 2, 3], [35, 40, 15, 10]
+WORKERS_PER_BRIGADE = 10
+ASSEMBLY_PER_PRODUCT = 10
+
+SURNAMES = ['Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Петров', 'Соколов', 'Михайлов',
+            'Новиков', 'Фёдоров', 'Морозов', 'Волков', 'Алексеев', 'Лебедев', 'Семёнов', 'Егоров']
+FIRST_NAMES = ['Александр', 'Сергей', 'Михаил', 'Андрей', 'Дмитрий', 'Алексей', 'Иван', 'Николай',
+               'Владимир', 'Евгений', 'Павел', 'Олег']
+PATRONYMICS = ['Александрович', 'Сергеевич', 'Михайлович', 'Андреевич', 'Дмитриевич', 'Иванович',
+               'Николаевич', 'Владимирович', 'Петрович', 'Викторович']
+EDUCATION = ['Высшее техническое', 'Среднее профессиональное']
+MOVEMENT_COMMENTS = ['Повышение квалификации', 'Перевод', 'Аттестация', None]
+PRODUCT_MODELS = {
+    'vehicles': ['Су', 'МС', 'Ил', 'Ту', 'Ка', 'Ми'],
+    'missiles': ['Р', 'Х', 'Кинжал', 'Циркон'],
+    'other': ['АЛ', 'ПД', 'Н', 'БРЭО'],
+}
+USE_TYPES = ['Военный', 'Гражданский']
+VEHICLE_TYPES = ['Истребитель', 'Пассажирский самолет', 'Транспортный самолет', 'Вертолёт', 'Экспериментальный самолет']
+ARMAMENTS = ['Пушка ГШ-30-1', 'Пушка ГШ-23', None]
+MISSILE_TYPES = ['Баллистическая ракета', 'Крылатая ракета', 'Зенитная ракета']
+SPECIFICATIONS = ['Авиационный двигатель', 'Радиолокационная станция', 'Бортовой комплекс', 'Агрегат шасси']
+ASSEMBLY_NOTES = ['Сборка планера', 'Монтаж двигателей', 'Установка авионики', 'грунтовка', 'покраска', None]
+TEST_RESULTS = ['Годен'] * 8 + ['Брак', 'На доработке']
+
+
+def random_date(rng: random.Random, start: datetime.date, end: datetime.date) -> datetime.date:
+    return datetime.date.fromordinal(rng.randint(start.toordinal(), max(start, end).toordinal()))
+
+
+def full_name(rng: random.Random) -> str:
+    return f'{rng.choice(SURNAMES)} {rng.choice(FIRST_NAMES)} {rng.choice(PATRONYMICS)}'
+
+
+class Generator:
+    """
+    The rows of one load. Every table draws from its own random stream, seeded with
+    --seed and the table name, so a table's rows do not depend on the order tables are
+    generated in. Ids are given explicitly, following the largest id already present.
+    """
+    def __init__(self, cur, scale: int, seed: int):
+        self.scale = scale
+        self.seed = seed
+        self._fetch_lookups(cur)
+
+        self.employee_count = scale
+        self.worker_count = (scale // len(EMPLOYEE_MIX) * EMPLOYEE_MIX.count('workers')
+                             + EMPLOYEE_MIX[:scale % len(EMPLOYEE_MIX)].count('workers'))
+        self.new_brigades = max(1, self.worker_count // WORKERS_PER_BRIGADE)
+        self.product_count = max(100, scale // ASSEMBLY_PER_PRODUCT)
+        # filled as the products and testers are generated, for the rows referencing them
+        self.product_begin = array('i')
+        self.product_end = array('i')  # 0 while the product is unfinished
+        self.product_workshop = array('i')
+        self.product_kind = []
+        self.testers_by_lab: dict[int, array] = {lab: array('q') for lab in self.labs}
+        self.test_labs = array('i')
+
+    def rng(self, table: str) -> random.Random:
+        return random.Random(f'{self.seed}:{table}')
+
+    def _fetch_lookups(self, cur):
+        def column(query):
+            cur.execute(query)
+            return [row[0] for row in cur.fetchall()]
+
+        def mapping(query):
+            cur.execute(query)
+            result = {}
+            for key, value in cur.fetchall():
+                result.setdefault(key, []).append(value)
+            return result
+
+        self.grades = column("SELECT g_id FROM grades ORDER BY g_id")
+        self.work_types = column("SELECT t_id FROM work_types ORDER BY t_id")
+        self.labs = column("SELECT l_id FROM labs ORDER BY l_id")
+        self.sections_by_workshop = mapping("SELECT workshop_id, s_id FROM sections ORDER BY s_id")
+        self.workshops = sorted(self.sections_by_workshop)
+        self.labs_by_workshop = mapping("SELECT wsh_id, l_id FROM workshop_labs ORDER BY l_id")
+        self.equipment_by_lab = mapping("SELECT l_id, e_id FROM equipment ORDER BY e_id")
+        cur.execute("SELECT name, tp_id FROM worker_types")
+        self.worker_types = {EMPLOYEE_SUBTYPES[name]: tp_id for name, tp_id in cur.fetchall()
+                             if name in EMPLOYEE_SUBTYPES}
+        cur.execute("SELECT c_id, name FROM product_categories ORDER BY c_id")
+        self.categories = [(c_id, PRODUCT_SUBTYPES[name]) for c_id, name in cur.fetchall() if name in PRODUCT_SUBTYPES]
+
+        missing = [name for name, values in [
+            ('grades', self.grades), ('work_types', self.work_types), ('labs', self.labs),
+            ('sections', self.workshops), ('product_categories', self.categories),
+        ] if not values]
+        missing += [f'worker type {name}' for name, kind in EMPLOYEE_SUBTYPES.items() if kind not in self.worker_types]
+        if missing:
+            raise SystemExit(f"Load the seed data first, missing: {', '.join(missing)}")
+
+        cur.execute("""
+            SELECT (SELECT COALESCE(max(w_id), 0) FROM employees),
+                   (SELECT COALESCE(max(b_id), 0) FROM brigade),
+                   (SELECT COALESCE(max(p_id), 0) FROM products),
+                   (SELECT COALESCE(max(t_id), 0) FROM test)
+        """)
+        self.first_employee, self.first_brigade, self.first_product, self.first_test = (
+            last + 1 for last in cur.fetchone()
+        )
+        self.old_brigades = column("SELECT b_id FROM brigade ORDER BY b_id")
+
+    # employees
+
+    @staticmethod
+    def employee_kind(i: int) -> str:
+        return EMPLOYEE_MIX[i % len(EMPLOYEE_MIX)]
+
+    def employees(self):
+        """
+        (employee row, movement rows) of every employee. The grade chain of the movements is
+        drawn with the employee, since the employee's grade is where it ends.
+        """
+        rng = self.rng('employees')
+        for i in range(self.employee_count):
+            w_id = self.first_employee + i
+            hire_date = random_date(rng, FIRST_DATE, REFERENCE_DATE)
+            leave_date = random_date(rng, hire_date, REFERENCE_DATE) if rng.random() < 0.1 else None
+            experience = rng.randint(0, 40)
+
+            moves = rng.choices(MOVEMENT_COUNTS, MOVEMENT_WEIGHTS)[0] if len(self.grades) > 1 else 0
+            grade = rng.choice(self.grades)
+            last_day = leave_date or REFERENCE_DATE
+            dates = sorted(random_date(rng, hire_date, last_day) for _ in range(moves))
+            movements = []
+            for move_date in dates:
+                new_grade = rng.choice([g for g in self.grades if g != grade])
+                movements.append((w_id, move_date, grade, new_grade, rng.choice(MOVEMENT_COMMENTS)))
+                grade = new_grade
+
+            row = (w_id, full_name(rng), hire_date, leave_date, self.worker_types[self.employee_kind(i)],
+                   experience, grade)
+            yield row, movements
+
+    def employee_ids(self, kind: str):
+        return (self.first_employee + i for i in range(self.employee_count) if self.employee_kind(i) == kind)
+
+    def brigades(self):
+        for b in range(self.new_brigades):
+            yield self.first_brigade + b, f'Бригада №{self.first_brigade + b}'
+
+    def workers(self):
+        """The j-th worker joins new brigade j mod the brigade count; the first of each leads it."""
+        rng = self.rng('workers')
+        for j, w_id in enumerate(self.employee_ids('workers')):
+            yield (w_id, self.first_brigade + j % self.new_brigades, rng.choice(self.work_types),
+                   j < self.new_brigades)
+
+    def ete(self):
+        rng = self.rng('ete')
+        sections = [s for workshop in self.workshops for s in self.sections_by_workshop[workshop]]
+        for w_id in self.employee_ids('ete'):
+            section = rng.choice(sections) if rng.random() < 0.8 else None
+            is_master = section is not None and rng.random() < 0.05
+            yield (w_id, rng.choice(self.work_types), rng.choice(EDUCATION), rng.random() < 0.02,
+                   is_master, section)
+
+    def testers(self):
+        rng = self.rng('testers')
+        for w_id in self.employee_ids('testers'):
+            lab = rng.choice(self.labs)
+            self.testers_by_lab[lab].append(w_id)
+            yield w_id, lab
+
+    # products
+
+    def products(self):
+        rng = self.rng('products')
+        for i in range(self.product_count):
+            p_id = self.first_product + i
+            category, kind = rng.choice(self.categories)
+            workshop = rng.choice(self.workshops)
+            begin_date = random_date(rng, FIRST_DATE, REFERENCE_DATE)
+            end_date = begin_date + datetime.timedelta(days=rng.randint(30, 900))
+            if end_date > REFERENCE_DATE or rng.random() < 0.2:
+                end_date = None
+
+            self.product_begin.append(begin_date.toordinal())
+            self.product_end.append(end_date.toordinal() if end_date else 0)
+            self.product_workshop.append(workshop)
+            self.product_kind.append(kind)
+            yield p_id, f'{rng.choice(PRODUCT_MODELS[kind])}-{p_id}', category, begin_date, end_date, workshop
+
+    def product_ids(self, kind: str):
+        return (self.first_product + i for i, k in enumerate(self.product_kind) if k == kind)
+
+    def vehicles(self):
+        rng = self.rng('vehicles')
+        for p_id in self.product_ids('vehicles'):
+            passengers = rng.choice([1, 2, rng.randint(50, 300)])
+            yield (p_id, rng.choice(USE_TYPES), rng.choice(VEHICLE_TYPES), rng.choice([0, rng.randint(1, 50000)]),
+                   passengers, rng.randint(1, 4), rng.choice(ARMAMENTS))
+
+    def missiles(self):
+        rng = self.rng('missiles')
+        for p_id in self.product_ids('missiles'):
+            yield p_id, rng.choice(MISSILE_TYPES), rng.randint(10, 1500), rng.randint(50, 5000)
+
+    def other(self):
+        rng = self.rng('other')
+        for p_id in self.product_ids('other'):
+            yield p_id, f'{rng.choice(SPECIFICATIONS)}, серия {p_id}'
+
+    def product_lifetime(self, i: int) -> tuple[datetime.date, datetime.date, datetime.date | None]:
+        """Begin date, last possible date so far and end date (None while unfinished) of product i."""
+        begin = datetime.date.fromordinal(self.product_begin[i])
+        end = datetime.date.fromordinal(self.product_end[i]) if self.product_end[i] else None
+        return begin, end or REFERENCE_DATE, end
+
+    def assembly(self):
+        rng = self.rng('assembly')
+        brigades = self.old_brigades + [b for b, _ in self.brigades()]
+        for _ in range(self.scale):
+            i = rng.randrange(self.product_count)
+            begin, last, end = self.product_lifetime(i)
+            begin_date = random_date(rng, begin, last)
+            # work on a finished product is finished; on an unfinished one it may still be going on
+            end_date = random_date(rng, begin_date, last) if end or rng.random() < 0.6 else None
+            yield (rng.choice(brigades), rng.choice(self.sections_by_workshop[self.product_workshop[i]]),
+                   self.first_product + i, begin_date, end_date,
+                   rng.choice(self.work_types) if rng.random() < 0.9 else None, rng.choice(ASSEMBLY_NOTES))
+
+    # tests
+
+    def tests(self):
+        rng = self.rng('test')
+        for t in range(self.scale):
+            i = rng.randrange(self.product_count)
+            begin, last, _ = self.product_lifetime(i)
+            lab = rng.choice(self.labs_by_workshop.get(self.product_workshop[i]) or self.labs)
+            equipment = self.equipment_by_lab.get(lab)
+            self.test_labs.append(lab)
+            yield (self.first_test + t, self.first_product + i, lab, random_date(rng, begin, last),
+                   rng.choice(TEST_RESULTS), rng.choice(equipment) if equipment and rng.random() < 0.8 else None)
+
+    def test_testers(self):
+        """One or two testers of the test's lab, when the lab has any."""
+        rng = self.rng('test_testers')
+        for t, lab in enumerate(self.test_labs):
+            testers = self.testers_by_lab[lab]
+            if testers:
+                for tw_id in {testers[rng.randrange(len(testers))] for _ in range(rng.randint(1, 2))}:
+                    yield self.first_test + t, tw_id
+
+
+def copy_rows(cur, table: str, columns: list[str], rows) -> int:
+    """COPY `rows` into `table`, reporting the row count and rate."""
+    started = time.perf_counter()
+    count = 0
+    query = sql.SQL("COPY {} ({}) FROM STDIN").format(
+        sql.Identifier(table), sql.SQL(', ').join(map(sql.Identifier, columns))
+    )
+    with cur.copy(query) as copy:
+        for row in rows:
+            copy.write_row(row)
+            count += 1
+    elapsed = time.perf_counter() - started
+    print(f"{table:<20} {count:>12,} rows {elapsed:>8.1f} s {count / max(elapsed, 1e-6):>12,.0f} rows/s")
+    return count
+
+
+def load(cur, gen: Generator):
+    """Load everything, parents before children; the statement-level triggers fire once per COPY."""
+    copy_rows(cur, 'brigade', ['b_id', 'name'], gen.brigades())
+
+    copy_rows(cur, 'employees', ['w_id', 'full_name', 'hire_date', 'leave_date', 'worker_type', 'experience',
+                                 'grade_id'], (row for row, _ in gen.employees()))
+    copy_rows(cur, 'workers', ['w_id', 'brigade_id', 'specialisation', 'is_brigadier'], gen.workers())
+    copy_rows(cur, 'ete', ['w_id', 'specialisation', 'education', 'is_wsh_super', 'is_master', 'section'], gen.ete())
+    copy_rows(cur, 'testers', ['w_id', 'l_id'], gen.testers())
+    # the employees are drawn again for their movements rather than kept in memory
+    copy_rows(cur, 'employee_movements', ['w_id', 'move_date', 'old_pos', 'new_pos', 'comment'],
+              (move for _, moves in gen.employees() for move in moves))
+
+    copy_rows(cur, 'products', ['p_id', 'name', 'category', 'begin_date', 'end_date', 'workshop_id'], gen.products())
+    copy_rows(cur, 'vehicles', ['p_id', 'use_type', 'vehicle_type', 'cargo_cap', 'pass_count', 'eng_count',
+                                'armaments'], gen.vehicles())
+    copy_rows(cur, 'missiles', ['p_id', 'type', 'payload', 'range'], gen.missiles())
+    copy_rows(cur, 'other', ['p_id', 'text_specification'], gen.other())
+    copy_rows(cur, 'assembly', ['brigade_id', 'section_id', 'product_id', 'begin_date', 'end_date', 'work_type',
+                                'description'], gen.assembly())
+
+    copy_rows(cur, 'test', ['t_id', 'product_id', 'lab_id', 'test_date', 'result', 'equipment_id'], gen.tests())
+    copy_rows(cur, 'test_testers', ['test_id', 'tw_id'], gen.test_testers())
+
+    # ids were given explicitly: move the sequences past them
+    for table, column in [('employees', 'w_id'), ('brigade', 'b_id'), ('products', 'p_id'), ('test', 't_id')]:
+        cur.execute(sql.SQL("SELECT setval(pg_get_serial_sequence(%s, %s), (SELECT max({}) FROM {}))").format(
+            sql.Identifier(column), sql.Identifier(table)
+        ), [table, column])
+
+
+def scale_factor(text: str) -> int:
+    value = int(float(text))
+    if value < 1:
+        raise argparse.ArgumentTypeError('the scale is a positive number of rows')
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dsn')
+    parser.add_argument('--scale', type=scale_factor, default=100_000,
+                        help='rows added to each of employees, employee_movements, assembly and test, e.g. 1e6')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    with connect(args.dsn) as conn, conn.cursor() as cur:
+        gen = Generator(cur, args.scale, args.seed)
+        print(f"scale {args.scale:,}, seed {args.seed}: {gen.product_count:,} products, "
+              f"{gen.new_brigades:,} brigades\n")
+        with conn.transaction():
+            load(cur, gen)
+        cur.execute("ANALYZE")
+    print(f"\nloaded in {time.perf_counter() - started:.1f} s")
+
+
+if __name__ == '__main__':
+    main()
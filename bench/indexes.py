@@ -0,0 +1,100 @@
+"""
+Benchmark of the foreign key and filter column indexes in db-init/11-add-indexes.sql.
+
+For every view in 09-create-views-queries.sql it runs the unfiltered view and the view
+filtered on each lookup filter of FILTER_CONFIG, once with the indexes and once inside a
+transaction that drops them (rolled back afterwards), and prints latency and plan shape.
+Only the indexes of INDEXES are dropped; every other index stays in place for both runs.
+
+    python bench/indexes.py [--dsn URL] [--repeat 5]
+
+The indexes pay off with data: run it on a database with ~10^6 rows in assembly and test,
+as loaded by `python bench/generate_data.py --scale 1e6`.
+"""
+import argparse
+import statistics
+
+from psycopg import sql
+
+from common import connect, explain, plan_shape
+from view_filter_config import FILTER_CONFIG
+
+# The foreign key and filter column indexes of 11-add-indexes.sql (sections 2 and 3), the only
+# ones dropped: the indexes of section 1 serve the lookup search, not the views, and the unique
+# indexes of constraints and materialized views are not this benchmark's to remove
+INDEXES = (
+    'sections_workshop_id_idx', 'workshop_labs_l_id_idx', 'workers_brigade_id_idx', 'ete_section_idx',
+    'employee_movements_w_id_idx', 'masters_w_id_idx', 'masters_s_id_idx', 'products_workshop_id_idx',
+    'assembly_product_id_brigade_id_idx', 'assembly_brigade_id_section_id_idx', 'assembly_section_id_idx',
+    'equipment_l_id_idx', 'testers_l_id_idx', 'test_product_id_idx', 'test_lab_id_test_date_idx',
+    'test_equipment_id_idx', 'test_testers_tw_id_idx', 'sections_products_p_id_idx',
+    'products_end_date_idx', 'test_test_date_idx',
+    'assembly_open_idx', 'products_open_idx', 'employees_active_idx',
+)
+
+# those of INDEXES that exist, never a unique one
+EXISTING_INDEXES = """
+    SELECT c.relname
+    FROM pg_index i
+    JOIN pg_class c ON c.oid = i.indexrelid
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = 'public'
+      AND c.relname = ANY(%s)
+      AND NOT i.indisunique
+    ORDER BY c.relname
+"""
+
+
+def cases(cur):
+    """(view, description, query, params) for each view and lookup filter."""
+    cur.execute("SELECT table_name FROM information_schema.views WHERE table_schema = 'public' ORDER BY 1")
+    for (view,) in cur.fetchall():
+        base = sql.SQL("SELECT * FROM {}").format(sql.Identifier(view))
+        yield view, '(none)', base, []
+        for column, entry in FILTER_CONFIG.get(view, {}).items():
+            if not isinstance(entry, tuple):
+                continue
+            table, _, id_col = entry[:3]
+            # a value from the middle of the lookup, not its first row
+            cur.execute(sql.SQL("SELECT {id} FROM {tbl} ORDER BY {id} OFFSET (SELECT count(*) / 2 FROM {tbl}) LIMIT 1")
+                        .format(id=sql.Identifier(id_col), tbl=sql.Identifier(table)))
+            row = cur.fetchone()
+            if row:
+                yield view, f"{column} = {row[0]}", sql.SQL("{} WHERE {} = %s").format(base, sql.Identifier(column)), [row[0]]
+
+
+def measure(cur, query, params, repeat):
+    plans = [explain(cur, query, params) for _ in range(repeat)]
+    return statistics.median(p['Execution Time'] for p in plans), plan_shape(plans[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dsn')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with connect(args.dsn) as conn, conn.cursor() as cur:
+        cur.execute("SELECT count(*) FROM assembly")
+        assembly_rows = cur.fetchone()[0]
+        cur.execute("SELECT count(*) FROM test")
+        print(f"assembly: {assembly_rows} rows, test: {cur.fetchone()[0]} rows")
+        cur.execute(EXISTING_INDEXES, [list(INDEXES)])
+        indexes = [name for (name,) in cur.fetchall()]
+        print(f"comparing with and without {len(indexes)} of the {len(INDEXES)} indexes of 11-add-indexes.sql\n")
+
+        for view, description, query, params in list(cases(cur)):
+            with_ms, with_shape = measure(cur, query, params, args.repeat)
+            with conn.transaction(force_rollback=True):
+                for name in indexes:
+                    cur.execute(sql.SQL("DROP INDEX {}").format(sql.Identifier(name)))
+                without_ms, without_shape = measure(cur, query, params, args.repeat)
+            print(f"{view} [{description}]: {without_ms:.1f} ms -> {with_ms:.1f} ms "
+                  f"({without_ms / max(with_ms, 1e-6):.1f}x)")
+            if with_shape != without_shape:
+                print(f"    without: {', '.join(without_shape)}")
+                print(f"    with:    {', '.join(with_shape)}")
+
+
+if __name__ == '__main__':
+    main()
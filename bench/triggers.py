@@ -0,0 +1,190 @@
+"""
+Benchmark of the trigger overhead of bulk writes: the statement-level triggers of
+db-init/07-add-triggers.sql, and the brigadier constraints of 05-add-constraints.sql,
+against the per-row triggers they replaced.
+
+Each case runs a --rows batch insert or update, once with the installed triggers and once
+inside a transaction that swaps in the per-row versions. Both are rolled back afterwards.
+Only the batch statement is timed, including the triggers it fires; setup is not timed.
+
+    python bench/triggers.py [--dsn URL] [--rows 100000] [--repeat 3]
+
+The database needs at least one row in grades (two for the grade change), worker_types
+('Рабочий'), brigade, work_types, sections and products.
+"""
+import argparse
+import time
+
+from common import connect, summarize
+
+# The per-row triggers as they were before, recreated inside the rolled back transaction
+LEGACY_TRIGGERS = {
+    'assembly': """
+        DROP TRIGGER section_products_insert_on_assembly ON assembly;
+
+        CREATE FUNCTION legacy_section_products_insert_on_assembly_func()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            INSERT INTO sections_products (s_id, p_id)
+            SELECT NEW.section_id, NEW.product_id
+            WHERE NOT EXISTS (
+                SELECT 1 FROM sections_products WHERE s_id = NEW.section_id AND p_id = NEW.product_id
+            );
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        CREATE TRIGGER section_products_insert_on_assembly
+        AFTER INSERT ON assembly
+        FOR EACH ROW
+        EXECUTE FUNCTION legacy_section_products_insert_on_assembly_func();
+    """,
+    'grades': """
+        DROP TRIGGER log_employee_grade_change ON employees;
+        DROP TRIGGER fix_grade_change_employees ON employee_movements;
+
+        CREATE FUNCTION legacy_log_employee_grade_change_func()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            IF OLD.grade_id <> NEW.grade_id THEN
+                INSERT INTO employee_movements(w_id, old_pos, new_pos)
+                VALUES(NEW.w_id, OLD.grade_id, NEW.grade_id);
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        CREATE TRIGGER log_employee_grade_change
+        AFTER UPDATE OF grade_id ON employees
+        FOR EACH ROW
+        EXECUTE FUNCTION legacy_log_employee_grade_change_func();
+
+        CREATE FUNCTION legacy_fix_grade_change_employees_func()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            UPDATE employees SET grade_id = NEW.new_pos WHERE w_id = NEW.w_id;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        CREATE TRIGGER fix_grade_change_employees
+        AFTER INSERT ON employee_movements
+        FOR EACH ROW
+        EXECUTE FUNCTION legacy_fix_grade_change_employees_func();
+    """,
+    # the brigadier rules are constraints now, so there is no trigger to drop
+    'workers': """
+        CREATE FUNCTION legacy_check_worker_brigadier_func()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            IF NEW.is_brigadier = true AND NEW.brigade_id IS NULL THEN
+                RAISE EXCEPTION 'Brigadier must be assigned to a brigade';
+            END IF;
+            IF NEW.is_brigadier = true AND NEW.brigade_id IS NOT NULL THEN
+                IF EXISTS (
+                    SELECT 1 FROM workers
+                    WHERE brigade_id = NEW.brigade_id AND is_brigadier = true AND w_id <> NEW.w_id
+                ) THEN
+                    RAISE EXCEPTION 'Brigade % already has a brigadier', NEW.brigade_id;
+                END IF;
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        CREATE TRIGGER check_worker_brigadier
+        BEFORE INSERT OR UPDATE ON workers
+        FOR EACH ROW
+        EXECUTE FUNCTION legacy_check_worker_brigadier_func();
+    """,
+}
+
+# Untimed setup: `rows` new employees of the worker type, kept in bench_employees
+NEW_EMPLOYEES = """
+    CREATE TEMP TABLE bench_employees ON COMMIT DROP AS
+    WITH added AS (
+        INSERT INTO employees (full_name, worker_type, experience, grade_id)
+        SELECT 'Bench employee ' || i, %(worker_type)s, 0, %(grade)s
+        FROM generate_series(1, %(rows)s) AS i
+        RETURNING w_id
+    )
+    SELECT w_id, row_number() OVER (ORDER BY w_id) AS i FROM added
+"""
+
+# (name, legacy triggers, setup or None, timed statement)
+CASES = [
+    ('assembly insert', 'assembly', None, """
+        INSERT INTO assembly (brigade_id, section_id, product_id)
+        SELECT %(brigades)s[1 + i %% cardinality(%(brigades)s)],
+               %(sections)s[1 + i %% cardinality(%(sections)s)],
+               %(products)s[1 + i %% cardinality(%(products)s)]
+        FROM generate_series(1, %(rows)s) AS i
+    """),
+    ('employees grade change', 'grades', NEW_EMPLOYEES, """
+        UPDATE employees SET grade_id = %(other_grade)s
+        WHERE w_id IN (SELECT w_id FROM bench_employees)
+    """),
+    ('workers insert', 'workers', NEW_EMPLOYEES, """
+        INSERT INTO workers (w_id, brigade_id, specialisation)
+        SELECT w_id, %(brigades)s[1 + i %% cardinality(%(brigades)s)], %(work_type)s
+        FROM bench_employees
+    """),
+]
+
+
+def fetch_params(cur, rows: int) -> dict:
+    cur.execute("""
+        SELECT
+            ARRAY(SELECT b_id FROM brigade ORDER BY b_id),
+            ARRAY(SELECT s_id FROM sections ORDER BY s_id),
+            ARRAY(SELECT p_id FROM products ORDER BY p_id LIMIT 1000),
+            ARRAY(SELECT g_id FROM grades ORDER BY g_id LIMIT 2),
+            (SELECT tp_id FROM worker_types WHERE name = 'Рабочий'),
+            (SELECT min(t_id) FROM work_types)
+    """)
+    brigades, sections, products, grades, worker_type, work_type = cur.fetchone()
+    if not (brigades and sections and products and grades and worker_type and work_type):
+        raise SystemExit('The database lacks the lookup rows the benchmark inserts against, see --help')
+    return {
+        'rows': rows, 'brigades': brigades, 'sections': sections, 'products': products,
+        'grade': grades[0], 'other_grade': grades[-1], 'worker_type': worker_type, 'work_type': work_type,
+    }
+
+
+def run_case(conn, cur, legacy, setup, statement, params, repeat) -> list[float]:
+    """Milliseconds of each run of the timed statement, every run rolled back."""
+    timings = []
+    for _ in range(repeat):
+        with conn.transaction(force_rollback=True):
+            if legacy:
+                cur.execute(legacy)
+            if setup:
+                cur.execute(setup, params)
+            started = time.perf_counter()
+            cur.execute(statement, params)
+            timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dsn')
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with connect(args.dsn) as conn, conn.cursor() as cur:
+        params = fetch_params(cur, args.rows)
+        if params['grade'] == params['other_grade']:
+            print('only one grade: the grade change updates rows but moves no one')
+
+        print(f"{'case':<26} {'per-row p50':>12} {'statement p50':>14} {'speedup':>8}")
+        for name, legacy, setup, statement in CASES:
+            per_row = summarize(run_case(conn, cur, LEGACY_TRIGGERS[legacy], setup, statement, params, args.repeat))
+            per_statement = summarize(run_case(conn, cur, None, setup, statement, params, args.repeat))
+            print(f"{name:<26} {per_row['p50_ms']:>9.0f} ms {per_statement['p50_ms']:>11.0f} ms "
+                  f"{per_row['p50_ms'] / max(per_statement['p50_ms'], 1e-6):>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+"""
+Benchmark suite of the views and functions of db-init/09-create-views-queries.sql.
+
+Every entry of FILTER_CONFIG runs unfiltered, with each of its filters alone and with all of
+them at once, the query built as the summary dialog builds it. Each case records p50/p95
+latency, the shared buffers hit and read, the rows returned and the plan shape, and is compared
+with a JSON baseline: a p50 more than --threshold slower than the baseline's (and by at least
+--min-delta-ms) is a regression, reported with exit status 1. Plan shape changes are reported too.
+
+    python bench/views.py [--dsn URL] [--scales 1e4,1e5,1e6] [--repeat 10]
+                          [--baseline bench/views_baseline.json] [--update-baseline] [--check]
+
+With --scales, each scale is loaded by generate_data.py in a transaction that is rolled back
+once it is measured, so the database is left as it was. Without it, the data already in the
+database is measured, as the scale 'current'. --update-baseline saves the results of the
+scales run as the new baseline for them.
+
+No baseline is committed, as timings depend on the machine: record one first, on the machine
+and with the scales the checks will run with, then check against it:
+
+    python bench/views.py --scales 1e4,1e5 --update-baseline
+    python bench/views.py --scales 1e4,1e5 --check
+
+With --check, a scale without a baseline is an error (exit status 2) instead of being skipped.
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+
+from psycopg import sql
+
+from common import connect, time_query, summarize, explain, plan_shape, plan_buffers
+from generate_data import Generator, load, scale_factor
+from view_filter_config import FILTER_CONFIG
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'views_baseline.json')
+# Date filters cover the last year of the data
+DATE_WINDOW = datetime.timedelta(days=365)
+
+
+def date_window(cur) -> tuple[datetime.date, datetime.date]:
+    cur.execute("SELECT GREATEST((SELECT max(end_date) FROM products), (SELECT max(test_date) FROM test))")
+    last = cur.fetchone()[0] or datetime.date.today()
+    return last - DATE_WINDOW, last
+
+
+def filter_value(cur, key: str, entry, window):
+    """A value for a filter, as the dialog would send it; None when there is nothing to pick."""
+    if isinstance(entry, tuple):  # DB lookup, fetched or searched: a value from the middle of it
+        table, _, id_col = entry[:3]
+        cur.execute(sql.SQL("SELECT {id} FROM {tbl} ORDER BY {id} OFFSET (SELECT count(*) / 2 FROM {tbl}) LIMIT 1")
+                    .format(id=sql.Identifier(id_col), tbl=sql.Identifier(table)))
+        row = cur.fetchone()
+        return [row[0]] if row else None
+    if isinstance(entry, list):
+        return [entry[len(entry) // 2]]
+    if entry == 'boolean':
+        return True
+    if entry == 'date':
+        return window[0] if 'start' in key else window[1]
+    if entry.startswith('date_range_start:'):
+        return window[0]
+    if entry.startswith('date_range_end:'):
+        return window[1]
+    raise TypeError(f"Unsupported filter configuration for '{key}': {entry}")
+
+
+def build_query(name: str, filters: dict) -> tuple[sql.Composable, list]:
+    """The query of the summary dialog for `name` with `filters` (key -> value) set."""
+    config = FILTER_CONFIG[name]
+    args, arg_params, where, where_params = [], [], [], []
+    for key, value in filters.items():
+        entry = config[key]
+        if name.startswith('get_') and key.startswith('p_'):
+            # named notation; lookups and lists are arrays
+            args.append(sql.SQL('{} => %s').format(sql.Identifier(key)))
+            arg_params.append(value)
+        elif isinstance(entry, (tuple, list)):
+            where.append(sql.SQL("{} = ANY(%s)").format(sql.Identifier(key)))
+            where_params.append(value)
+        elif entry == 'boolean':
+            where.append(sql.SQL("{} = {}").format(sql.Identifier(key), sql.Literal(value)))
+        elif entry == 'date':
+            where.append(sql.SQL("{} = %s").format(sql.Identifier(key)))
+            where_params.append(value)
+        else:
+            kind, column = entry.split(':', 1)
+            operator = '>=' if kind == 'date_range_start' else '<='
+            where.append(sql.SQL("{} {} %s").format(sql.Identifier(column), sql.SQL(operator)))
+            where_params.append(value)
+
+    if name.startswith('get_'):
+        query = sql.SQL("SELECT * FROM {}({})").format(sql.Identifier(name), sql.SQL(', ').join(args))
+    else:
+        query = sql.SQL("SELECT * FROM {}").format(sql.Identifier(name))
+    if where:
+        query = sql.SQL("{} WHERE {}").format(query, sql.SQL(' AND ').join(where))
+    return query, arg_params + where_params
+
+
+def cases(cur):
+    """(case key, query, params) of every view and function: no filter, each filter alone, all filters."""
+    window = date_window(cur)
+    for name, config in FILTER_CONFIG.items():
+        values = {key: filter_value(cur, key, entry, window) for key, entry in config.items()}
+        values = {key: value for key, value in values.items() if value is not None}
+        # the dialog requires the dates of a function
+        required = {key: value for key, value in values.items() if config[key] == 'date'}
+        optional = [key for key in values if key not in required]
+
+        combinations = [('(none)', [])] + [(key, [key]) for key in optional]
+        if len(optional) > 1:
+            combinations.append(('(all)', optional))
+        for description, keys in combinations:
+            filters = {**required, **{key: values[key] for key in keys}}
+            query, params = build_query(name, filters)
+            yield f'{name} [{description}]', query, params
+
+
+def measure(cur, query, params, repeat: int) -> dict:
+    result = summarize(time_query(cur, query, params, repeat))
+    plan = explain(cur, query, params)
+    result.update(plan_buffers(plan))
+    result['rows'] = plan['Plan'].get('Actual Rows', 0)
+    result['plan'] = plan_shape(plan)
+    return result
+
+
+def run_cases(cur, repeat: int) -> dict:
+    results = {}
+    for key, query, params in cases(cur):
+        results[key] = measure(cur, query, params, repeat)
+        r = results[key]
+        print(f"  {key:<70} p50 {r['p50_ms']:>9.1f} ms  p95 {r['p95_ms']:>9.1f} ms  "
+              f"buffers {r['shared_hit']:>8} hit {r['shared_read']:>8} read")
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float, min_delta_ms: float) -> list[str]:
+    """Print how `results` differ from `baseline`; return the regressions."""
+    regressions = []
+    for key, now in results.items():
+        before = baseline.get(key)
+        if before is None:
+            print(f"  new: {key}")
+            continue
+        delta = now['p50_ms'] - before['p50_ms']
+        if now['p50_ms'] > before['p50_ms'] * (1 + threshold) and delta >= min_delta_ms:
+            regressions.append(f"{key}: p50 {before['p50_ms']:.1f} -> {now['p50_ms']:.1f} ms "
+                               f"({now['p50_ms'] / max(before['p50_ms'], 1e-6):.1f}x)")
+        if now['plan'] != before['plan']:
+            print(f"  plan changed: {key}\n    was: {', '.join(before['plan'])}\n    now: {', '.join(now['plan'])}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dsn')
+    parser.add_argument('--scales', type=lambda text: [scale_factor(s) for s in text.split(',')],
+                        help='comma-separated scales to generate, e.g. 1e4,1e5,1e6')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--check', action='store_true',
+                        help='fail (exit status 2) when a scale run has no baseline to compare with')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='relative p50 slowdown counted as a regression (default 0.25)')
+    parser.add_argument('--min-delta-ms', type=float, default=1.0,
+                        help='smaller slowdowns are noise, whatever their ratio (default 1 ms)')
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    elif args.check and not args.update_baseline:
+        print(f"no baseline at {args.baseline}: record one first with --update-baseline", file=sys.stderr)
+        sys.exit(2)
+
+    results = {}
+    with connect(args.dsn) as conn, conn.cursor() as cur:
+        if args.scales:
+            for scale in args.scales:
+                print(f"scale {scale:,}: loading")
+                with conn.transaction(force_rollback=True):
+                    load(cur, Generator(cur, scale, args.seed))
+                    cur.execute("ANALYZE")
+                    print(f"scale {scale:,}: measuring")
+                    results[str(scale)] = run_cases(cur, args.repeat)
+        else:
+            print("scale current: measuring")
+            results['current'] = run_cases(cur, args.repeat)
+
+    regressions, missing = [], []
+    for scale, scale_results in results.items():
+        if scale not in baseline:
+            print(f"\nscale {scale}: no baseline to compare with")
+            missing.append(scale)
+            continue
+        print(f"\nscale {scale}: compared with the baseline of {baseline[scale]['taken_at']}")
+        regressions += [f"scale {scale}: {r}" for r in
+                        compare(scale_results, baseline[scale]['cases'], args.threshold, args.min_delta_ms)]
+
+    if args.update_baseline:
+        taken_at = datetime.datetime.now().isoformat(timespec='seconds')
+        for scale, scale_results in results.items():
+            baseline[scale] = {'taken_at': taken_at, 'seed': args.seed, 'repeat': args.repeat, 'cases': scale_results}
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2)
+        print(f"\nbaseline saved to {args.baseline}")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    if args.check and missing and not args.update_baseline:
+        print(f"\nno baseline for scale(s) {', '.join(missing)}: record them first with --update-baseline")
+        sys.exit(2)
+
+
+if __name__ == '__main__':
+    main()
@@ -1 +1,12 @@
 \connect aerospace_factory
+
+-- A brigade has at most one brigadier. A unique index rather than a trigger scanning workers:
+-- concurrent hires into one brigade only wait on each other when both add a brigadier.
+CREATE UNIQUE INDEX workers_one_brigadier_per_brigade
+    ON "workers" ("brigade_id")
+    WHERE "is_brigadier";
+
+-- A brigadier is assigned to a brigade
+ALTER TABLE "workers"
+    ADD CONSTRAINT workers_brigadier_has_brigade
+    CHECK (NOT "is_brigadier" OR "brigade_id" IS NOT NULL);
@@ -1,44 +1,82 @@
 \connect aerospace_factory
+-- The triggers are statement-level with transition tables wherever the check or the follow-up
+-- write can be done after the statement: a bulk insert or a mass update runs each of them once
+-- over the changed rows instead of once per row. Transition tables allow neither column lists
+-- nor several events per trigger, hence one trigger per event. Statement-level triggers fire
+-- even when no row changed, so the functions that write to another table return early when
+-- there is nothing to write: an empty write would still fire the statement triggers of its
+-- table, notify_table_change among them.
+
 -- 1)
 CREATE OR REPLACE FUNCTION log_employee_grade_change_func()
 RETURNS TRIGGER AS $$
 BEGIN
-    IF OLD.grade_id <> NEW.grade_id THEN
-        INSERT INTO employee_movements(w_id, old_pos, new_pos)
-        VALUES(NEW.w_id, OLD.grade_id, NEW.grade_id);
+    -- The movement fires fix_grade_change_employees, whose update of employees fires this
+    -- trigger again with no grade changed: stop there
+    PERFORM 1
+    FROM old_employees o
+    JOIN new_employees n USING (w_id)
+    WHERE o.grade_id <> n.grade_id
+    LIMIT 1;
+    IF NOT FOUND THEN
+        RETURN NULL;
     END IF;
-    RETURN NEW;
+
+    INSERT INTO employee_movements(w_id, old_pos, new_pos)
+    SELECT n.w_id, o.grade_id, n.grade_id
+    FROM old_employees o
+    JOIN new_employees n USING (w_id)
+    WHERE o.grade_id <> n.grade_id;
+    RETURN NULL;
 END;
 $$ LANGUAGE plpgsql;
 
 CREATE TRIGGER log_employee_grade_change
-AFTER UPDATE OF grade_id ON employees
-FOR EACH ROW
+AFTER UPDATE ON employees
+REFERENCING OLD TABLE AS old_employees NEW TABLE AS new_employees
+FOR EACH STATEMENT
 EXECUTE FUNCTION log_employee_grade_change_func();
 
 -- 2)
 CREATE OR REPLACE FUNCTION validate_master_employee_func()
 RETURNS TRIGGER AS $$
+DECLARE
+    v_w_id INTEGER;
 BEGIN
-    -- Check if the employee doesnt exist in ete table and is marked as master
-    IF NOT EXISTS (
-        SELECT 1 
+    -- Check if some employee doesnt exist in ete table and is marked as master
+    SELECT m.w_id
+    INTO v_w_id
+    FROM new_masters m
+    WHERE NOT EXISTS (
+        SELECT 1
         FROM ete
-        WHERE w_id = NEW.w_id 
+        WHERE w_id = m.w_id
         AND is_master = true
-    ) THEN
-        RAISE EXCEPTION 'Employee % must be in the ETE table and marked as master to be added as a section master', NEW.w_id;
+    )
+    LIMIT 1;
+
+    IF FOUND THEN
+        RAISE EXCEPTION 'Employee % must be in the ETE table and marked as master to be added as a section master', v_w_id;
     END IF;
-    RETURN NEW;
+    RETURN NULL;
 END;
 $$ LANGUAGE plpgsql;
 
-CREATE TRIGGER validate_master_employee
-BEFORE INSERT OR UPDATE ON masters
-FOR EACH ROW
+CREATE TRIGGER validate_master_employee_insert
+AFTER INSERT ON masters
+REFERENCING NEW TABLE AS new_masters
+FOR EACH STATEMENT
+EXECUTE FUNCTION validate_master_employee_func();
+
+CREATE TRIGGER validate_master_employee_update
+AFTER UPDATE ON masters
+REFERENCING NEW TABLE AS new_masters
+FOR EACH STATEMENT
 EXECUTE FUNCTION validate_master_employee_func();
 
 -- 3)
+-- Stays per-row: the check has to run before the delete cascades to masters,
+-- and BEFORE statement triggers see no transition tables.
 CREATE OR REPLACE FUNCTION prevent_delete_active_master_func()
 RETURNS TRIGGER AS $$
 BEGIN
@@ -58,87 +96,93 @@ FOR EACH ROW
 EXECUTE FUNCTION prevent_delete_active_master_func();
 
 -- 4)
-CREATE OR REPLACE FUNCTION check_worker_brigadier_func()
-RETURNS TRIGGER AS $$
-BEGIN
-    -- If employee is marked as brigadier, they must be assigned to a brigade
-    IF NEW.is_brigadier = true AND NEW.brigade_id IS NULL THEN
-        RAISE EXCEPTION 'Brigadier must be assigned to a brigade';
-    END IF;
-    
-    -- If this employee is marked as brigadier, check that there's no other brigadier in the same brigade
-    IF NEW.is_brigadier = true AND NEW.brigade_id IS NOT NULL THEN
-        IF EXISTS (
-            SELECT 1 
-            FROM workers 
-            WHERE brigade_id = NEW.brigade_id 
-            AND is_brigadier = true 
-            AND w_id <> NEW.w_id
-        ) THEN
-            RAISE EXCEPTION 'Brigade % already has a brigadier', NEW.brigade_id;
-        END IF;
-    END IF;
-    
-    RETURN NEW;
-END;
-$$ LANGUAGE plpgsql;
-
-CREATE TRIGGER check_worker_brigadier
-BEFORE INSERT OR UPDATE ON workers
-FOR EACH ROW
-EXECUTE FUNCTION check_worker_brigadier_func();
+-- One brigadier per brigade, and only within a brigade: the workers_one_brigadier_per_brigade
+-- index and the workers_brigadier_has_brigade check in 05-add-constraints.sql.
 
 -- 5)
 CREATE OR REPLACE FUNCTION fix_grade_change_employees_func()
 RETURNS TRIGGER AS $$
 BEGIN
-    UPDATE employees 
-    SET grade_id = NEW.new_pos 
-    WHERE w_id = NEW.w_id;
-    
-    RETURN NEW;
+    -- Of several movements of one employee the last one wins, as it did row by row.
+    -- Employees already at the new grade are skipped, which ends the recursion with
+    -- log_employee_grade_change.
+    IF NOT EXISTS (
+        SELECT 1
+        FROM new_movements m
+        JOIN employees e USING (w_id)
+        WHERE e.grade_id IS DISTINCT FROM m.new_pos
+    ) THEN
+        RETURN NULL;
+    END IF;
+
+    UPDATE employees e
+    SET grade_id = m.new_pos
+    FROM (
+        SELECT DISTINCT ON (w_id) w_id, new_pos
+        FROM new_movements
+        ORDER BY w_id, entry_id DESC
+    ) m
+    WHERE e.w_id = m.w_id
+    AND e.grade_id IS DISTINCT FROM m.new_pos;
+
+    RETURN NULL;
 END;
 $$ LANGUAGE plpgsql;
 
 CREATE TRIGGER fix_grade_change_employees
 AFTER INSERT ON employee_movements
-FOR EACH ROW
+REFERENCING NEW TABLE AS new_movements
+FOR EACH STATEMENT
 EXECUTE FUNCTION fix_grade_change_employees_func();
 
 -- 6)
 CREATE OR REPLACE FUNCTION section_products_insert_on_assembly_func()
 RETURNS TRIGGER AS $$
 BEGIN
+    IF NOT EXISTS (
+        SELECT 1
+        FROM new_assembly a
+        WHERE NOT EXISTS (
+            SELECT 1 FROM sections_products sp WHERE sp.s_id = a.section_id AND sp.p_id = a.product_id
+        )
+    ) THEN
+        RETURN NULL;
+    END IF;
+
     INSERT INTO sections_products (s_id, p_id)
-    SELECT NEW.section_id, NEW.product_id
-    WHERE NOT EXISTS (
-        SELECT 1 
-        FROM sections_products 
-        WHERE s_id = NEW.section_id AND p_id = NEW.product_id
-    );
-    
-    RETURN NEW;
+    SELECT DISTINCT section_id, product_id
+    FROM new_assembly
+    ON CONFLICT DO NOTHING;
+
+    RETURN NULL;
 END;
 $$ LANGUAGE plpgsql;
 
 CREATE TRIGGER section_products_insert_on_assembly
 AFTER INSERT ON assembly
-FOR EACH ROW
+REFERENCING NEW TABLE AS new_assembly
+FOR EACH STATEMENT
 EXECUTE FUNCTION section_products_insert_on_assembly_func();
 
 -- 7)
 CREATE OR REPLACE FUNCTION master_insert_on_ete_create_func()
 RETURNS TRIGGER AS $$
 BEGIN
-    IF NEW.is_master AND NEW.section IS NOT NULL THEN
-        INSERT INTO masters (w_id, s_id)
-        VALUES (NEW.w_id, NEW.s_id);
+    IF NOT EXISTS (SELECT 1 FROM new_ete WHERE is_master AND section IS NOT NULL) THEN
+        RETURN NULL;
     END IF;
-    RETURN NEW;
+
+    INSERT INTO masters (w_id, s_id)
+    SELECT w_id, section
+    FROM new_ete
+    WHERE is_master AND section IS NOT NULL;
+
+    RETURN NULL;
 END;
 $$ LANGUAGE plpgsql;
 
 CREATE TRIGGER master_insert_on_ete_create
 AFTER INSERT ON ete
-FOR EACH ROW
+REFERENCING NEW TABLE AS new_ete
+FOR EACH STATEMENT
 EXECUTE FUNCTION master_insert_on_ete_create_func();
@@ -64,23 +64,12 @@ BEGIN
             RAISE EXCEPTION 'Specialisation is required for workers';
         END IF;
         
+        -- A second brigadier in the brigade is refused by the workers_one_brigadier_per_brigade
+        -- index (05-add-constraints.sql), so concurrent hires need not lock the brigade's workers
         IF p_brigade_id IS NOT NULL THEN
             PERFORM 1 FROM brigade 
             WHERE b_id = p_brigade_id 
             FOR SHARE;
-            
-            -- There is a trigger, but we should make it one transaction to allow correct concurrent access
-            IF p_is_brigadier = true THEN
-                IF EXISTS (
-                    SELECT 1 
-                    FROM workers 
-                    WHERE brigade_id = p_brigade_id 
-                    AND is_brigadier = true
-                    FOR UPDATE
-                ) THEN
-                    RAISE EXCEPTION 'Brigade % already has a brigadier', p_brigade_id;
-                END IF;
-            END IF;
         END IF;
         
         INSERT INTO workers (
@@ -314,3 +303,266 @@ END;
 $$;
 
 
+
+
+-- Массовое добавление сотрудников и изделий.
+-- Строки передаются JSON-массивом объектов с полями параметров sp_add_employee / sp_add_product
+-- без префикса p_, и все сотрудники (изделия) вместе со строками подтипов вставляются
+-- несколькими set-based запросами в одной транзакции, а не отдельным CALL на каждую строку.
+-- Ошибка в любой строке отменяет весь вызов и сообщает номер строки.
+
+-- Строки массива с их номерами (с 1), типизированные по столбцам sp_add_employee.
+CREATE OR REPLACE FUNCTION employee_rows_from_jsonb(p_employees JSONB)
+RETURNS TABLE(
+    ord            BIGINT,
+    full_name      VARCHAR,
+    worker_type    INTEGER,
+    experience     INTEGER,
+    grade_id       INTEGER,
+    hire_date      DATE,
+    brigade_id     INTEGER,
+    specialisation INTEGER,
+    is_brigadier   BOOLEAN,
+    education      VARCHAR,
+    is_wsh_super   BOOLEAN,
+    is_master      BOOLEAN,
+    section        INTEGER,
+    lab_id         INTEGER
+)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT e.ord, r.*
+    FROM jsonb_array_elements(p_employees) WITH ORDINALITY AS e(item, ord)
+    CROSS JOIN LATERAL jsonb_to_record(e.item) AS r(
+        full_name      VARCHAR,
+        worker_type    INTEGER,
+        experience     INTEGER,
+        grade_id       INTEGER,
+        hire_date      DATE,
+        brigade_id     INTEGER,
+        specialisation INTEGER,
+        is_brigadier   BOOLEAN,
+        education      VARCHAR,
+        is_wsh_super   BOOLEAN,
+        is_master      BOOLEAN,
+        section        INTEGER,
+        lab_id         INTEGER
+    )
+$$;
+
+
+CREATE OR REPLACE PROCEDURE sp_add_employees(
+    p_employees JSONB,
+    INOUT p_count INTEGER DEFAULT NULL
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_row BIGINT;
+    v_error TEXT;
+BEGIN
+    -- The checks of sp_add_employee, for every row at once; the first failing row is reported.
+    -- Foreign keys are checked by the inserts themselves, so no rows are locked FOR SHARE up front.
+    SELECT s.ord, s.error
+    INTO v_row, v_error
+    FROM (
+        SELECT
+            r.ord,
+            CASE
+                WHEN r.full_name IS NULL THEN 'Full name is required'
+                WHEN wt.name IS NULL THEN format('Invalid worker type ID: %s', r.worker_type)
+                WHEN r.experience IS NULL THEN 'Experience is required'
+                WHEN g.g_id IS NULL THEN format('Invalid grade ID: %s', r.grade_id)
+                WHEN wt.name = 'Рабочий' AND r.specialisation IS NULL
+                    THEN 'Specialisation is required for workers'
+                WHEN wt.name = 'Рабочий' AND r.is_brigadier AND r.brigade_id IS NULL
+                    THEN 'Brigadier must be assigned to a brigade'
+                WHEN wt.name = 'Рабочий' AND r.is_brigadier AND (
+                        EXISTS (SELECT 1 FROM workers w WHERE w.brigade_id = r.brigade_id AND w.is_brigadier)
+                        OR COUNT(*) FILTER (WHERE wt.name = 'Рабочий' AND r.is_brigadier)
+                               OVER (PARTITION BY r.brigade_id) > 1
+                    )
+                    THEN format('Brigade %s already has a brigadier', r.brigade_id)
+                WHEN wt.name = 'Инженер' AND r.education IS NULL
+                    THEN 'Education is required for ETE employees'
+                WHEN wt.name = 'Инженер' AND r.specialisation IS NULL
+                    THEN 'Specialisation is required for ETE employees'
+                WHEN wt.name = 'Тестировщик' AND r.lab_id IS NULL
+                    THEN 'Lab ID is required for testers'
+                WHEN wt.name NOT IN ('Рабочий', 'Инженер', 'Тестировщик')
+                    THEN format('Unsupported worker type: %s', wt.name)
+            END AS error
+        FROM employee_rows_from_jsonb(p_employees) r
+        LEFT JOIN worker_types wt ON wt.tp_id = r.worker_type
+        LEFT JOIN grades g ON g.g_id = r.grade_id
+    ) s
+    WHERE s.error IS NOT NULL
+    ORDER BY s.ord
+    LIMIT 1;
+
+    IF v_error IS NOT NULL THEN
+        RAISE EXCEPTION 'Row %: %', v_row, v_error;
+    END IF;
+
+    -- Employee ids are taken from the sequence up front, so the subtype rows can be
+    -- inserted by the same statement.
+    WITH staged AS MATERIALIZED (
+        SELECT nextval(pg_get_serial_sequence('employees', 'w_id')) AS w_id, r.*, wt.name AS type_name
+        FROM employee_rows_from_jsonb(p_employees) r
+        JOIN worker_types wt ON wt.tp_id = r.worker_type
+    ),
+    new_employees AS (
+        INSERT INTO employees (w_id, full_name, hire_date, worker_type, experience, grade_id)
+        SELECT w_id, full_name, COALESCE(hire_date, CURRENT_DATE), worker_type, experience, grade_id
+        FROM staged
+    ),
+    new_workers AS (
+        INSERT INTO workers (w_id, brigade_id, specialisation, is_brigadier)
+        SELECT w_id, brigade_id, specialisation, COALESCE(is_brigadier, FALSE)
+        FROM staged
+        WHERE type_name = 'Рабочий'
+    ),
+    new_ete AS (
+        INSERT INTO ete (w_id, specialisation, education, is_wsh_super, is_master, section)
+        SELECT w_id, specialisation, education, COALESCE(is_wsh_super, FALSE), COALESCE(is_master, FALSE), section
+        FROM staged
+        WHERE type_name = 'Инженер'
+    ),
+    new_testers AS (
+        INSERT INTO testers (w_id, l_id)
+        SELECT w_id, lab_id
+        FROM staged
+        WHERE type_name = 'Тестировщик'
+    )
+    SELECT count(*) INTO p_count FROM staged;
+
+    RAISE NOTICE '% employees added successfully', p_count;
+END;
+$$;
+
+
+-- Строки массива с их номерами (с 1), типизированные по столбцам sp_add_product.
+-- product_type можно не указывать: тогда это название категории изделия.
+CREATE OR REPLACE FUNCTION product_rows_from_jsonb(p_products JSONB)
+RETURNS TABLE(
+    ord                BIGINT,
+    name               VARCHAR,
+    category           INTEGER,
+    workshop_id        INTEGER,
+    begin_date         DATE,
+    product_type       VARCHAR,
+    use_type           VARCHAR,
+    vehicle_type       VARCHAR,
+    cargo_cap          INTEGER,
+    pass_count         INTEGER,
+    eng_count          INTEGER,
+    armaments          VARCHAR,
+    missile_type       VARCHAR,
+    payload            INTEGER,
+    range              INTEGER,
+    text_specification TEXT
+)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT e.ord, r.*
+    FROM jsonb_array_elements(p_products) WITH ORDINALITY AS e(item, ord)
+    CROSS JOIN LATERAL jsonb_to_record(e.item) AS r(
+        name               VARCHAR,
+        category           INTEGER,
+        workshop_id        INTEGER,
+        begin_date         DATE,
+        product_type       VARCHAR,
+        use_type           VARCHAR,
+        vehicle_type       VARCHAR,
+        cargo_cap          INTEGER,
+        pass_count         INTEGER,
+        eng_count          INTEGER,
+        armaments          VARCHAR,
+        missile_type       VARCHAR,
+        payload            INTEGER,
+        range              INTEGER,
+        text_specification TEXT
+    )
+$$;
+
+
+CREATE OR REPLACE PROCEDURE sp_add_products(
+    p_products JSONB,
+    INOUT p_count INTEGER DEFAULT NULL
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_row BIGINT;
+    v_error TEXT;
+BEGIN
+    -- The checks of sp_add_product, for every row at once; the first failing row is reported.
+    SELECT s.ord, s.error
+    INTO v_row, v_error
+    FROM (
+        SELECT
+            r.ord,
+            CASE
+                WHEN r.name IS NULL THEN 'Product name is required'
+                WHEN pc.c_id IS NULL THEN format('Invalid category ID: %s', r.category)
+                WHEN w.wsh_id IS NULL THEN format('Invalid workshop ID: %s', r.workshop_id)
+                WHEN COALESCE(r.product_type, pc.name) = 'Воздушные суда'
+                     AND (r.use_type IS NULL OR r.vehicle_type IS NULL)
+                    THEN 'Use type and vehicle type are required for vehicles'
+                WHEN COALESCE(r.product_type, pc.name) = 'Ракеты' AND r.missile_type IS NULL
+                    THEN 'Missile type is required for missiles'
+                WHEN COALESCE(r.product_type, pc.name) = 'Другой' AND r.text_specification IS NULL
+                    THEN 'Text specification is required for other products'
+                WHEN COALESCE(r.product_type, pc.name) NOT IN ('Воздушные суда', 'Ракеты', 'Другой')
+                    THEN format('Invalid product type: %s', COALESCE(r.product_type, pc.name))
+            END AS error
+        FROM product_rows_from_jsonb(p_products) r
+        LEFT JOIN product_categories pc ON pc.c_id = r.category
+        LEFT JOIN workshops w ON w.wsh_id = r.workshop_id
+    ) s
+    WHERE s.error IS NOT NULL
+    ORDER BY s.ord
+    LIMIT 1;
+
+    IF v_error IS NOT NULL THEN
+        RAISE EXCEPTION 'Row %: %', v_row, v_error;
+    END IF;
+
+    WITH staged AS MATERIALIZED (
+        SELECT
+            nextval(pg_get_serial_sequence('products', 'p_id')) AS p_id,
+            r.*,
+            COALESCE(r.product_type, pc.name) AS kind
+        FROM product_rows_from_jsonb(p_products) r
+        JOIN product_categories pc ON pc.c_id = r.category
+    ),
+    new_products AS (
+        INSERT INTO products (p_id, name, category, begin_date, workshop_id)
+        SELECT p_id, name, category, COALESCE(begin_date, CURRENT_DATE), workshop_id
+        FROM staged
+    ),
+    new_vehicles AS (
+        INSERT INTO vehicles (p_id, use_type, vehicle_type, cargo_cap, pass_count, eng_count, armaments)
+        SELECT p_id, use_type, vehicle_type, cargo_cap, pass_count, eng_count, armaments
+        FROM staged
+        WHERE kind = 'Воздушные суда'
+    ),
+    new_missiles AS (
+        INSERT INTO missiles (p_id, type, payload, range)
+        SELECT p_id, missile_type, payload, range
+        FROM staged
+        WHERE kind = 'Ракеты'
+    ),
+    new_other AS (
+        INSERT INTO other (p_id, text_specification)
+        SELECT p_id, text_specification
+        FROM staged
+        WHERE kind = 'Другой'
+    )
+    SELECT count(*) INTO p_count FROM staged;
+
+    RAISE NOTICE '% products added successfully', p_count;
+END;
+$$;
@@ -12,9 +12,18 @@ JOIN workshops w ON p.workshop_id = w.wsh_id;
 
 
 -- 2) Получить число и перечень изделий отдельной категории и в целом, собранных указанным цехом, участком, предприятием в целом за определенный отрезок времени.
+--    Фильтры уровня агрегации, цеха, участка и категории передаются параметрами-массивами
+--    (NULL - без фильтра; несколько значений сравниваются одним = ANY), и функция вычисляет
+--    только те наборы группировки, строки которых могут им удовлетворять.
+--    Завершённые изделия читаются из посуточной сводки assembly_daily_rollup
+--    (db-init/13-add-assembly-rollup.sql), а не из products JOIN assembly.
 CREATE OR REPLACE FUNCTION get_product_assembly_summary(
     p_start_date DATE,
-    p_end_date   DATE
+    p_end_date   DATE,
+    p_agg_level  TEXT[]    DEFAULT NULL,
+    p_workshop   VARCHAR[] DEFAULT NULL,
+    p_section    VARCHAR[] DEFAULT NULL,
+    p_category   VARCHAR[] DEFAULT NULL
 )
 RETURNS TABLE(
     agg_level      TEXT,
@@ -26,19 +35,44 @@ RETURNS TABLE(
 )
 LANGUAGE plpgsql
 AS $$
+DECLARE
+    v_sets TEXT;
 BEGIN
-RETURN QUERY
+-- Фильтр по цеху, участку или категории оставляет только уровни, группирующие по этому столбцу
+-- (на остальных уровнях столбец равен NULL).
+SELECT string_agg(gs.cols, ', ' ORDER BY gs.ord)
+INTO v_sets
+FROM (VALUES
+    (1, 'enterprise_total',       '()',                                  FALSE, FALSE, FALSE),
+    (2, 'enterprise_by_category', '(category_id)',                       FALSE, FALSE, TRUE),
+    (3, 'workshop_total',         '(w.wsh_id)',                          TRUE,  FALSE, FALSE),
+    (4, 'workshop_by_category',   '(w.wsh_id, category_id)',             TRUE,  FALSE, TRUE),
+    (5, 'section_total',          '(w.wsh_id, section_id)',              TRUE,  TRUE,  FALSE),
+    (6, 'section_by_category',    '(w.wsh_id, section_id, category_id)', TRUE,  TRUE,  TRUE)
+) AS gs(ord, level, cols, by_workshop, by_section, by_category)
+WHERE (p_agg_level IS NULL OR gs.level = ANY(p_agg_level))
+  AND (p_workshop IS NULL OR gs.by_workshop)
+  AND (p_section IS NULL OR gs.by_section)
+  AND (p_category IS NULL OR gs.by_category);
+
+IF v_sets IS NULL THEN
+    RETURN;
+END IF;
+
+RETURN QUERY EXECUTE format($query$
 WITH base AS (
     SELECT
-        p.p_id,
-        p.name AS product_name,
-        p.workshop_id AS wsh_id,
-        a.section_id AS section_id,
-        p.category AS category_id
-    FROM products p
-    JOIN assembly a
-      ON p.p_id = a.product_id
-    WHERE p.end_date BETWEEN p_start_date AND p_end_date
+        u.p_id,
+        u.product_name,
+        r.wsh_id,
+        r.section_id,
+        r.category_id
+    FROM assembly_daily_rollup r
+    CROSS JOIN LATERAL unnest(r.product_ids, r.product_names) AS u(p_id, product_name)
+    WHERE r.day BETWEEN $1 AND $2
+      AND ($3::VARCHAR[] IS NULL OR r.wsh_id IN (SELECT wsh_id FROM workshops WHERE name = ANY($3)))
+      AND ($4::VARCHAR[] IS NULL OR r.section_id IN (SELECT s_id FROM sections WHERE name = ANY($4)))
+      AND ($5::VARCHAR[] IS NULL OR r.category_id IN (SELECT c_id FROM product_categories WHERE name = ANY($5)))
 )
 SELECT
     CASE
@@ -60,7 +94,7 @@ SELECT
     MIN(c.name)::VARCHAR AS category,
 
     COUNT(DISTINCT b.p_id) AS product_count,
-    ARRAY_AGG(DISTINCT b.product_name ORDER BY b.product_name) AS product_list
+    ARRAY_AGG(DISTINCT b.product_name ORDER BY b.product_name)::TEXT[] AS product_list
 
 FROM base b
 LEFT JOIN workshops w ON b.wsh_id = w.wsh_id
@@ -68,20 +102,7 @@ LEFT JOIN sections s ON b.section_id = s.s_id
 LEFT JOIN product_categories c ON b.category_id = c.c_id
 
 GROUP BY
-    GROUPING SETS (
-       -- section by category
-        (w.wsh_id, section_id, category_id),
-        -- section total
-        (w.wsh_id, section_id),
-        -- workshop by category
-        (w.wsh_id, category_id),
-        -- workshop total
-        (w.wsh_id),
-        -- enterprise by category
-        (category_id),
-        -- enterprise total
-        ()
-    )
+    GROUPING SETS (%s)
 
 ORDER BY
     CASE
@@ -92,7 +113,9 @@ ORDER BY
         WHEN GROUPING(w.wsh_id)=0 AND GROUPING(section_id)=0 AND GROUPING(category_id)=1 THEN 5  -- section_total
         ELSE 6                                                                             -- section_by_category
     END,
-    w.wsh_id, section_id, category_id;
+    w.wsh_id, section_id, category_id
+$query$, v_sets)
+USING p_start_date, p_end_date, p_workshop, p_section, p_category;
 END;
 $$;
 
@@ -296,7 +319,7 @@ JOIN products p ON p.p_id = pb.product_id
 JOIN brigade b ON b.b_id = pb.brigade_id
 JOIN workers w ON w.brigade_id = b.b_id
 JOIN employees e ON e.w_id = w.w_id
-JOIN work_types wt ON wt.t_id = w.specialisation
+JOIN work_types wt ON wt.t_id = w.specialisation;
 
 
 -- 10) Получить перечень испытательных лабораторий, участвующих в испытаниях некоторого конкретного изделия.
@@ -0,0 +1,107 @@
+\connect aerospace_factory
+
+-- 1) Notify the application about schema changes, so it can drop its cached catalog.
+--    Only objects of the public schema are reported (plus GRANT and REVOKE, which change what
+--    a role sees): temporary tables and objects of other schemas touch nothing the application
+--    caches. The payload is JSON with the command tag and the object's identity, e.g.
+--    {"tag" : "CREATE VIEW", "object" : "public.v_products"}; the object is null for GRANT and REVOKE.
+--    REFRESH MATERIALIZED VIEW is left out: it only changes data, and the application refreshes
+--    its materialized views itself, so reporting it would start the next refresh.
+CREATE OR REPLACE FUNCTION notify_ddl_change_func()
+RETURNS EVENT_TRIGGER AS $$
+DECLARE
+    cmd RECORD;
+BEGIN
+    FOR cmd IN
+        SELECT DISTINCT command_tag, object_identity
+        FROM pg_event_trigger_ddl_commands()
+        WHERE (schema_name = 'public' OR command_tag IN ('GRANT', 'REVOKE'))
+          AND command_tag <> 'REFRESH MATERIALIZED VIEW'
+    LOOP
+        PERFORM pg_notify('ddl_changes', json_build_object(
+            'tag', cmd.command_tag,
+            'object', CASE WHEN cmd.command_tag IN ('GRANT', 'REVOKE') THEN NULL ELSE cmd.object_identity END
+        )::TEXT);
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE EVENT TRIGGER notify_ddl_change
+ON ddl_command_end
+EXECUTE FUNCTION notify_ddl_change_func();
+
+-- DROP commands report nothing to pg_event_trigger_ddl_commands(), so the dropped objects are
+-- notified from sql_drop, in the same format. Only the objects named by the command: the
+-- indexes, constraints and types dropped along with a table are not reported.
+CREATE OR REPLACE FUNCTION notify_ddl_drop_func()
+RETURNS EVENT_TRIGGER AS $$
+DECLARE
+    obj RECORD;
+BEGIN
+    FOR obj IN
+        SELECT DISTINCT object_identity
+        FROM pg_event_trigger_dropped_objects()
+        WHERE original AND schema_name = 'public'
+    LOOP
+        PERFORM pg_notify('ddl_changes', json_build_object('tag', tg_tag, 'object', obj.object_identity)::TEXT);
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE EVENT TRIGGER notify_ddl_drop
+ON sql_drop
+EXECUTE FUNCTION notify_ddl_drop_func();
+
+-- 2) Notify the application when a table's data changes, so it can drop cached results computed from it.
+--    Statement-level, so a bulk write sends one notification; identical payloads are also merged per transaction.
+CREATE OR REPLACE FUNCTION notify_table_change_func()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('table_changes', TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    tbl TEXT;
+BEGIN
+    FOR tbl IN
+        SELECT tablename FROM pg_tables WHERE schemaname = 'public'
+    LOOP
+        EXECUTE format(
+            'CREATE TRIGGER notify_table_change
+             AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %I
+             FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change_func()',
+            tbl
+        );
+    END LOOP;
+END;
+$$;
+
+-- Tables created later (assembly_daily_rollup of 13 and any other) get the same trigger when
+-- they are created. Temporary tables and tables of other schemas are left alone.
+CREATE OR REPLACE FUNCTION add_notify_table_change_func()
+RETURNS EVENT_TRIGGER AS $$
+DECLARE
+    tbl RECORD;
+BEGIN
+    FOR tbl IN
+        SELECT DISTINCT objid::REGCLASS AS relation
+        FROM pg_event_trigger_ddl_commands()
+        WHERE object_type = 'table' AND schema_name = 'public'
+    LOOP
+        EXECUTE format(
+            'CREATE TRIGGER notify_table_change
+             AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %s
+             FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change_func()',
+            tbl.relation
+        );
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE EVENT TRIGGER add_notify_table_change
+ON ddl_command_end
+WHEN TAG IN ('CREATE TABLE', 'CREATE TABLE AS', 'SELECT INTO')
+EXECUTE FUNCTION add_notify_table_change_func();
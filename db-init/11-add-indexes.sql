@@ -0,0 +1,59 @@
+\connect aerospace_factory
+
+-- 1) Indexes for the typeahead lookup selects (view_filter_config entries marked 'search').
+--    The trigram ones serve name ILIKE '%text%' as well as prefix matches, whatever the collation.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS employees_full_name_trgm_idx
+    ON "employees" USING gin ("full_name" gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS products_name_trgm_idx
+    ON "products" USING gin ("name" gin_trgm_ops);
+
+-- Text shorter than three characters has too few trigrams to narrow the search down, so it
+-- is searched as a prefix of the lowercased name (lookups.search_lookup) on these instead.
+CREATE INDEX IF NOT EXISTS employees_full_name_prefix_idx
+    ON "employees" (lower("full_name") text_pattern_ops);
+
+CREATE INDEX IF NOT EXISTS products_name_prefix_idx
+    ON "products" (lower("name") text_pattern_ops);
+
+-- 2) Foreign keys. PostgreSQL indexes only the referenced side, so without these every join
+--    from a parent and every ON DELETE CASCADE / SET NULL / NO ACTION check scans the child table.
+--    Multi-column ones lead with the key and also cover the DISTINCT pairs the views read.
+CREATE INDEX IF NOT EXISTS sections_workshop_id_idx           ON "sections" ("workshop_id");
+CREATE INDEX IF NOT EXISTS workshop_labs_l_id_idx             ON "workshop_labs" ("l_id");
+CREATE INDEX IF NOT EXISTS workers_brigade_id_idx             ON "workers" ("brigade_id");
+CREATE INDEX IF NOT EXISTS ete_section_idx                    ON "ete" ("section");
+CREATE INDEX IF NOT EXISTS employee_movements_w_id_idx        ON "employee_movements" ("w_id", "move_date");
+CREATE INDEX IF NOT EXISTS masters_w_id_idx                   ON "masters" ("w_id");
+CREATE INDEX IF NOT EXISTS masters_s_id_idx                   ON "masters" ("s_id");
+CREATE INDEX IF NOT EXISTS products_workshop_id_idx           ON "products" ("workshop_id");
+CREATE INDEX IF NOT EXISTS assembly_product_id_brigade_id_idx ON "assembly" ("product_id", "brigade_id");
+CREATE INDEX IF NOT EXISTS assembly_brigade_id_section_id_idx ON "assembly" ("brigade_id", "section_id");
+CREATE INDEX IF NOT EXISTS assembly_section_id_idx            ON "assembly" ("section_id");
+CREATE INDEX IF NOT EXISTS equipment_l_id_idx                 ON "equipment" ("l_id");
+CREATE INDEX IF NOT EXISTS testers_l_id_idx                   ON "testers" ("l_id");
+CREATE INDEX IF NOT EXISTS test_product_id_idx                ON "test" ("product_id");
+CREATE INDEX IF NOT EXISTS test_lab_id_test_date_idx          ON "test" ("lab_id", "test_date");
+CREATE INDEX IF NOT EXISTS test_equipment_id_idx              ON "test" ("equipment_id");
+CREATE INDEX IF NOT EXISTS test_testers_tw_id_idx             ON "test_testers" ("tw_id");
+CREATE INDEX IF NOT EXISTS sections_products_p_id_idx         ON "sections_products" ("p_id");
+
+-- 3) Filter columns.
+-- Period reports: products completed / tests run within a date range.
+CREATE INDEX IF NOT EXISTS products_end_date_idx ON "products" ("end_date");
+CREATE INDEX IF NOT EXISTS test_test_date_idx    ON "test" ("test_date");
+
+-- Work in progress (v_currently_assembling, v_ongoing_product_counts): open assemblies
+-- and unfinished products are a small, hot part of tables that otherwise only grow.
+CREATE INDEX IF NOT EXISTS assembly_open_idx
+    ON "assembly" ("product_id", "section_id") WHERE "end_date" IS NULL;
+CREATE INDEX IF NOT EXISTS products_open_idx
+    ON "products" ("p_id") INCLUDE ("name", "category") WHERE "end_date" IS NULL;
+
+-- Current staff (leave_date IS NULL).
+CREATE INDEX IF NOT EXISTS employees_active_idx
+    ON "employees" ("w_id") WHERE "leave_date" IS NULL;
+
+ANALYZE;
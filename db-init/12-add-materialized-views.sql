@@ -0,0 +1,21 @@
+\connect aerospace_factory
+
+-- Materialized copies of the heaviest summaries. The application reads them by default and
+-- refreshes them CONCURRENTLY shortly after the tables they read change (src/materialized.py);
+-- a user can still ask for the live view.
+-- REFRESH ... CONCURRENTLY needs a unique index over all rows; subtotal rows have NULL keys,
+-- hence NULLS NOT DISTINCT.
+
+-- 14) Число и перечень изделий, собираемых в настоящее время.
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_ongoing_product_counts AS
+SELECT * FROM v_ongoing_product_counts;
+
+CREATE UNIQUE INDEX IF NOT EXISTS mv_ongoing_product_counts_key
+    ON mv_ongoing_product_counts (workshop_name, section_name, category_name) NULLS NOT DISTINCT;
+
+-- 4) Число и перечень участков цехов и их начальников.
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_sections_and_chiefs_summary AS
+SELECT * FROM v_sections_and_chiefs_summary;
+
+CREATE UNIQUE INDEX IF NOT EXISTS mv_sections_and_chiefs_summary_key
+    ON mv_sections_and_chiefs_summary (wsh_id) NULLS NOT DISTINCT;
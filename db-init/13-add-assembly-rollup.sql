@@ -0,0 +1,161 @@
+\connect aerospace_factory
+
+-- Daily rollup of completed products, read by get_product_assembly_summary instead of
+-- products JOIN assembly. One row per (completion day, workshop, section, category) holds
+-- the products completed that day which were assembled on that section; the product ids
+-- are kept (not just counts) because coarser levels of the summary count distinct products
+-- and a product may be assembled on several sections.
+-- Maintained by the statement-level triggers below: a change to products or assembly
+-- recounts only the completion days it touches. Its notify_table_change trigger is added on
+-- creation by the add_notify_table_change event trigger (10-add-notifications.sql).
+CREATE TABLE IF NOT EXISTS assembly_daily_rollup (
+    day            DATE     NOT NULL,
+    wsh_id         INTEGER  NOT NULL,
+    section_id     INTEGER  NOT NULL,
+    category_id    INTEGER  NOT NULL,
+    product_count  INTEGER  NOT NULL,
+    product_ids    BIGINT[] NOT NULL,
+    product_names  TEXT[]   NOT NULL,  -- in the order of product_ids
+    PRIMARY KEY (day, wsh_id, section_id, category_id)
+);
+
+GRANT SELECT ON TABLE assembly_daily_rollup TO Workshop_manager;
+
+-- 1) Recount the given completion days from products and assembly.
+--    SECURITY DEFINER, so writers of products and assembly need no rights on the rollup.
+CREATE OR REPLACE FUNCTION refresh_assembly_rollup(p_days DATE[])
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_days DATE[];
+BEGIN
+    SELECT array_agg(DISTINCT d ORDER BY d)
+    INTO v_days
+    FROM unnest(p_days) AS d
+    WHERE d IS NOT NULL;
+
+    IF v_days IS NULL THEN
+        RETURN;
+    END IF;
+
+    -- One writer per day at a time, taken in day order. Each statement below takes a fresh
+    -- snapshot once the locks are held, so concurrent transactions never recount a day from
+    -- each other's stale state.
+    PERFORM pg_advisory_xact_lock(hashtext('assembly_daily_rollup'), d - DATE '2000-01-01')
+    FROM unnest(v_days) AS d;
+
+    DELETE FROM assembly_daily_rollup WHERE day = ANY(v_days);
+
+    INSERT INTO assembly_daily_rollup (day, wsh_id, section_id, category_id, product_count, product_ids, product_names)
+    SELECT
+        day, wsh_id, section_id, category_id,
+        COUNT(*),
+        array_agg(p_id ORDER BY p_id),
+        array_agg(name ORDER BY p_id)
+    FROM (
+        SELECT DISTINCT
+            p.end_date    AS day,
+            p.workshop_id AS wsh_id,
+            a.section_id,
+            p.category    AS category_id,
+            p.p_id,
+            p.name::TEXT  AS name
+        FROM products p
+        JOIN assembly a ON a.product_id = p.p_id
+        WHERE p.end_date = ANY(v_days)
+    ) completed
+    GROUP BY day, wsh_id, section_id, category_id;
+END;
+$$;
+
+-- 2) Изделие завершено, перенесено в другой цех или категорию, переименовано или удалено.
+CREATE OR REPLACE FUNCTION assembly_rollup_on_products_func()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        PERFORM refresh_assembly_rollup(ARRAY(
+            SELECT d
+            FROM old_products o
+            JOIN new_products n USING (p_id)
+            CROSS JOIN LATERAL (VALUES (o.end_date), (n.end_date)) AS v(d)
+            WHERE (o.end_date, o.workshop_id, o.category, o.name)
+                  IS DISTINCT FROM (n.end_date, n.workshop_id, n.category, n.name)
+        ));
+    ELSE
+        PERFORM refresh_assembly_rollup(ARRAY(SELECT end_date FROM old_products));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Transition tables allow neither column lists nor several events per trigger,
+-- hence one trigger per event and the end_date check inside the function.
+CREATE TRIGGER assembly_rollup_on_products_update
+AFTER UPDATE ON products
+REFERENCING OLD TABLE AS old_products NEW TABLE AS new_products
+FOR EACH STATEMENT
+EXECUTE FUNCTION assembly_rollup_on_products_func();
+
+CREATE TRIGGER assembly_rollup_on_products_delete
+AFTER DELETE ON products
+REFERENCING OLD TABLE AS old_products
+FOR EACH STATEMENT
+EXECUTE FUNCTION assembly_rollup_on_products_func();
+
+-- 3) Работа по сборке завершённого изделия добавлена, перенесена на другой участок или удалена.
+CREATE OR REPLACE FUNCTION assembly_rollup_on_assembly_func()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_products BIGINT[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        v_products := ARRAY(SELECT product_id FROM new_assembly);
+    ELSIF TG_OP = 'DELETE' THEN
+        v_products := ARRAY(SELECT product_id FROM old_assembly);
+    ELSE
+        v_products := ARRAY(
+            SELECT v.product_id
+            FROM old_assembly o
+            JOIN new_assembly n USING (a_id)
+            CROSS JOIN LATERAL (VALUES (o.product_id), (n.product_id)) AS v(product_id)
+            WHERE (o.product_id, o.section_id) IS DISTINCT FROM (n.product_id, n.section_id)
+        );
+    END IF;
+
+    PERFORM refresh_assembly_rollup(ARRAY(
+        SELECT end_date
+        FROM products
+        WHERE p_id = ANY(v_products)
+          AND end_date IS NOT NULL
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER assembly_rollup_on_assembly_insert
+AFTER INSERT ON assembly
+REFERENCING NEW TABLE AS new_assembly
+FOR EACH STATEMENT
+EXECUTE FUNCTION assembly_rollup_on_assembly_func();
+
+CREATE TRIGGER assembly_rollup_on_assembly_update
+AFTER UPDATE ON assembly
+REFERENCING OLD TABLE AS old_assembly NEW TABLE AS new_assembly
+FOR EACH STATEMENT
+EXECUTE FUNCTION assembly_rollup_on_assembly_func();
+
+CREATE TRIGGER assembly_rollup_on_assembly_delete
+AFTER DELETE ON assembly
+REFERENCING OLD TABLE AS old_assembly
+FOR EACH STATEMENT
+EXECUTE FUNCTION assembly_rollup_on_assembly_func();
+
+-- Fill the rollup from the data loaded so far.
+SELECT refresh_assembly_rollup(ARRAY(
+    SELECT DISTINCT end_date FROM products WHERE end_date IS NOT NULL
+));
+
+ANALYZE assembly_daily_rollup;
@@ -1,8 +1,12 @@
 from typing import Callable
 from nicegui import ui
-from psycopg import sql, OperationalError, IsolationLevel
+from psycopg import sql, IsolationLevel
 
 from src.utils import create_date_input_field
+from ui_common import with_loading
+from lookups import lookup_cache
+from db import error_message
+from retry import execute_transaction
 
 add_dialog_builders: dict[str, Callable] = {}
 
@@ -13,15 +17,15 @@ def register_dialog(table_name: str):
     return decorator
 
 
-def fetch_options(conn, table_type='employees'):
+async def fetch_options(pool, table_type='employees'):
     """
-    Fetches option lists and ID mappings for select widgets in one cursor context.
+    Fetches option lists and ID mappings for select widgets from the shared lookup cache.
     Returns a tuple (options, id_maps) where:
       - options is a dict of lists for UI selects
       - id_maps is a dict of dicts mapping name -> id
 
     Args:
-        conn: Database connection
+        pool: The role's connection pool
         table_type: Type of options to fetch ('employees' or 'products')
     """
     if table_type == 'employees':
@@ -43,26 +47,17 @@ def fetch_options(conn, table_type='employees'):
 
     options = {}
     id_maps = {}
-    with conn.cursor() as cur:
-        with conn.transaction():
-            for key, (tbl, namecol, idcol) in tables.items():
-                q = sql.SQL("SELECT {id}, {name} FROM {tbl} ORDER BY {id}").format(
-                    id=sql.Identifier(idcol),
-                    name=sql.Identifier(namecol),
-                    tbl=sql.Identifier(tbl)
-                )
-                cur.execute(q)
-                rows = cur.fetchall()
-                # build option list and id map
-                options[f"{key}_options"] = [row[1] for row in rows]
-                id_maps[f"{key}_map"] = {row[1]: row[0] for row in rows}
+    lookups = await lookup_cache.get_many(pool, list(tables.values()))
+    for key, spec in tables.items():
+        options[f"{key}_options"] = lookups[spec].options
+        id_maps[f"{key}_map"] = lookups[spec].id_map
 
     return options, id_maps
 
 @register_dialog('employees')
-def build_employees_dialog(conn, table_name):
+async def build_employees_dialog(pool, table_name):
     try:
-        opts, id_maps = fetch_options(conn)
+        opts, id_maps = await fetch_options(pool)
     except Exception as e:
         ui.notify(f"Error fetching options: {e}", color='negative')
         opts = {k + '_options': [] for k in ['grade', 'worker_type', 'brigade', 'specialisation', 'section', 'lab']}
@@ -86,7 +81,7 @@ def build_employees_dialog(conn, table_name):
         section_input = ui.select(opts['section_options'], label='Section')
         lab_input = ui.select(opts['lab_options'], label='Lab')
 
-        def on_submit():
+        async def on_submit():
             full_name = name.value
             hire_val = hire_date.value
             wt_name = worker_type.value
@@ -149,32 +144,23 @@ def build_employees_dialog(conn, table_name):
                 sect_id,
                 lab_id
             ]
-            max_retries = 5
-            for attempt in range(1, max_retries + 1):
-                try:
-                    conn.isolation_level = 3 # REPEATABLE READ
-                    with conn.transaction():
-                        conn.execute(call_q, params)
-                    ui.notify("Employee created via stored procedure")
-                    dialog.close()
-                    break
-                except OperationalError as e:
-                    if attempt == max_retries:
-                        ui.notify(f"Ошибка сериализации после {max_retries} попыток: {e}", color='negative')
-                except Exception as e:
-                    ui.notify(f"Error calling sp_add_employee: {e}", color='negative')
-                    break
-                finally:
-                    conn.isolation_level = None
+            try:
+                await execute_transaction(pool, call_q, params, label='sp_add_employee',
+                                          isolation_level=IsolationLevel.REPEATABLE_READ)
+            except Exception as e:
+                ui.notify(f"Error calling sp_add_employee: {error_message(e)}", color='negative')
+                return
+            ui.notify("Employee created via stored procedure")
+            dialog.close()
 
-        ui.button('Create', on_click=on_submit).classes('q-btn-primary')
+        ui.button('Create', on_click=with_loading(on_submit)).classes('q-btn-primary')
     return dialog
 
 
 @register_dialog('products')
-def build_products_dialog(conn, table_name):
+async def build_products_dialog(pool, table_name):
     try:
-        opts, id_maps = fetch_options(conn, table_type='products')
+        opts, id_maps = await fetch_options(pool, table_type='products')
     except Exception as e:
         ui.notify(f"Error fetching options: {e}", color='negative')
         opts = {k + '_options': [] for k in ['category', 'workshop']}
@@ -203,7 +189,7 @@ def build_products_dialog(conn, table_name):
 
         text_spec = ui.textarea(label='Text Specification')
 
-        def on_submit():
+        async def on_submit():
             # gather core
             p_name = name_input.value
             p_category_name = category_input.value
@@ -266,24 +252,15 @@ def build_products_dialog(conn, table_name):
                 p_text_spec
             ]
 
-            max_retries = 5
-            for attempt in range(1, max_retries+1):
-                try:
-                    conn.isolation_level = 3  # REPEATABLE READ
-                    with conn.transaction():
-                        conn.execute(call_q, params)
-                    ui.notify(f"Product '{p_name}' created successfully")
-                    dialog.close()
-                    break
-                except OperationalError as e:
-                    if attempt == max_retries:
-                        ui.notify(f"Serialization failure after {max_retries} attempts: {e}", color='negative')
-                except Exception as e:
-                    ui.notify(f"Error calling sp_add_product: {e}", color='negative')
-                    break
-                finally:
-                    conn.isolation_level = None
+            try:
+                await execute_transaction(pool, call_q, params, label='sp_add_product',
+                                          isolation_level=IsolationLevel.REPEATABLE_READ)
+            except Exception as e:
+                ui.notify(f"Error calling sp_add_product: {error_message(e)}", color='negative')
+                return
+            ui.notify(f"Product '{p_name}' created successfully")
+            dialog.close()
 
-        ui.button('Create', on_click=on_submit).classes('q-btn-primary')
+        ui.button('Create', on_click=with_loading(on_submit)).classes('q-btn-primary')
 
     return dialog
@@ -10,8 +10,8 @@ class User:
     def get_role(self) -> str:
         return self.role
 
-    def change_role(self, new_role: str) -> bool:
-        success = db_manager.connect(new_role)
+    async def change_role(self, new_role: str) -> bool:
+        success = await db_manager.connect(new_role)
         if success:
             self.role = new_role
         return success
@@ -19,4 +19,3 @@ class User:
     def logout(self):
         self.role = ''
         ui.notify(f"Logged out")
-        db_manager.disconnect()
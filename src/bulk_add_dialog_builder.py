@@ -0,0 +1,202 @@
+import os
+import re
+import tempfile
+import time
+from typing import Callable
+
+import psycopg
+from nicegui import ui
+from psycopg import sql
+from psycopg.types.json import Jsonb
+
+from add_dialog_builder import fetch_options
+from config import IMPORT_BATCH_ROWS, IMPORT_MAX_FILE_BYTES
+from db import error_message
+from csv_import import open_csv, normalize_header, CONVERTERS
+from ui_common import format_size
+
+bulk_add_dialog_builders: dict[str, Callable] = {}
+
+def register_dialog(table_name: str):
+    def decorator(fn: Callable):
+        bulk_add_dialog_builders[table_name] = fn
+        return fn
+    return decorator
+
+
+# CSV column -> (field of the bulk procedure's JSON rows, how to read it): either a key of the
+# id maps of add_dialog_builder.fetch_options, for lookups given by name, or a column type of
+# csv_import.CONVERTERS ('text' is sent as is)
+EMPLOYEE_COLUMNS = {
+    'full_name': ('full_name', 'text'),
+    'hire_date': ('hire_date', 'date'),
+    'worker_type': ('worker_type', 'worker_type_map'),
+    'experience': ('experience', 'integer'),
+    'grade': ('grade_id', 'grade_map'),
+    'brigade': ('brigade_id', 'brigade_map'),
+    'specialisation': ('specialisation', 'specialisation_map'),
+    'is_brigadier': ('is_brigadier', 'boolean'),
+    'education': ('education', 'text'),
+    'is_wsh_super': ('is_wsh_super', 'boolean'),
+    'is_master': ('is_master', 'boolean'),
+    'section': ('section', 'section_map'),
+    'lab': ('lab_id', 'lab_map'),
+}
+
+PRODUCT_COLUMNS = {
+    'name': ('name', 'text'),
+    'category': ('category', 'category_map'),
+    'workshop': ('workshop_id', 'workshop_map'),
+    'begin_date': ('begin_date', 'date'),
+    'use_type': ('use_type', 'text'),
+    'vehicle_type': ('vehicle_type', 'text'),
+    'cargo_cap': ('cargo_cap', 'integer'),
+    'pass_count': ('pass_count', 'integer'),
+    'eng_count': ('eng_count', 'integer'),
+    'armaments': ('armaments', 'text'),
+    'missile_type': ('missile_type', 'text'),
+    'payload': ('payload', 'integer'),
+    'range': ('range', 'integer'),
+    'text_specification': ('text_specification', 'text'),
+}
+
+# Errors shown in the dialog before the rest are summed up
+MAX_SHOWN_ERRORS = 10
+
+
+def read_bulk_rows(path: str, columns: dict, id_maps: dict) -> tuple[list[dict], list[int], list[str]]:
+    """
+    JSON rows for a bulk procedure from a CSV file, the CSV line of each, and the errors found.
+    Lookup names are turned into ids and other fields parsed by type; empty fields are left out.
+    """
+    rows, lines, errors = [], [], []
+    with open_csv(path) as (_, reader):
+        header = next(reader, None)
+        if not header:
+            return rows, lines, ['The file is empty']
+        names = [normalize_header(title) for title in header]
+        unknown = [title for title, name in zip(header, names) if name not in columns]
+        if unknown:
+            return rows, lines, [f"Unknown columns: {', '.join(unknown)}. Expected some of: {', '.join(columns)}"]
+
+        for fields in reader:
+            if not any(fields):  # blank line
+                continue
+            if len(fields) != len(names):
+                errors.append(f'Line {reader.line_num}: expected {len(names)} fields, got {len(fields)}')
+                continue
+            row = {}
+            for name, text in zip(names, fields):
+                text = text.strip()
+                if not text:
+                    continue
+                field, kind = columns[name]
+                if kind.endswith('_map'):
+                    if text not in id_maps[kind]:
+                        errors.append(f'Line {reader.line_num}: unknown {name} {text!r}')
+                        continue
+                    row[field] = id_maps[kind][text]
+                elif kind in CONVERTERS:
+                    try:
+                        value = CONVERTERS[kind](text)
+                    except (ValueError, ArithmeticError):
+                        errors.append(f'Line {reader.line_num}: {name} {text!r} is not a valid {kind}')
+                        continue
+                    row[field] = value.isoformat() if hasattr(value, 'isoformat') else value
+                else:
+                    row[field] = text
+            rows.append(row)
+            lines.append(reader.line_num)
+    return rows, lines, errors
+
+
+async def call_bulk(pool, procedure: str, rows: list[dict], lines: list[int], on_progress=None) -> int:
+    """
+    Add rows with a set-based bulk procedure, IMPORT_BATCH_ROWS per CALL, all in one transaction.
+    A row the procedure rejects is reported by its CSV line.
+    """
+    added = 0
+    query = sql.SQL("CALL {}(%s)").format(sql.Identifier(procedure))
+    async with pool.connection() as conn, conn.transaction(), conn.cursor() as cur:
+        for start in range(0, len(rows), IMPORT_BATCH_ROWS):
+            try:
+                await cur.execute(query, [Jsonb(rows[start:start + IMPORT_BATCH_ROWS])])
+            except psycopg.errors.RaiseException as e:
+                # the procedures report the failing row as 'Row N: ...', counted within the CALL
+                match = re.match(r'Row (\d+): (.*)', e.diag.message_primary or '')
+                if match:
+                    raise ValueError(f'Line {lines[start + int(match[1]) - 1]}: {match[2]}') from e
+                raise
+            added += (await cur.fetchone())[0]
+            if on_progress:
+                on_progress(added)
+    return added
+
+
+async def build_bulk_dialog(pool, title: str, procedure: str, columns: dict, table_type: str):
+    try:
+        _, id_maps = await fetch_options(pool, table_type)
+    except Exception as e:
+        ui.notify(f"Error fetching options: {e}", color='negative')
+        return ui.dialog()
+
+    with ui.dialog() as dialog, ui.card().classes('w-1/2'):
+        ui.label(title).classes('text-h6')
+        ui.label(
+            f"CSV columns: {', '.join(columns)}. Lookups are given by name, as in the add dialog. "
+            "Every row is added in one transaction, so one invalid row adds nothing."
+        ).classes('text-caption')
+        status = ui.label()
+        errors_column = ui.column().classes('gap-0')
+
+        def show_errors(errors):
+            errors_column.clear()
+            with errors_column:
+                for error in errors[:MAX_SHOWN_ERRORS]:
+                    ui.label(error).classes('text-negative text-caption')
+                if len(errors) > MAX_SHOWN_ERRORS:
+                    ui.label(f'... and {len(errors) - MAX_SHOWN_ERRORS} more').classes('text-negative text-caption')
+
+        async def on_upload(e):
+            show_errors([])
+            fd, upload_path = tempfile.mkstemp(suffix='.csv')
+            os.close(fd)
+            started = time.monotonic()
+
+            def report(added):
+                elapsed = time.monotonic() - started
+                status.set_text(f'{added:,} of {len(rows):,} rows added, {added / elapsed if elapsed else 0:,.0f} rows/s')
+
+            try:
+                await e.file.save(upload_path)
+                rows, lines, errors = read_bulk_rows(upload_path, columns, id_maps)
+                if errors:
+                    status.set_text(f'Nothing was added: {len(errors)} invalid row(s)')
+                    show_errors(errors)
+                    return
+                added = await call_bulk(pool, procedure, rows, lines, report)
+                report(added)
+                ui.notify(f'{added:,} rows added', color='positive')
+            except (ValueError, UnicodeDecodeError, psycopg.Error) as err:
+                status.set_text('Nothing was added')
+                show_errors([error_message(err)])
+            finally:
+                os.unlink(upload_path)
+                upload.reset()
+
+        upload = ui.upload(
+            label='CSV file', auto_upload=True, max_file_size=IMPORT_MAX_FILE_BYTES, on_upload=on_upload,
+            on_rejected=lambda: ui.notify(f'Files up to {format_size(IMPORT_MAX_FILE_BYTES)} can be uploaded',
+                                          color='negative')
+        ).props('accept=".csv,text/csv"').classes('w-full')
+    return dialog
+
+
+@register_dialog('employees')
+async def build_bulk_employees_dialog(pool, table_name):
+    return await build_bulk_dialog(pool, 'Bulk add employees', 'sp_add_employees', EMPLOYEE_COLUMNS, 'employees')
+
+
+@register_dialog('products')
+async def build_bulk_products_dialog(pool, table_name):
+    return await build_bulk_dialog(pool, 'Bulk add products', 'sp_add_products', PRODUCT_COLUMNS, 'products')
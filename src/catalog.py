@@ -0,0 +1,268 @@
+import asyncio
+import json
+import time
+from collections import defaultdict
+
+from psycopg_pool import AsyncConnectionPool
+
+# Channel the DDL event trigger (db-init/10-add-notifications.sql) notifies on
+DDL_CHANNEL = 'ddl_changes'
+# Commands reported on DDL_CHANNEL that change data, not definitions: no cache is dropped for them
+DATA_ONLY_TAGS = frozenset({'REFRESH MATERIALIZED VIEW'})
+
+
+def ddl_change(payload: str | None) -> tuple[str, str | None] | None:
+    """
+    (command tag, object name) of a DDL notification. The name is that of the table, view or
+    function the command created, altered or dropped, without schema, column or arguments; None
+    when the command names no single object (GRANT, REVOKE). None for the None of a reconnect.
+    """
+    if payload is None:
+        return None
+    try:
+        change = json.loads(payload)
+    except ValueError:
+        return payload, None
+    identity = change.get('object')
+    if identity is None:
+        return change['tag'], None
+    # triggers, rules and constraints are identified as "<name> on <table>"
+    identity = identity.rsplit(' on ', 1)[-1].split('(', 1)[0]
+    parts = identity.split('.')
+    return change['tag'], parts[min(1, len(parts) - 1)].strip('"')
+
+
+async def get_all_views(conn) -> list[str]:
+    """
+    Return a list of all views in the database.
+    """
+    sql = """
+          SELECT table_schema, table_name
+          FROM information_schema.views
+          WHERE table_schema NOT IN ('pg_catalog', 'information_schema')
+          ORDER BY table_schema, table_name;
+          """
+    async with conn.cursor() as cur:
+        await cur.execute(sql)
+        return [f"{name}" for schema, name in await cur.fetchall()]
+
+
+async def get_all_functions(conn) -> list[str]:
+    """
+    Return a list of all functions in the database.
+    """
+    sql = """
+        SELECT
+        n.nspname AS schema,
+        p.proname AS function_name
+        FROM pg_proc p
+        JOIN pg_namespace n ON n.oid = p.pronamespace
+        WHERE
+        n.nspname NOT IN ('pg_catalog', 'information_schema')
+        -- Keep only normal functions
+        AND p.prokind = 'f'
+        -- Exclude trigger functions
+        AND pg_catalog.pg_get_function_result(p.oid) != 'trigger'
+        ORDER BY function_name;
+    """
+    async with conn.cursor() as cur:
+        await cur.execute(sql)
+        return [f"{name}" for schema, name in await cur.fetchall()]
+
+
+async def get_privilege_matrix(conn):
+    """
+    Проверяет привилегии текущего пользователя для всех таблиц и представлений схемы public одним запросом.
+    Возвращает пару словарей:
+      - relation -> {'SELECT', 'INSERT', 'UPDATE', 'DELETE'} с булевыми значениями
+        (INSERT и UPDATE истинны, если разрешены хотя бы для одного столбца);
+      - relation -> {'INSERT': [столбцы], 'UPDATE': [столбцы]} с учётом привилегий на уровне столбцов.
+    """
+    query = """
+        SELECT c.relname,
+               has_table_privilege(c.oid, 'SELECT'),
+               has_any_column_privilege(c.oid, 'INSERT'),
+               has_any_column_privilege(c.oid, 'UPDATE'),
+               has_table_privilege(c.oid, 'DELETE'),
+               ARRAY(SELECT a.attname
+                     FROM pg_attribute a
+                     WHERE a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+                       AND has_column_privilege(c.oid, a.attnum, 'INSERT')
+                     ORDER BY a.attnum),
+               ARRAY(SELECT a.attname
+                     FROM pg_attribute a
+                     WHERE a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+                       AND has_column_privilege(c.oid, a.attnum, 'UPDATE')
+                     ORDER BY a.attnum)
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = 'public'
+          AND c.relkind IN ('r', 'p', 'v', 'm')
+        ORDER BY c.relname;
+    """
+    privileges = {}
+    column_privileges = {}
+    async with conn.cursor() as cur:
+        await cur.execute(query)
+        for name, can_select, can_insert, can_update, can_delete, insert_cols, update_cols in await cur.fetchall():
+            privileges[name] = {'SELECT': can_select, 'INSERT': can_insert, 'UPDATE': can_update, 'DELETE': can_delete}
+            column_privileges[name] = {'INSERT': insert_cols, 'UPDATE': update_cols}
+    return privileges, column_privileges
+
+
+async def get_view_tables(conn) -> dict[str, set[str]]:
+    """
+    Return view / materialized view -> the base tables it reads, followed through nested views.
+    """
+    # a view's rewrite rule depends on the relations it selects from
+    query = """
+        WITH RECURSIVE deps(view_oid, ref_oid) AS (
+            SELECT r.ev_class, d.refobjid
+            FROM pg_rewrite r
+            JOIN pg_depend d ON d.classid = 'pg_rewrite'::regclass AND d.objid = r.oid
+                            AND d.refclassid = 'pg_class'::regclass AND d.refobjid <> r.ev_class
+            UNION
+            SELECT deps.view_oid, d.refobjid
+            FROM deps
+            JOIN pg_rewrite r ON r.ev_class = deps.ref_oid
+            JOIN pg_depend d ON d.classid = 'pg_rewrite'::regclass AND d.objid = r.oid
+                            AND d.refclassid = 'pg_class'::regclass AND d.refobjid <> r.ev_class
+        )
+        SELECT v.relname, t.relname
+        FROM deps
+        JOIN pg_class v ON v.oid = deps.view_oid
+        JOIN pg_namespace n ON n.oid = v.relnamespace
+        JOIN pg_class t ON t.oid = deps.ref_oid
+        WHERE n.nspname = 'public'
+          AND t.relkind IN ('r', 'p');
+    """
+    view_tables = defaultdict(set)
+    async with conn.cursor() as cur:
+        await cur.execute(query)
+        for view, table in await cur.fetchall():
+            view_tables[view].add(table)
+    return view_tables
+
+
+class Catalog:
+    """
+    Snapshot of the schema objects visible to one role.
+
+    columns:           table/view -> [(column_name, data_type, is_nullable)], as information_schema reports them
+    primary_keys:      table -> [column_name] in key order
+    foreign_keys:      table -> [(column_name, referenced_table, referenced_column)]
+    privileges:        table/view -> {'SELECT': bool, 'INSERT': bool, 'UPDATE': bool, 'DELETE': bool}
+    column_privileges: table/view -> {'INSERT': [column_name], 'UPDATE': [column_name]}
+    view_tables:       view -> {base tables it reads, through other views too}
+    """
+    def __init__(self):
+        self.tables: list[str] = []
+        self.privileges: dict[str, dict[str, bool]] = {}
+        self.column_privileges: dict[str, dict[str, list[str]]] = {}
+        self.columns: dict[str, list[tuple[str, str, str]]] = defaultdict(list)
+        self.primary_keys: dict[str, list[str]] = defaultdict(list)
+        self.foreign_keys: dict[str, list[tuple[str, str, str]]] = defaultdict(list)
+        self.view_tables: dict[str, set[str]] = defaultdict(set)
+        self.views: list[str] = []
+        self.functions: list[str] = []
+        self.loaded_at = time.time()
+
+
+async def load_catalog(conn) -> Catalog:
+    """
+    Load a Catalog with a handful of set-based pg_catalog queries,
+    instead of one information_schema round trip per table.
+    """
+    catalog = Catalog()
+    catalog.privileges, catalog.column_privileges = await get_privilege_matrix(conn)
+
+    async with conn.cursor() as cur:
+        await cur.execute("""
+            SELECT c.relname,
+                   c.relkind IN ('r', 'p'),
+                   a.attname,
+                   format_type(a.atttypid, NULL),
+                   CASE WHEN a.attnotnull THEN 'NO' ELSE 'YES' END
+            FROM pg_attribute a
+            JOIN pg_class c ON c.oid = a.attrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = 'public'
+              AND c.relkind IN ('r', 'p', 'v', 'm')
+              AND a.attnum > 0
+              AND NOT a.attisdropped
+            ORDER BY c.relname, a.attnum;
+        """)
+        for relname, is_table, column_name, data_type, is_nullable in await cur.fetchall():
+            if is_table and relname not in catalog.columns and catalog.privileges[relname]['SELECT']:
+                catalog.tables.append(relname)
+            catalog.columns[relname].append((column_name, data_type, is_nullable))
+
+        await cur.execute("""
+            SELECT con.contype, c.relname, a.attname, rc.relname, ra.attname
+            FROM pg_constraint con
+            JOIN pg_class c ON c.oid = con.conrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            CROSS JOIN LATERAL unnest(con.conkey, con.confkey) WITH ORDINALITY AS k(attnum, ref_attnum, ord)
+            JOIN pg_attribute a ON a.attrelid = con.conrelid AND a.attnum = k.attnum
+            LEFT JOIN pg_class rc ON rc.oid = con.confrelid
+            LEFT JOIN pg_attribute ra ON ra.attrelid = con.confrelid AND ra.attnum = k.ref_attnum
+            WHERE n.nspname = 'public'
+              AND con.contype IN ('p', 'f')
+            ORDER BY c.relname, con.conname, k.ord;
+        """)
+        for contype, relname, column_name, ref_table, ref_column in await cur.fetchall():
+            if contype == 'p':
+                catalog.primary_keys[relname].append(column_name)
+            else:
+                catalog.foreign_keys[relname].append((column_name, ref_table, ref_column))
+
+    catalog.view_tables = await get_view_tables(conn)
+    catalog.views = await get_all_views(conn)
+    catalog.functions = await get_all_functions(conn)
+    return catalog
+
+
+class CatalogCache:
+    """
+    In-memory Catalog per role, shared by every session and dialog builder.
+    Loaded on first use, dropped on demand or when a DDL notification arrives.
+    """
+    def __init__(self):
+        self._catalogs: dict[str, Catalog] = {}
+        self._locks: dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._generation = 0
+
+    async def get(self, pool: AsyncConnectionPool) -> Catalog:
+        # pools are named after their role
+        role = pool.name
+        catalog = self._catalogs.get(role)
+        if catalog is not None:
+            return catalog
+
+        async with self._locks[role]:
+            if role not in self._catalogs:
+                generation = self._generation
+                async with pool.connection() as conn:
+                    catalog = await load_catalog(conn)
+                # don't keep a snapshot that was invalidated while it was loading
+                if generation != self._generation:
+                    return catalog
+                self._catalogs[role] = catalog
+            return self._catalogs[role]
+
+    def invalidate(self, role: str | None = None):
+        self._generation += 1
+        if role is None:
+            self._catalogs.clear()
+        else:
+            self._catalogs.pop(role, None)
+
+    def on_ddl_change(self, payload: str | None):
+        change = ddl_change(payload)
+        if change is not None and change[0] in DATA_ONLY_TAGS:
+            return
+        self.invalidate()
+
+
+catalog_cache = CatalogCache()
+
@@ -5,3 +5,64 @@ load_dotenv()
 
 DSN_ADMIN = os.getenv('ADMIN_DATABASE_URL')
 DSN_HR = os.getenv('HR_DATABASE_URL')
+# Connection used to LISTEN for schema and data change notifications
+LISTEN_DSN = os.getenv('LISTEN_DATABASE_URL', DSN_ADMIN)
+
+# Connection pool settings, shared by every role pool
+POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', '1'))
+POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '10'))
+POOL_MAX_IDLE = float(os.getenv('DB_POOL_MAX_IDLE', '300'))
+POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))
+
+# Row cap for one page of a streamed result (custom SQL box, generic filters), per role
+FETCH_ROW_CAP = {
+    'admin': int(os.getenv('ADMIN_FETCH_ROW_CAP', '1000')),
+    'hr': int(os.getenv('HR_FETCH_ROW_CAP', '500')),
+}
+FETCH_BATCH_SIZE = int(os.getenv('DB_FETCH_BATCH_SIZE', '200'))
+# A streamed result keeps its pooled connection; release it after this many idle seconds
+STREAM_IDLE_TIMEOUT = float(os.getenv('DB_STREAM_IDLE_TIMEOUT', '120'))
+
+# Server-side paginated table browsing
+BROWSE_ROWS_PER_PAGE = int(os.getenv('BROWSE_ROWS_PER_PAGE', '50'))
+# Tables estimated (pg_class.reltuples) above this size get an estimated rather than exact row count
+EXACT_COUNT_LIMIT = int(os.getenv('EXACT_COUNT_LIMIT', '100000'))
+
+# Large results are sent to the browser in messages of at most this many bytes of row JSON
+ROW_PUSH_MAX_BYTES = int(os.getenv('ROW_PUSH_MAX_BYTES', '262144'))
+# Seconds to wait for the browser to acknowledge one message before sending the next
+ROW_PUSH_ACK_TIMEOUT = float(os.getenv('ROW_PUSH_ACK_TIMEOUT', '30'))
+
+# Summary results cache: entries expire after RESULT_CACHE_TTL seconds, and the least
+# recently used ones are evicted once the cached rows exceed RESULT_CACHE_MAX_BYTES
+RESULT_CACHE_TTL = float(os.getenv('RESULT_CACHE_TTL', '600'))
+RESULT_CACHE_MAX_BYTES = int(os.getenv('RESULT_CACHE_MAX_BYTES', str(64 * 1024 ** 2)))
+
+# Typeahead lookup selects: rows offered per search, seconds of typing pause before searching,
+# and the shortest text searched anywhere in the name (shorter text only matches its start)
+LOOKUP_SEARCH_LIMIT = int(os.getenv('LOOKUP_SEARCH_LIMIT', '50'))
+LOOKUP_SEARCH_DEBOUNCE = float(os.getenv('LOOKUP_SEARCH_DEBOUNCE', '0.3'))
+LOOKUP_SEARCH_MIN_LENGTH = int(os.getenv('LOOKUP_SEARCH_MIN_LENGTH', '3'))
+
+# Seconds between the first change to a table and the refresh of the materialized summaries reading it
+MATVIEW_REFRESH_DELAY = float(os.getenv('MATVIEW_REFRESH_DELAY', '5'))
+
+# EXPLAIN inspector: flag plan nodes whose row estimate is off by this factor, and sequential
+# scans reading at least this many rows; keep this many plans per query fingerprint
+EXPLAIN_MISESTIMATE_FACTOR = float(os.getenv('EXPLAIN_MISESTIMATE_FACTOR', '10'))
+EXPLAIN_SEQ_SCAN_ROWS = int(os.getenv('EXPLAIN_SEQ_SCAN_ROWS', '10000'))
+EXPLAIN_HISTORY = int(os.getenv('EXPLAIN_HISTORY', '20'))
+# JSON file the kept plans are saved to, so they survive restarts; unset keeps them in memory only
+EXPLAIN_STORE_PATH = os.getenv('EXPLAIN_STORE_PATH')
+
+# CSV import: rows per COPY batch (a batch with a bad row is split until the row is found), rejected
+# rows after which the import is abandoned and rolled back, and the largest file accepted
+IMPORT_BATCH_ROWS = int(os.getenv('IMPORT_BATCH_ROWS', '5000'))
+IMPORT_MAX_REJECTS = int(os.getenv('IMPORT_MAX_REJECTS', '1000'))
+IMPORT_MAX_FILE_BYTES = int(os.getenv('IMPORT_MAX_FILE_BYTES', str(512 * 1024 ** 2)))
+
+# Transactions retried on serialization failures and deadlocks: attempts in all, and the cap on the
+# exponential backoff before a retry, which starts at TX_RETRY_BASE_DELAY seconds and is jittered
+TX_MAX_ATTEMPTS = int(os.getenv('TX_MAX_ATTEMPTS', '5'))
+TX_RETRY_BASE_DELAY = float(os.getenv('TX_RETRY_BASE_DELAY', '0.05'))
+TX_RETRY_MAX_DELAY = float(os.getenv('TX_RETRY_MAX_DELAY', '2'))
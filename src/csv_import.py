@@ -0,0 +1,299 @@
+import contextlib
+import csv
+import datetime
+import io
+import os
+import tempfile
+import time
+from decimal import Decimal
+
+import psycopg
+from nicegui import ui
+from psycopg import sql
+
+from db import CONSTRAINT_MESSAGES
+from config import IMPORT_BATCH_ROWS, IMPORT_MAX_REJECTS, IMPORT_MAX_FILE_BYTES
+from generic_dialog_builders import get_table_columns, get_permitted_columns
+from ui_common import format_size
+
+BOOLEAN_VALUES = {
+    'true': True, 't': True, 'yes': True, 'y': True, '1': True, 'да': True,
+    'false': False, 'f': False, 'no': False, 'n': False, '0': False, 'нет': False,
+}
+# Errors COPY raises for a bad row; anything else (a lost connection, missing rights) aborts the import
+ROW_ERRORS = (psycopg.DataError, psycopg.IntegrityError, psycopg.errors.RaiseException)
+
+
+def _to_bool(text: str) -> bool:
+    value = BOOLEAN_VALUES.get(text.lower())
+    if value is None:
+        raise ValueError(text)
+    return value
+
+
+def _to_date(text: str) -> datetime.date:
+    try:
+        return datetime.date.fromisoformat(text)
+    except ValueError:
+        return datetime.datetime.strptime(text, '%d.%m.%Y').date()
+
+
+# information_schema data_type -> parser of a CSV field; other types are sent as text
+CONVERTERS = {
+    'integer': int,
+    'bigint': int,
+    'smallint': int,
+    'numeric': Decimal,
+    'decimal': Decimal,
+    'real': float,
+    'double precision': float,
+    'boolean': _to_bool,
+    'date': _to_date,
+    'timestamp without time zone': datetime.datetime.fromisoformat,
+    'timestamp with time zone': datetime.datetime.fromisoformat,
+}
+
+
+@contextlib.contextmanager
+def open_csv(path: str):
+    """
+    (binary file, csv.reader) of a UTF-8 CSV file, with or without a BOM, its delimiter sniffed
+    so ';'-separated spreadsheet exports read too. The binary file's tell() tracks progress.
+    """
+    with open(path, 'rb') as raw, io.TextIOWrapper(raw, encoding='utf-8-sig', newline='') as text:
+        sample = text.read(64 * 1024)
+        text.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=',;\t|')
+        except csv.Error:
+            dialect = csv.excel
+        yield raw, csv.reader(text, dialect)
+
+
+def normalize_header(name: str) -> str:
+    return name.strip().lower().replace(' ', '_')
+
+
+def map_header(header: list[str], columns, insertable) -> list[str]:
+    """
+    Table column of each CSV column, matched by name ignoring case and surrounding spaces.
+    Raises ValueError naming the CSV columns that match no column the role may insert into.
+    """
+    by_name = {normalize_header(name): name for name, _, _ in columns if name in insertable}
+    mapped = [by_name.get(normalize_header(title)) for title in header]
+    unknown = [title for title, col in zip(header, mapped) if col is None]
+    if unknown:
+        raise ValueError(f"Unknown or not insertable columns: {', '.join(unknown)}. "
+                         f"Expected some of: {', '.join(by_name.values())}")
+    repeated = {col for col in mapped if mapped.count(col) > 1}
+    if repeated:
+        raise ValueError(f"Columns given more than once: {', '.join(sorted(repeated))}")
+    return mapped
+
+
+class RowConverter:
+    """Turns the text fields of a CSV row into values of the target columns; empty fields are NULL."""
+    def __init__(self, target_columns: list[str], types: dict[str, str]):
+        self.columns = [(col, types[col], CONVERTERS.get(types[col])) for col in target_columns]
+
+    def __call__(self, fields: list[str]) -> tuple:
+        if len(fields) != len(self.columns):
+            raise ValueError(f'expected {len(self.columns)} fields, got {len(fields)}')
+        values = []
+        for (col, data_type, convert), text in zip(self.columns, fields):
+            if text == '' or (convert is not None and not text.strip()):
+                values.append(None)
+            elif convert is None:
+                values.append(text)
+            else:
+                try:
+                    values.append(convert(text.strip()))
+                except (ValueError, ArithmeticError):
+                    raise ValueError(f'{col}: {text!r} is not a valid {data_type}')
+        return tuple(values)
+
+
+class ImportAborted(Exception):
+    pass
+
+
+class CsvImport:
+    """
+    Loads a CSV file into a table with COPY ... FROM STDIN.
+
+    The header row names the columns, matched against the role's cached catalog, and each
+    field is checked against its column type before it is sent. Rows are copied in batches
+    of IMPORT_BATCH_ROWS, each in its own savepoint of one transaction: a batch that the
+    database rejects (a foreign key, a constraint, a trigger) is split in halves until the
+    offending rows are found, and those go to the reject file with the error instead of
+    failing the load. More than IMPORT_MAX_REJECTS rejected rows roll the whole import back.
+    """
+    def __init__(self, pool, table_name: str, columns, insertable):
+        self.pool = pool
+        self.table_name = table_name
+        self.columns = columns
+        self.insertable = insertable
+        self.header: list[str] = []
+        self.rows_read = 0
+        self.rows_loaded = 0
+        self.rejected = 0
+        self.bytes_read = 0
+        self.total_bytes = 0
+        self.started = None
+        self.finished = None
+        self.reject_path = None
+        self._reject_file = None
+        self._reject_writer = None
+
+    @property
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows_read / self.elapsed if self.elapsed else 0.0
+
+    async def run(self, path: str, on_progress=None):
+        self.total_bytes = os.path.getsize(path)
+        self.started = time.monotonic()
+        types = {name: data_type for name, data_type, _ in self.columns}
+        try:
+            with open_csv(path) as (raw, reader):
+                self.header = next(reader, None)
+                if not self.header:
+                    raise ValueError('The file is empty')
+                target_columns = map_header(self.header, self.columns, self.insertable)
+                convert = RowConverter(target_columns, types)
+                query = sql.SQL("COPY {tbl} ({cols}) FROM STDIN").format(
+                    tbl=sql.Identifier(self.table_name),
+                    cols=sql.SQL(', ').join(map(sql.Identifier, target_columns))
+                )
+
+                async with self.pool.connection() as conn, conn.transaction():
+                    batch = []
+                    for fields in reader:
+                        if not any(fields):  # blank line
+                            continue
+                        self.rows_read += 1
+                        try:
+                            batch.append((reader.line_num, fields, convert(fields)))
+                        except ValueError as e:
+                            self._reject(reader.line_num, fields, str(e))
+                        if len(batch) >= IMPORT_BATCH_ROWS:
+                            await self._load(conn, query, batch)
+                            batch = []
+                            self.bytes_read = raw.tell()
+                            if on_progress:
+                                on_progress(self)
+                    if batch:
+                        await self._load(conn, query, batch)
+            self.bytes_read = self.total_bytes
+        finally:
+            self.finished = time.monotonic()
+            if self._reject_file:
+                self._reject_file.close()
+
+    async def _load(self, conn, query, batch):
+        failures = await self._copy(conn, query, batch)
+        for line_no, fields, error in failures:
+            self._reject(line_no, fields, error)
+        self.rows_loaded += len(batch) - len(failures)
+
+    async def _copy(self, conn, query, batch) -> list[tuple]:
+        """Copy a batch; return (line, fields, error) of the rows the database refused."""
+        try:
+            async with conn.transaction(), conn.cursor() as cur:
+                async with cur.copy(query) as copy:
+                    for _, _, values in batch:
+                        await copy.write_row(values)
+            return []
+        except ROW_ERRORS as e:
+            if len(batch) == 1:
+                line_no, fields, _ = batch[0]
+                return [(line_no, fields, CONSTRAINT_MESSAGES.get(e.diag.constraint_name) or e.diag.message_primary or str(e))]
+            middle = len(batch) // 2
+            return await self._copy(conn, query, batch[:middle]) + await self._copy(conn, query, batch[middle:])
+
+    def _reject(self, line_no: int, fields: list[str], error: str):
+        self.rejected += 1
+        if self.rejected > IMPORT_MAX_REJECTS:
+            raise ImportAborted(f'More than {IMPORT_MAX_REJECTS} rows were rejected, nothing was imported. '
+                                f'Last error, line {line_no}: {error}')
+        if self._reject_writer is None:
+            self._reject_file = tempfile.NamedTemporaryFile(
+                'w', encoding='utf-8', newline='', prefix=f'{self.table_name}-', suffix='.rejects.csv', delete=False
+            )
+            self.reject_path = self._reject_file.name
+            self._reject_writer = csv.writer(self._reject_file)
+            self._reject_writer.writerow(['line', *self.header, 'error'])
+        self._reject_writer.writerow([line_no, *fields, error])
+
+    def describe(self) -> str:
+        return (f'{self.rows_read:,} rows read, {self.rows_loaded:,} loaded, {self.rejected:,} rejected; '
+                f'{format_size(self.bytes_read)} of {format_size(self.total_bytes)} '
+                f'in {self.elapsed:.1f} s, {self.rows_per_second:,.0f} rows/s')
+
+
+async def build_import_dialog(pool, table_name: str):
+    columns = await get_table_columns(pool, table_name)
+    insertable = await get_permitted_columns(pool, table_name, 'INSERT')
+    reject_path = None
+
+    with ui.dialog() as dialog, ui.card().classes('w-1/2'):
+        ui.label(f'Import CSV into {table_name}').classes('text-h6')
+        ui.label(
+            f"The header row names the columns, among: {', '.join(c for c, _, _ in columns if c in insertable)}. "
+            "Empty fields are NULL; dates are YYYY-MM-DD or DD.MM.YYYY."
+        ).classes('text-caption')
+        progress = ui.linear_progress(value=0, show_value=False).props('instant-feedback')
+        progress.set_visibility(False)
+        status = ui.label()
+
+        def report(importer: CsvImport):
+            progress.set_value(importer.bytes_read / importer.total_bytes if importer.total_bytes else 1)
+            status.set_text(importer.describe())
+
+        def download_rejects():
+            if reject_path:
+                ui.download.file(reject_path, f'{table_name}-rejects.csv')
+
+        async def on_upload(e):
+            nonlocal reject_path
+            if reject_path:
+                os.unlink(reject_path)
+                reject_path = None
+            reject_button.set_visibility(False)
+            progress.set_visibility(True)
+            progress.set_value(0)
+
+            fd, upload_path = tempfile.mkstemp(suffix='.csv')
+            os.close(fd)
+            importer = CsvImport(pool, table_name, columns, insertable)
+            try:
+                await e.file.save(upload_path)
+                await importer.run(upload_path, report)
+                ui.notify(f'Imported {importer.rows_loaded:,} rows into {table_name}, '
+                          f'{importer.rejected:,} rejected', color='positive' if not importer.rejected else 'warning')
+                reject_path = importer.reject_path
+            except (ValueError, UnicodeDecodeError, ImportAborted) as err:
+                ui.notify(str(err), color='negative', multi_line=True)
+            except psycopg.Error as err:
+                ui.notify(f'Import failed, nothing was imported: {err}', color='negative', multi_line=True)
+            finally:
+                os.unlink(upload_path)
+                if importer.reject_path and importer.reject_path != reject_path:
+                    os.unlink(importer.reject_path)
+                report(importer)
+                reject_button.set_visibility(reject_path is not None)
+                upload.reset()
+
+        upload = ui.upload(
+            label='CSV file', auto_upload=True, max_file_size=IMPORT_MAX_FILE_BYTES, on_upload=on_upload,
+            on_rejected=lambda: ui.notify(f'Files up to {format_size(IMPORT_MAX_FILE_BYTES)} can be imported',
+                                          color='negative')
+        ).props('accept=".csv,text/csv"').classes('w-full')
+        reject_button = ui.button('Download rejected rows', on_click=download_rejects).props('outline')
+        reject_button.set_visibility(False)
+    return dialog
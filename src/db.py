@@ -1,65 +1,259 @@
+import asyncio
+import itertools
 import psycopg
-from psycopg import OperationalError
+from psycopg import OperationalError, postgres
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool, PoolTimeout
 from typing import Any, List, Tuple
 from nicegui import ui
-from config import DSN_ADMIN, DSN_HR
+from config import DSN_ADMIN, DSN_HR, POOL_MIN_SIZE, POOL_MAX_SIZE, POOL_MAX_IDLE, POOL_TIMEOUT, \
+    FETCH_ROW_CAP, FETCH_BATCH_SIZE, STREAM_IDLE_TIMEOUT
+
+ROLE_DSNS = {
+    'admin': DSN_ADMIN,
+    'hr': DSN_HR,
+}
+
+
+async def _reset_connection(conn):
+    """Undo per-operation session changes before a connection goes back to the pool."""
+    await conn.set_isolation_level(None)
+    await conn.set_autocommit(True)
+
+
+def is_row_query(query: str) -> bool:
+    """Whether `query` is a plain row-returning statement that can back a server-side cursor."""
+    words = query.lstrip('( \t\r\n').split(None, 1)
+    return bool(words) and words[0].lower() in ('select', 'with', 'values', 'table')
+
+
+def result_size(res) -> int:
+    """Bytes of row data in a libpq result, as sent by the server."""
+    if res is None:
+        return 0
+    return sum(res.get_length(r, c) for r in range(res.ntuples) for c in range(res.nfields))
+
+
+def array_columns(description) -> list[str]:
+    """Names of the columns PostgreSQL sends as arrays, going by their type oids."""
+    arrays = []
+    for col in description or []:
+        info = postgres.types.get(col.type_code)
+        if info is not None and info.array_oid == col.type_code:
+            arrays.append(col.name)
+    return arrays
+
+
+# Constraints whose violations are shown as a plain message instead of the server's text
+CONSTRAINT_MESSAGES = {
+    'workers_one_brigadier_per_brigade': 'The brigade already has a brigadier',
+    'workers_brigadier_has_brigade': 'Brigadier must be assigned to a brigade',
+}
+
+
+def error_message(e: Exception) -> str:
+    """
+    Text of an error for the UI: violations of the constraints above put plainly, and the
+    message alone of an exception raised by a procedure or trigger, without its context.
+    """
+    if isinstance(e, psycopg.Error) and e.diag.constraint_name in CONSTRAINT_MESSAGES:
+        return CONSTRAINT_MESSAGES[e.diag.constraint_name]
+    if isinstance(e, psycopg.errors.RaiseException) and e.diag.message_primary:
+        return e.diag.message_primary
+    return str(e)
+
+
+class QueryStream:
+    """
+    Pages through a query with a server-side (named) cursor.
+
+    Each fetch_next() pulls at most `row_cap` rows from PostgreSQL, in batches of
+    FETCH_BATCH_SIZE, so only the pages a user actually asks for ever reach the app.
+    Rows come back as dicts (psycopg.rows.dict_row); `arrays` names the array columns.
+    The stream holds its pooled connection until it is exhausted, closed, or left
+    idle for STREAM_IDLE_TIMEOUT seconds.
+    """
+    _names = itertools.count()
+
+    def __init__(self, pool: AsyncConnectionPool, query, params=None, row_cap: int | None = None):
+        self.pool = pool
+        self.query = query
+        self.params = params
+        # pools are named after their role
+        self.row_cap = row_cap or FETCH_ROW_CAP.get(pool.name, min(FETCH_ROW_CAP.values()))
+        self.columns: list[str] = []
+        self.arrays: list[str] = []
+        self.exhausted = False
+        # accounting: totals for the stream and figures for the last fetch_next()
+        self.rows_fetched = 0
+        self.bytes_fetched = 0
+        self.last_rows = 0
+        self.last_bytes = 0
+        self._conn = None
+        self._cur = None
+        self._idle_timer = None
+        self._closing = None
+
+    async def open(self):
+        self._conn = await self.pool.getconn()
+        try:
+            # a named cursor lives inside a transaction
+            await self._conn.set_autocommit(False)
+            self._cur = self._conn.cursor(name=f'stream_{next(self._names)}', row_factory=dict_row)
+            await self._cur.execute(self.query, self.params)
+            self.columns = [d[0] for d in self._cur.description]
+            self.arrays = array_columns(self._cur.description)
+        except Exception:
+            await self.close()
+            raise
+
+    async def fetch_next(self) -> list:
+        if self.exhausted:
+            return []
+        self._cancel_idle_timer()
+        rows = []
+        size = 0
+        try:
+            while len(rows) < self.row_cap:
+                wanted = min(FETCH_BATCH_SIZE, self.row_cap - len(rows))
+                batch = await self._cur.fetchmany(wanted)
+                size += result_size(self._cur.pgresult)
+                rows.extend(batch)
+                if len(batch) < wanted:
+                    self.exhausted = True
+                    break
+        except Exception:
+            await self.close()
+            raise
+
+        self.last_rows, self.last_bytes = len(rows), size
+        self.rows_fetched += len(rows)
+        self.bytes_fetched += size
+        if self.exhausted:
+            await self.close()
+        else:
+            self._idle_timer = asyncio.get_running_loop().call_later(STREAM_IDLE_TIMEOUT, self._close_idle)
+        return rows
+
+    async def close(self):
+        self._cancel_idle_timer()
+        self.exhausted = True
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        try:
+            if self._cur is not None and not self._cur.closed:
+                await self._cur.close()
+            await conn.commit()
+        except Exception as e:
+            print(f"Failed to close result stream: {e}")
+        finally:
+            await self.pool.putconn(conn)
+
+    def _cancel_idle_timer(self):
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+
+    def _close_idle(self):
+        self._idle_timer = None
+        self._closing = asyncio.ensure_future(self.close())
 
 
 class DBManager:
+    """
+    Keeps one async connection pool per role. Pools are opened on the first login
+    with that role and stay open until shutdown, so one user logging in or out
+    never closes connections another user is working with.
+
+    All queries are awaited, so a slow statement only suspends the handler
+    that issued it and the event loop keeps serving the other sessions.
+    """
     def __init__(self):
-        self.conn = None
+        # role -> pool; each pool is also named after its role
+        self.pools: dict[str, AsyncConnectionPool] = {}
 
-    def connect(self, role: str) -> bool:
-        if role == 'admin':
-            dsn = DSN_ADMIN
-        elif role == 'hr':
-            dsn = DSN_HR
-        else:
+    async def connect(self, role: str) -> bool:
+        if role not in ROLE_DSNS:
             ui.notify("Invalid role specified", color='negative')
             return False
 
+        if role in self.pools:
+            return True
+
+        pool = AsyncConnectionPool(
+            ROLE_DSNS[role],
+            name=role,
+            min_size=POOL_MIN_SIZE,
+            max_size=POOL_MAX_SIZE,
+            max_idle=POOL_MAX_IDLE,
+            timeout=POOL_TIMEOUT,
+            check=AsyncConnectionPool.check_connection,
+            reset=_reset_connection,
+            kwargs={'autocommit': True},
+            open=False,
+        )
         try:
-            if self.conn:
-                self.conn.close()
-            self.conn = psycopg.connect(dsn,autocommit=True)
+            await pool.open(wait=True, timeout=POOL_TIMEOUT)
+            self.pools[role] = pool
             ui.notify(f"Connected to database as {role}", color='positive')
             return True
-        except OperationalError as e:
+        except PoolTimeout as e:
+            await pool.close()
             ui.notify(f"OperationalError: {e}", color='negative', timeout=None, close_button=True)
-            self.conn = None
             return False
         except Exception as e:
+            await pool.close()
             ui.notify(f"Failed to connect as {role}: {e}", color='negative')
-            self.conn = None
             return False
 
-    def disconnect(self):
+    def pool(self, role: str) -> AsyncConnectionPool | None:
+        return self.pools.get(role)
+
+    async def disconnect(self):
+        try:
+            for pool in self.pools.values():
+                await pool.close()
+            self.pools.clear()
+        except Exception as e:
+            print(f"Failed to close connection pools: {e}")
+
+    async def execute_query(self, query: str, role: str) -> Tuple[List[str], List[Any], List[str]]:
+        pool = self.pool(role)
+        if not pool:
+            ui.notify('No DB connection', color='negative')
+            return [], [], []
         try:
-            if self.conn:
-                self.conn.close()
-                self.conn = None
-                ui.notify("Disconnected from database", color='positive')
+            async with pool.connection() as conn:
+                async with conn.cursor(row_factory=dict_row) as cur:
+                    async with conn.transaction():
+                        await cur.execute(query)
+                        try:
+                            cols = [d[0] for d in cur.description]
+                            data = await cur.fetchall()
+                            return cols, data, array_columns(cur.description)
+                        except psycopg.ProgrammingError as e:
+                            ui.notify(f"DB error: {e}", color='negative')
+                            return [], [], []
+        except OperationalError as e:
+            ui.notify(f"OperationalError: {e}", color='negative')
+            return [], [], []
         except Exception as e:
-            ui.notify(f"Failed to disconnect: {e}", color='negative')
+            ui.notify(f"DB error: {e}", color='negative')
+            return [], [], []
 
-    def execute_query(self, query: str) -> Tuple[List[str], List[Any]]:
-        if not self.conn:
+    async def open_stream(self, query: str, role: str, params=None) -> QueryStream | None:
+        pool = self.pool(role)
+        if not pool:
             ui.notify('No DB connection', color='negative')
-            return [], []
+            return None
+        stream = QueryStream(pool, query, params)
         try:
-            with self.conn.cursor() as cur:
-                with self.conn.transaction():
-                    cur.execute(query)
-                    try:
-                        cols = [d[0] for d in cur.description]
-                        data = cur.fetchall()
-                        return cols, data
-                    except psycopg.ProgrammingError as e:
-                        ui.notify(f"DB error: {e}", color='negative')
-                        return [], []
+            await stream.open()
+            return stream
         except Exception as e:
             ui.notify(f"DB error: {e}", color='negative')
-            return [], []
+            return None
 
 
 db_manager = DBManager()
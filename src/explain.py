@@ -0,0 +1,235 @@
+import datetime
+import hashlib
+import json
+import os
+import re
+from collections import deque
+
+from nicegui import ui
+from psycopg import sql
+
+from config import EXPLAIN_MISESTIMATE_FACTOR, EXPLAIN_SEQ_SCAN_ROWS, EXPLAIN_HISTORY, EXPLAIN_STORE_PATH
+
+# Estimates off by EXPLAIN_MISESTIMATE_FACTOR are only flagged on nodes handling at least this many rows
+MISESTIMATE_MIN_ROWS = 100
+
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SPACES = re.compile(r"\s+")
+_PUNCTUATION_SPACES = re.compile(r" ?([^\w ]) ?")
+
+
+def fingerprint(query_text: str) -> str:
+    """
+    Hash of a query with comments, literals and layout normalized away, so the same
+    query run with other values shares one plan history. Bound parameters are never
+    part of the text, so a summary is identified by its view and the filters that are set.
+    """
+    text = _COMMENTS.sub(' ', query_text)
+    text = _LITERALS.sub('?', text)
+    text = _SPACES.sub(' ', text)
+    text = _PUNCTUATION_SPACES.sub(r'\1', text).strip().rstrip(';').lower()
+    return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+
+class PlanNode:
+    """One node of an EXPLAIN (ANALYZE, FORMAT JSON) plan, with times and rows summed over its loops."""
+    def __init__(self, node: dict, depth: int):
+        self.depth = depth
+        self.node_type = node['Node Type']
+        self.relation = node.get('Relation Name')
+        self.index = node.get('Index Name')
+        self.loops = node.get('Actual Loops', 0)
+        self.total_ms = node.get('Actual Total Time', 0) * self.loops
+        self.self_ms = self.total_ms - sum(
+            child.get('Actual Total Time', 0) * child.get('Actual Loops', 0) for child in node.get('Plans', [])
+        )
+        self.rows = node.get('Actual Rows', 0) * self.loops
+        self.estimated_rows = node.get('Plan Rows', 0) * max(self.loops, 1)
+        self.rows_removed = node.get('Rows Removed by Filter', 0) * self.loops
+        self.shared_hit = node.get('Shared Hit Blocks', 0)
+        self.shared_read = node.get('Shared Read Blocks', 0)
+        self.flags = []
+
+        if self.node_type == 'Seq Scan' and self.rows + self.rows_removed >= EXPLAIN_SEQ_SCAN_ROWS:
+            self.flags.append(f'seq scan of {self.rows + self.rows_removed:,} rows')
+        if self.loops:
+            # compared per loop, as the planner estimates them
+            actual, estimated = node.get('Actual Rows', 0), node.get('Plan Rows', 0)
+            factor = max(actual, estimated) / max(min(actual, estimated), 1)
+            if factor >= EXPLAIN_MISESTIMATE_FACTOR and max(actual, estimated) >= MISESTIMATE_MIN_ROWS:
+                direction = 'under' if actual > estimated else 'over'
+                self.flags.append(f'rows {direction}estimated {factor:,.0f}x')
+
+    @property
+    def label(self) -> str:
+        label = self.node_type
+        if self.relation:
+            label += f' on {self.relation}'
+        if self.index:
+            label += f' using {self.index}'
+        return label
+
+
+def plan_nodes(node: dict, depth: int = 0):
+    """Yield a PlanNode for every node of a JSON plan tree, depth first."""
+    yield PlanNode(node, depth)
+    for child in node.get('Plans', []):
+        yield from plan_nodes(child, depth + 1)
+
+
+class ExplainedPlan:
+    """The result of EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) for one query run."""
+    def __init__(self, query_text: str, plan: dict, taken_at: str | None = None):
+        self.query_text = query_text
+        self.fingerprint = fingerprint(query_text)
+        self.plan = plan
+        self.taken_at = taken_at or datetime.datetime.now().isoformat(timespec='seconds')
+        self.execution_ms = plan.get('Execution Time', 0)
+        self.planning_ms = plan.get('Planning Time', 0)
+        self.nodes = list(plan_nodes(plan['Plan']))
+
+    @property
+    def shape(self) -> list[str]:
+        """Scans and joins of the plan, to tell whether it changed between runs."""
+        return [node.label for node in self.nodes
+                if 'Scan' in node.node_type or 'Join' in node.node_type or node.node_type == 'Nested Loop']
+
+    def to_dict(self) -> dict:
+        return {'query': self.query_text, 'plan': self.plan, 'taken_at': self.taken_at}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'ExplainedPlan':
+        return cls(data['query'], data['plan'], data['taken_at'])
+
+
+class PlanStore:
+    """
+    The last EXPLAIN_HISTORY plans of each query fingerprint, so a run can be compared
+    with the previous ones. Saved to EXPLAIN_STORE_PATH when it is set.
+    """
+    def __init__(self, path: str | None = EXPLAIN_STORE_PATH, history: int = EXPLAIN_HISTORY):
+        self.path = path
+        self.history = history
+        self._plans: dict[str, deque[ExplainedPlan]] | None = None
+
+    def _load(self) -> dict[str, deque[ExplainedPlan]]:
+        if self._plans is None:
+            self._plans = {}
+            if self.path and os.path.exists(self.path):
+                try:
+                    with open(self.path, encoding='utf-8') as f:
+                        for fp, plans in json.load(f).items():
+                            self._plans[fp] = deque(map(ExplainedPlan.from_dict, plans), maxlen=self.history)
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"Failed to load saved query plans from {self.path}: {e}")
+        return self._plans
+
+    def _save(self):
+        if not self.path:
+            return
+        data = {fp: [plan.to_dict() for plan in plans] for fp, plans in self._plans.items()}
+        try:
+            tmp_path = f'{self.path}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, default=str)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Failed to save query plans to {self.path}: {e}")
+
+    def history_of(self, fp: str) -> list[ExplainedPlan]:
+        """Kept plans of a fingerprint, oldest first."""
+        return list(self._load().get(fp, ()))
+
+    def add(self, plan: ExplainedPlan) -> ExplainedPlan | None:
+        """Keep `plan` and return the previous plan of its fingerprint, if any."""
+        plans = self._load().setdefault(plan.fingerprint, deque(maxlen=self.history))
+        previous = plans[-1] if plans else None
+        plans.append(plan)
+        self._save()
+        return previous
+
+
+plan_store = PlanStore()
+
+
+async def explain_query(pool, query, params=None) -> ExplainedPlan:
+    """
+    Run EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) on `query` (a string or psycopg.sql object)
+    with `params`, exactly as it would otherwise be sent. ANALYZE executes the statement,
+    so it runs in a transaction that is always rolled back.
+    """
+    if isinstance(query, str):
+        query = sql.SQL(query.strip().rstrip(';'))
+    async with pool.connection() as conn:
+        query_text = query.as_string(conn)
+        async with conn.transaction(force_rollback=True), conn.cursor() as cur:
+            await cur.execute(sql.SQL("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {}").format(query), params)
+            plan = (await cur.fetchone())[0][0]
+    return ExplainedPlan(query_text, plan)
+
+
+def _compare(plan: ExplainedPlan, previous: ExplainedPlan) -> str:
+    text = f'Previous run ({previous.taken_at}): {previous.execution_ms:,.1f} ms'
+    if previous.execution_ms:
+        text += f', now {(plan.execution_ms / previous.execution_ms - 1) * 100:+.0f}%'
+    if plan.shape != previous.shape:
+        text += '; plan shape changed'
+    return text
+
+
+def show_plan(plan: ExplainedPlan, previous: ExplainedPlan | None = None):
+    """Open a dialog with the plan tree, per-node time, rows and buffers, and flagged nodes."""
+    columns = [
+        {'name': 'node', 'label': 'Node', 'field': 'node', 'align': 'left'},
+        {'name': 'total_ms', 'label': 'Total ms', 'field': 'total_ms'},
+        {'name': 'self_ms', 'label': 'Self ms', 'field': 'self_ms'},
+        {'name': 'rows', 'label': 'Rows', 'field': 'rows'},
+        {'name': 'estimated_rows', 'label': 'Estimated', 'field': 'estimated_rows'},
+        {'name': 'loops', 'label': 'Loops', 'field': 'loops'},
+        {'name': 'buffers', 'label': 'Buffers hit / read', 'field': 'buffers'},
+        {'name': 'flags', 'label': 'Flags', 'field': 'flags', 'align': 'left'},
+    ]
+    rows = [{
+        'id': i,
+        # em spaces, which the browser does not collapse
+        'node': '\u2003' * node.depth + ('└ ' if node.depth else '') + node.label,
+        'total_ms': round(node.total_ms, 3),
+        'self_ms': round(node.self_ms, 3),
+        'rows': node.rows,
+        'estimated_rows': node.estimated_rows,
+        'loops': node.loops,
+        'buffers': f'{node.shared_hit} / {node.shared_read}',
+        'flags': '; '.join(node.flags),
+    } for i, node in enumerate(plan.nodes)]
+    flagged = sum(1 for node in plan.nodes if node.flags)
+
+    with ui.dialog() as dialog, ui.card().style('max-width: 90vw; width: 90vw'):
+        ui.label('Query plan').classes('text-h6')
+        ui.label(f'Execution {plan.execution_ms:,.1f} ms, planning {plan.planning_ms:,.1f} ms')
+        if previous:
+            ui.label(_compare(plan, previous))
+        if flagged:
+            ui.label(f'{flagged} node(s) flagged').classes('text-negative')
+        ui.label(
+            f'Fingerprint {plan.fingerprint}, {len(plan_store.history_of(plan.fingerprint))} plan(s) kept'
+        ).classes('text-caption text-grey')
+        ui.table(columns=columns, rows=rows, row_key='id', pagination={'rowsPerPage': 0}) \
+            .props('dense flat hide-pagination').classes('w-full')
+        with ui.expansion('Query').classes('w-full'):
+            ui.code(plan.query_text, language='sql').classes('w-full')
+        with ui.expansion('JSON plan').classes('w-full'):
+            ui.code(json.dumps(plan.plan, indent=2, ensure_ascii=False, default=str), language='json').classes('w-full')
+        ui.button('Close', on_click=dialog.close).props('outline')
+    dialog.on('hide', dialog.delete)
+    dialog.open()
+
+
+async def explain_and_show(pool, query, params=None):
+    """Explain a query, keep its plan and show it, notifying of errors instead of raising."""
+    try:
+        plan = await explain_query(pool, query, params)
+    except Exception as e:
+        ui.notify(f"DB error: {e}", color='negative')
+        return
+    show_plan(plan, plan_store.add(plan))
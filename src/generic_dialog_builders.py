@@ -1,23 +1,22 @@
+from decimal import Decimal
+
 from psycopg import sql
 from nicegui import ui
 
-from src.ui_common import display_result
+from ui_common import display_stream, with_loading
+from db import QueryStream, error_message
 from src.utils import create_date_input_field
+from catalog import catalog_cache
+from lookups import escape_like
 
 
-def get_table_columns(conn, table_name, schema='public'):
-    query = """
-        SELECT column_name, data_type, is_nullable
-        FROM information_schema.columns
-        WHERE table_schema = %s AND table_name = %s
-        ORDER BY ordinal_position;
-    """
-    with conn.cursor() as cur:
-        cur.execute(query, (schema, table_name))
-        return cur.fetchall()
+async def get_table_columns(pool, table_name):
+    """[(column_name, data_type, is_nullable)] of a table, from the role's cached catalog."""
+    catalog = await catalog_cache.get(pool)
+    return catalog.columns.get(table_name, [])
 
 
-def submit_add(conn, table_name, input_fields):
+async def submit_add(pool, table_name, input_fields):
     columns = []
     values = []
     identifiers = []
@@ -39,16 +38,18 @@ def submit_add(conn, table_name, input_fields):
         placeholders=sql.SQL(', ').join(sql.Placeholder() for _ in columns)
     )
     try:
-        with conn.cursor() as cur:
-            with conn.transaction():
-                cur.execute(query, values)
+        async with pool.connection() as conn:
+            async with conn.cursor() as cur:
+                async with conn.transaction():
+                    await cur.execute(query, values)
         ui.notify('Row inserted successfully.')
     except Exception as e:
-        ui.notify(f'Error inserting row: {e}')
+        ui.notify(f'Error inserting row: {error_message(e)}')
 
 
-def build_generic_add_dialog(conn, table_name):
-    columns = get_table_columns(conn, table_name)
+async def build_generic_add_dialog(pool, table_name):
+    insertable = await get_permitted_columns(pool, table_name, 'INSERT')
+    columns = [col for col in await get_table_columns(pool, table_name) if col[0] in insertable]
     input_fields = {}
 
     with ui.dialog() as dialog, ui.card():
@@ -63,27 +64,22 @@ def build_generic_add_dialog(conn, table_name):
                 input_fields[col_name] = create_date_input_field(label)
             else:
                 input_fields[col_name] = ui.input(label=label)
-        ui.button('Submit', on_click=lambda: submit_add(conn, table_name, input_fields)).classes('q-btn-primary')
+        ui.button('Submit', on_click=with_loading(lambda: submit_add(pool, table_name, input_fields))).classes('q-btn-primary')
     return dialog
 
 
-def get_primary_keys(conn, table_name: str, schema: str = 'public') -> list[str]:
-    query = """
-        SELECT kcu.column_name
-        FROM information_schema.table_constraints tc
-        JOIN information_schema.key_column_usage kcu
-          ON tc.constraint_name = kcu.constraint_name
-         AND tc.table_schema = kcu.table_schema
-        WHERE tc.constraint_type = 'PRIMARY KEY'
-          AND tc.table_schema = %s
-          AND tc.table_name = %s
-        ORDER BY kcu.ordinal_position;
-    """
-    with conn.cursor() as cur:
-        cur.execute(query, (schema, table_name))
-        return [row[0] for row in cur.fetchall()]
+async def get_permitted_columns(pool, table_name, operation) -> list[str]:
+    """Columns the role may INSERT or UPDATE, honouring column-level grants."""
+    catalog = await catalog_cache.get(pool)
+    return catalog.column_privileges.get(table_name, {}).get(operation, [])
+
+
+async def get_primary_keys(pool, table_name: str) -> list[str]:
+    """Primary key columns of a table in key order, from the role's cached catalog."""
+    catalog = await catalog_cache.get(pool)
+    return catalog.primary_keys.get(table_name, [])
 
-def submit_delete(conn, table_name, input_fields):
+async def submit_delete(pool, table_name, input_fields):
     where_clauses = []
     params = []
     for col, comp in input_fields.items():
@@ -101,15 +97,16 @@ def submit_delete(conn, table_name, input_fields):
         conds=sql.SQL(' AND ').join(where_clauses)
     )
     try:
-        with conn.cursor() as cur:
-            with conn.transaction():
-                cur.execute(query, params)
+        async with pool.connection() as conn:
+            async with conn.cursor() as cur:
+                async with conn.transaction():
+                    await cur.execute(query, params)
         ui.notify('Запись удалена', color='positive')
     except Exception as e:
         ui.notify(f'Ошибка удаления: {e}', color='negative')
 
-def build_generic_delete_dialog(conn, table_name: str):
-    pks = get_primary_keys(conn, table_name)
+async def build_generic_delete_dialog(pool, table_name: str):
+    pks = await get_primary_keys(pool, table_name)
     input_fields = {}
     with ui.dialog() as dialog, ui.card().classes('w-1/3'):
         ui.label(f'Удалить из {table_name}').classes('text-h6')
@@ -119,30 +116,78 @@ def build_generic_delete_dialog(conn, table_name: str):
             for col in pks:
                 comp = create_date_input_field(col) if 'date' in col else ui.input(label=col)
                 input_fields[col] = comp
-            ui.button('Удалить', on_click=lambda: submit_delete(conn, table_name, input_fields)).classes('q-btn-negative')
+            ui.button('Удалить', on_click=with_loading(lambda: submit_delete(pool, table_name, input_fields))).classes('q-btn-negative')
     return dialog
 
 
-def submit_get(conn, table_name, input_fields, result_areas):
+INTEGER_TYPES = ('integer', 'bigint', 'smallint')
+NUMERIC_TYPES = INTEGER_TYPES + ('numeric', 'real', 'double precision', 'decimal')
+
+
+def _parse_number(text: str, data_type: str):
+    if data_type in INTEGER_TYPES:
+        return int(text)
+    if data_type in ('numeric', 'decimal'):
+        return Decimal(text)
+    return float(text)
+
+
+def _filled(comp):
+    return comp is not None and comp.value is not None and comp.value != '' and comp.value != []
+
+
+def build_where(input_fields):
+    """
+    WHERE conditions and parameters for the filled filters of a get dialog:
+      - several values of a column -> col = ANY(%s), one array parameter
+      - from / to -> col BETWEEN %s AND %s (or >= / <= when one side is given)
+      - starts with -> col LIKE 'x%', which the table's indexes can answer
+    Raises ValueError for a value that doesn't fit the column type.
+    """
+    where_clauses = []
+    params = []
+    for col, (data_type, fields) in input_fields.items():
+        ident = sql.Identifier(col)
+        values = fields.get('values')
+        if _filled(values):
+            items = values.value
+            if data_type in NUMERIC_TYPES:
+                try:
+                    items = [_parse_number(str(item).strip(), data_type) for item in items]
+                except (ValueError, ArithmeticError):
+                    raise ValueError(f'{col}: expected {data_type} values, got {", ".join(map(str, items))}')
+            where_clauses.append(sql.SQL("{col} = ANY({ph})").format(col=ident, ph=sql.Placeholder()))
+            params.append(list(items))
+
+        low, high = fields.get('from'), fields.get('to')
+        if _filled(low) and _filled(high):
+            where_clauses.append(sql.SQL("{col} BETWEEN {ph} AND {ph}").format(col=ident, ph=sql.Placeholder()))
+            params.extend([low.value, high.value])
+        elif _filled(low):
+            where_clauses.append(sql.SQL("{col} >= {ph}").format(col=ident, ph=sql.Placeholder()))
+            params.append(low.value)
+        elif _filled(high):
+            where_clauses.append(sql.SQL("{col} <= {ph}").format(col=ident, ph=sql.Placeholder()))
+            params.append(high.value)
+
+        prefix = fields.get('prefix')
+        if _filled(prefix):
+            where_clauses.append(sql.SQL("{col} LIKE {ph}").format(col=ident, ph=sql.Placeholder()))
+            params.append(escape_like(prefix.value) + '%')
+    return where_clauses, params
+
+
+async def submit_get(pool, table_name, input_fields, result_areas):
     """
     Build and execute a SELECT based on non-empty input_fields,
     then render the result into result_table.
     """
     # collect filters
-    where_clauses = []
-    params = []
-    for col, comp in input_fields.items():
-        val = comp.value
-        # skip empty filters
-        if val is None or val == '':
-            continue
-        where_clauses.append(
-            sql.SQL("{col} = {ph}").format(
-                col=sql.Identifier(col),
-                ph=sql.Placeholder()
-            )
-        )
-        params.append(val)
+    try:
+        where_clauses, params = build_where(input_fields)
+    except ValueError as e:
+        ui.notify(str(e), color='negative')
+        return
 
     # build base query
     if where_clauses:
@@ -155,50 +200,65 @@ def submit_get(conn, table_name, input_fields, result_areas):
             tbl=sql.Identifier(table_name)
         )
 
-    # execute and fetch
+    # execute and fetch the first page; the rest is streamed on demand
+    stream = QueryStream(pool, query, params)
     try:
-        with conn.cursor() as cur:
-            cur.execute(query, params)
-            cols = [desc[0] for desc in cur.description]
-            rows = cur.fetchall()
+        await stream.open()
     except Exception as e:
         ui.notify(f"Error fetching rows: {e}", color="negative")
         return
 
-    display_result(table_name, cols, rows, result_areas)
+    await display_stream(table_name, stream, result_areas)
+
 
-def build_generic_get_dialog(conn, table_name, result_areas):
+async def build_generic_get_dialog(pool, table_name, result_areas):
     """
     Build a dialog that lets the user filter any subset of columns,
     and then plugs results into result_table.
+    Each column takes any number of values, and numbers and dates a range;
+    text columns also take a prefix.
     """
-    columns = get_table_columns(conn, table_name)
+    columns = await get_table_columns(pool, table_name)
     input_fields = {}
 
     with ui.dialog() as dialog, ui.card().classes('w-1/2'):
         ui.label(f'Filter {table_name}').classes('text-h6 q-mb-sm')
-        # one input per column
+        # one row of inputs per column
         for col_name, data_type, is_nullable in columns:
             label = f"{col_name} ({data_type})"
-            if data_type in ('integer', 'bigint', 'smallint', 'numeric', 'real', 'double precision', 'decimal'):
-                input_fields[col_name] = ui.number(label=label)
-            elif data_type == 'boolean':
-                input_fields[col_name] = ui.checkbox(text=label)
-            elif data_type == 'date':
-                input_fields[col_name] = create_date_input_field(label)
-            else:
-                input_fields[col_name] = ui.input(label=label)
+            fields = {}
+            with ui.row().classes('w-full items-center no-wrap'):
+                if data_type in NUMERIC_TYPES:
+                    fields['values'] = ui.input_chips(label=label, new_value_mode='add-unique', clearable=True) \
+                        .classes('grow')
+                    fields['from'] = ui.number(label='from').classes('w-24')
+                    fields['to'] = ui.number(label='to').classes('w-24')
+                elif data_type == 'boolean':
+                    fields['values'] = ui.select({True: 'Yes', False: 'No'}, label=label, multiple=True, value=[],
+                                                 clearable=True).classes('grow')
+                elif data_type == 'date':
+                    fields['from'] = create_date_input_field(f'{label} from').classes('grow')
+                    fields['to'] = create_date_input_field('to').classes('grow')
+                else:
+                    fields['values'] = ui.input_chips(label=label, new_value_mode='add-unique', clearable=True) \
+                        .classes('grow')
+                    fields['prefix'] = ui.input(label='starts with').classes('w-32')
+            input_fields[col_name] = (data_type, fields)
+
+        async def on_get():
+            await submit_get(pool, table_name, input_fields, result_areas)
+            dialog.close()
 
         with ui.row().classes('q-pt-sm justify-end'):
             ui.button(
                 'Get rows',
-                on_click=lambda: (submit_get(conn, table_name, input_fields, result_areas), dialog.close())
+                on_click=with_loading(on_get)
             ).classes('q-btn-primary')
 
     return dialog
 
 
-def submit_update(conn, table_name, pk_fields, update_fields):
+async def submit_update(pool, table_name, pk_fields, update_fields):
     """
     Execute an UPDATE SQL statement based on primary key fields and update fields.
     """
@@ -244,23 +304,25 @@ def submit_update(conn, table_name, pk_fields, update_fields):
     params = set_params + where_params
 
     try:
-        with conn.cursor() as cur:
-            with conn.transaction():
-                cur.execute(query, params)
-                if cur.rowcount == 0:
-                    ui.notify('No rows were updated. Check primary key values.', color='warning')
-                else:
-                    ui.notify(f'Updated {cur.rowcount} row(s) successfully.', color='positive')
+        async with pool.connection() as conn:
+            async with conn.cursor() as cur:
+                async with conn.transaction():
+                    await cur.execute(query, params)
+                    if cur.rowcount == 0:
+                        ui.notify('No rows were updated. Check primary key values.', color='warning')
+                    else:
+                        ui.notify(f'Updated {cur.rowcount} row(s) successfully.', color='positive')
     except Exception as e:
-        ui.notify(f'Error updating row: {e}', color='negative')
+        ui.notify(f'Error updating row: {error_message(e)}', color='negative')
 
 
-def build_generic_update_dialog(conn, table_name):
+async def build_generic_update_dialog(pool, table_name):
     """
     Build a dialog for updating rows in a table.
     """
-    columns = get_table_columns(conn, table_name)
-    pks = get_primary_keys(conn, table_name)
+    columns = await get_table_columns(pool, table_name)
+    pks = await get_primary_keys(pool, table_name)
+    updatable = await get_permitted_columns(pool, table_name, 'UPDATE')
 
     pk_fields = {}
     update_fields = {}
@@ -296,8 +358,8 @@ def build_generic_update_dialog(conn, table_name):
         ui.label('New values:').classes('text-subtitle1 q-mt-md')
         with ui.card():
             for col_name, data_type, is_nullable in columns:
-                # Skip primary key columns in the update section
-                if col_name in pks:
+                # Skip primary key columns and columns the role may not update
+                if col_name in pks or col_name not in updatable:
                     continue
 
                 label = f"{col_name} ({data_type})"
@@ -312,13 +374,13 @@ def build_generic_update_dialog(conn, table_name):
 
         with ui.row().classes('q-pt-md justify-end'):
             ui.button('Update',
-                      on_click=lambda: submit_update(conn, table_name, pk_fields, update_fields)
+                      on_click=with_loading(lambda: submit_update(pool, table_name, pk_fields, update_fields))
                       ).classes('q-btn-primary')
 
     return dialog
 
 
-def build_generic_query_view(conn, table_name, result_areas):
+async def build_generic_query_view(pool, table_name, result_areas):
     with ui.dialog() as dialog, ui.card().classes('w-2/3'):
         ui.label('''No dialog specified for this view.
                  Dialog windows for views should be specified explicetely.''').classes('text-h6 text-negative text-center')
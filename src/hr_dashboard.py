@@ -1,22 +1,59 @@
 from nicegui import ui
 from add_dialog_builder import add_dialog_builders
+from bulk_add_dialog_builder import bulk_add_dialog_builders
 from delete_dialog_builder import delete_dialog_builders
 from get_dialog_builder import get_dialog_builders
 from update_dialog_builder import update_dialog_builders
 from db import db_manager
+from catalog import catalog_cache
+from csv_import import build_import_dialog
 from generic_dialog_builders import build_generic_add_dialog, build_generic_delete_dialog, build_generic_get_dialog, \
     build_generic_update_dialog
-from ui_common import show_all, count_rows, custom_query, get_user_tables, check_user_privileges
+from ui_common import ResultTable, with_loading, lazy_dialog_button, lazy_tab_panels, show_all, count_rows, custom_query
 
 
-def build_dashboard(user, on_logout):
-    entities = get_user_tables(db_manager.conn)
+async def build_dashboard(user, on_logout):
+    role = user.get_role()
+    pool = db_manager.pool(role)
+    catalog = await catalog_cache.get(pool)
+    entities = catalog.tables
+    privileges = catalog.privileges
     result_areas = {}
 
+    def refresh_schema():
+        catalog_cache.invalidate(role)
+        ui.navigate.reload()
+
+    def build_table_panel(lbl):
+        with ui.row().classes('full-width q-gutter-sm'):
+            # Buttons go HEREEEEEE
+            # Add button with dialogggg
+            if privileges[lbl].get('INSERT', False):
+                add_builder = add_dialog_builders.get(lbl, build_generic_add_dialog)
+                lazy_dialog_button(f'Add to {lbl}', lambda: add_builder(pool, lbl))
+                lazy_dialog_button(f'Import CSV into {lbl}', lambda: build_import_dialog(pool, lbl))
+                if lbl in bulk_add_dialog_builders:
+                    bulk_builder = bulk_add_dialog_builders[lbl]
+                    lazy_dialog_button(f'Bulk add to {lbl}', lambda: bulk_builder(pool, lbl))
+            if privileges[lbl].get('DELETE', False):
+                del_builder = delete_dialog_builders.get(lbl, build_generic_delete_dialog)
+                lazy_dialog_button(f'Delete from {lbl}', lambda: del_builder(pool, lbl))
+
+            ui.button(f'Browse {lbl}', on_click=with_loading(lambda: show_all(role, lbl, result_areas)))
+            get_builder = get_dialog_builders.get(lbl, build_generic_get_dialog)
+            lazy_dialog_button(f'Filter from {lbl}', lambda: get_builder(pool, lbl, result_areas))
+            if privileges[lbl].get('UPDATE', False):
+                upd_builder = update_dialog_builders.get(lbl, build_generic_update_dialog)
+                lazy_dialog_button(f'Update {lbl}', lambda: upd_builder(pool, lbl))
+
+        ui.separator()
+        result_areas[lbl] = ResultTable()
+
     with ui.column().classes('full-width') as dashboard_page:
         with ui.row().classes('full-width items-center q-pb-sm'):
             ui.label('Вы вошли как hr').classes('text-h6')
             ui.space().classes('grow')
+            ui.button('Обновить схему', on_click=refresh_schema).props('flat')
             ui.button('Выйти', on_click=on_logout).classes('q-btn-negative')
 
         labels = entities
@@ -26,31 +63,7 @@ def build_dashboard(user, on_logout):
                     for lbl in labels:
                         ui.tab(lbl)
             with ui.column().style('flex: 1;'):
-                with ui.tab_panels(tabs, value=labels[0]).props('vertical').classes('full-width center') as panels:
-                    for lbl in labels:
-                        with ui.tab_panel(lbl):
-                            with ui.row().classes('full-width q-gutter-sm'):
-                                # Check user privileges
-                                privileges = check_user_privileges(db_manager.conn, lbl)
-                                # Buttons go HEREEEEEE
-                                # Add button with dialogggg
-                                if privileges.get('INSERT', False):
-                                    add_builder = add_dialog_builders.get(lbl, build_generic_add_dialog)
-                                    add_dlg = add_builder(db_manager.conn, lbl)
-                                    ui.button(f'Add to {lbl}', on_click=add_dlg.open)
-                                if privileges.get('DELETE', False):
-                                    del_builder = delete_dialog_builders.get(lbl, build_generic_delete_dialog)
-                                    del_dlg = del_builder(db_manager.conn, lbl)
-                                    ui.button(f'Delete from {lbl}', on_click=del_dlg.open)
-
-                                get_builder = get_dialog_builders.get(lbl, build_generic_get_dialog)
-                                get_dlg = get_builder(db_manager.conn, lbl, result_areas)
-                                ui.button(f'Filter from {lbl}', on_click=get_dlg.open)
-                                if privileges.get('UPDATE', False):
-                                    upd_builder = update_dialog_builders.get(lbl, build_generic_update_dialog)
-                                    upd_dlg = upd_builder(db_manager.conn, lbl)
-                                    ui.button(f'Update {lbl}', on_click=upd_dlg.open)
-
-                            ui.separator()
-                            result_areas[lbl] = ui.table(columns=[], rows=[]).classes('full-width')
+                # panel contents are built when a tab is first selected
+                panel_builders = {lbl: (lambda l=lbl: build_table_panel(l)) for lbl in labels}
+                lazy_tab_panels(tabs, panel_builders, value=labels[0]).props('vertical').classes('full-width center')
     return dashboard_page
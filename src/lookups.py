@@ -0,0 +1,136 @@
+import asyncio
+from collections import defaultdict
+
+from nicegui import background_tasks
+from psycopg import sql
+from psycopg_pool import AsyncConnectionPool
+
+from config import LOOKUP_SEARCH_LIMIT, LOOKUP_SEARCH_MIN_LENGTH
+
+# Seconds to wait after a table change before reloading its lookups, so a burst of writes costs one reload
+REFRESH_DELAY = 1.0
+
+
+class Lookup:
+    """Option names of a lookup select, ordered by name, and name -> id."""
+    def __init__(self, rows):
+        self.options = [name for _, name in rows]
+        self.id_map = {name: id_ for id_, name in rows}
+
+
+async def load_lookup(conn, table: str, name_col: str, id_col: str) -> Lookup:
+    query = sql.SQL("SELECT DISTINCT {id}, {name} FROM {tbl} ORDER BY {name}").format(
+        id=sql.Identifier(id_col),
+        name=sql.Identifier(name_col),
+        tbl=sql.Identifier(table)
+    )
+    async with conn.cursor() as cur:
+        await cur.execute(query)
+        return Lookup(await cur.fetchall())
+
+
+def escape_like(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+async def search_lookup(pool: AsyncConnectionPool, table: str, name_col: str, id_col: str,
+                        text: str, limit: int = LOOKUP_SEARCH_LIMIT) -> dict:
+    """
+    id -> name of at most `limit` rows whose name contains `text`, case-insensitively,
+    names starting with it first. Meant for lookups too large to load whole; the indexes of
+    db-init/11-add-indexes.sql keep it an index scan. Text shorter than LOOKUP_SEARCH_MIN_LENGTH
+    has too few trigrams for the trigram index, so it only matches the start of the name, through
+    the lower(name) prefix index. Empty text matches nothing and sends no query.
+    """
+    text = text.strip()
+    if not text:
+        return {}
+    pattern = escape_like(text)
+    if len(text) < LOOKUP_SEARCH_MIN_LENGTH:
+        query = sql.SQL(
+            "SELECT {id}, {name} FROM {tbl} WHERE lower({name}) LIKE lower(%s) "
+            "ORDER BY {name} LIMIT %s"
+        )
+        params = [f'{pattern}%', limit]
+    else:
+        query = sql.SQL(
+            "SELECT {id}, {name} FROM {tbl} WHERE {name} ILIKE %s "
+            "ORDER BY {name} ILIKE %s DESC, {name} LIMIT %s"
+        )
+        params = [f'%{pattern}%', f'{pattern}%', limit]
+    query = query.format(
+        id=sql.Identifier(id_col),
+        name=sql.Identifier(name_col),
+        tbl=sql.Identifier(table)
+    )
+    async with pool.connection() as conn, conn.cursor() as cur:
+        await cur.execute(query, params)
+        return dict(await cur.fetchall())
+
+
+class LookupCache:
+    """
+    Lookup options keyed by (table, name column, id column), shared by every session
+    and dialog builder, so a dimension table is read once rather than once per select.
+
+    Lookups are kept per role, since roles may see different rows. When a table change
+    notification arrives, the lookups read from that table are dropped and reloaded in
+    the background, so the next dialog finds them warm.
+    """
+    def __init__(self):
+        # (role, table, name_col, id_col) -> Lookup
+        self._lookups: dict[tuple, Lookup] = {}
+        self._pools: dict[str, AsyncConnectionPool] = {}
+        # bumped by every change, so a lookup loaded across one isn't kept
+        self._generation = 0
+        # lookups dropped by a change and waiting to be reloaded
+        self._stale: set[tuple] = set()
+        self._refresh_task = None
+
+    async def get_many(self, pool: AsyncConnectionPool, specs) -> dict[tuple, Lookup]:
+        """Lookups for (table, name_col, id_col) specs, loading the missing ones over one connection."""
+        # pools are named after their role
+        role = pool.name
+        self._pools[role] = pool
+        lookups = {spec: self._lookups.get((role, *spec)) for spec in specs}
+        missing = [spec for spec, lookup in lookups.items() if lookup is None]
+        if missing:
+            generation = self._generation
+            async with pool.connection() as conn:
+                for spec in missing:
+                    lookups[spec] = await load_lookup(conn, *spec)
+            if generation == self._generation:
+                for spec in missing:
+                    self._lookups[(role, *spec)] = lookups[spec]
+        return lookups
+
+    async def get(self, pool: AsyncConnectionPool, table: str, name_col: str, id_col: str) -> Lookup:
+        spec = (table, name_col, id_col)
+        return (await self.get_many(pool, [spec]))[spec]
+
+    def on_table_change(self, payload: str | None):
+        self._generation += 1
+        for key in [key for key in self._lookups if payload is None or key[1] == payload]:
+            del self._lookups[key]
+            self._stale.add(key)
+        if self._stale and self._refresh_task is None:
+            self._refresh_task = background_tasks.create(self._refresh(), name='refresh lookups')
+
+    async def _refresh(self):
+        await asyncio.sleep(REFRESH_DELAY)
+        self._refresh_task = None
+        stale, self._stale = self._stale, set()
+        by_role = defaultdict(list)
+        for role, *spec in stale:
+            by_role[role].append(tuple(spec))
+        for role, specs in by_role.items():
+            pool = self._pools.get(role)
+            if pool is None or pool.closed:
+                continue
+            try:
+                await self.get_many(pool, specs)
+            except Exception as e:
+                print(f"Failed to reload lookups of role '{role}': {e}")
+
+
+lookup_cache = LookupCache()
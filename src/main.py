@@ -4,20 +4,42 @@ import ui_login
 import admin_dashboard
 import hr_dashboard
 from db import db_manager
+from catalog import catalog_cache, DDL_CHANNEL
+from notifications import notification_listener
+from result_cache import result_cache, TABLE_CHANNEL
+from lookups import lookup_cache
+from materialized import refresh_scheduler
+from retry import retry_metrics
 
 
 user = User()
 
 
-def shutdown():
-    db_manager.disconnect()
+def startup():
+    notification_listener.subscribe(DDL_CHANNEL, catalog_cache.on_ddl_change)
+    notification_listener.subscribe(DDL_CHANNEL, result_cache.on_ddl_change)
+    notification_listener.subscribe(TABLE_CHANNEL, result_cache.on_table_change)
+    notification_listener.subscribe(TABLE_CHANNEL, lookup_cache.on_table_change)
+    notification_listener.subscribe(TABLE_CHANNEL, refresh_scheduler.on_table_change)
+    notification_listener.subscribe(DDL_CHANNEL, refresh_scheduler.on_ddl_change)
+    notification_listener.start()
+    refresh_scheduler.start()
+
+
+async def shutdown():
+    await notification_listener.stop()
+    await refresh_scheduler.stop()
+    await db_manager.disconnect()
     print('Соединение с базой данных закрыто')
+    if metrics := retry_metrics.describe():
+        print(f'Retried transactions:\n{metrics}')
 
 
 def disconnect():
     user.role = ''
 
 
+app.on_startup(startup)
 app.on_shutdown(shutdown)
 app.on_disconnect(disconnect)
 
@@ -37,9 +59,9 @@ def index_page():
 
 @ui.page('/login')
 def login_page():
-    def handle_login(username: str, password: str, role: str):
+    async def handle_login(username: str, password: str, role: str):
         if authenticate_user(username, password, role):
-            if user.change_role(role):
+            if await user.change_role(role):
                 ui.notify(f'Добро пожаловать, {username}!', color='positive')
                 redirect_based_on_role()
             else:
@@ -68,7 +90,7 @@ def authenticate_user(username: str, password: str, role: str) -> bool:
 
 
 @ui.page('/admin')
-def admin_page():
+async def admin_page():
     if user.get_role() != 'admin':
         redirect_based_on_role()
         return
@@ -77,11 +99,11 @@ def admin_page():
         user.logout()
         ui.navigate.to('/login')
 
-    admin_dashboard.build_dashboard(user, handle_logout)
+    await admin_dashboard.build_dashboard(user, handle_logout)
 
 
 @ui.page('/hr')
-def hr_page():
+async def hr_page():
     if user.get_role() != 'hr':
         redirect_based_on_role()
         return
@@ -90,7 +112,7 @@ def hr_page():
         user.logout()
         ui.navigate.to('/login')
 
-    hr_dashboard.build_dashboard(user, handle_logout)
+    await hr_dashboard.build_dashboard(user, handle_logout)
 
 
 if __name__ in {'__main__', '__mp_main__'}:
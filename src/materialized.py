@@ -0,0 +1,128 @@
+import asyncio
+import time
+
+import psycopg
+from nicegui import background_tasks
+from psycopg import sql
+
+from catalog import get_view_tables, ddl_change, DATA_ONLY_TAGS
+from config import LISTEN_DSN, MATVIEW_REFRESH_DELAY
+from result_cache import result_cache
+
+
+class MaterializedView:
+    """
+    State of one materialized summary (db-init/12-add-materialized-views.sql).
+
+    refreshed_at: time of the last refresh by this process, None until the first one;
+                  until then readers go to the live view
+    dirty:        a table it reads changed after that refresh
+    """
+    def __init__(self, name: str, view: str):
+        self.name = name
+        self.view = view
+        self.tables: set[str] = set()
+        self.refreshed_at: float | None = None
+        self.dirty = True
+
+    @property
+    def available(self) -> bool:
+        return self.refreshed_at is not None
+
+    def describe(self) -> str:
+        if not self.available:
+            return 'No snapshot yet, reading live data'
+        refreshed = time.strftime('%H:%M:%S', time.localtime(self.refreshed_at))
+        return f"Snapshot of {refreshed}" + (', newer changes pending refresh' if self.dirty else ', up to date')
+
+
+class RefreshScheduler:
+    """
+    Keeps the materialized summaries close to their live views.
+
+    Table change notifications mark the materialized views reading that table dirty;
+    MATVIEW_REFRESH_DELAY seconds after the first such change, every dirty one is
+    refreshed with REFRESH MATERIALIZED VIEW CONCURRENTLY, so a burst of writes costs
+    one refresh and readers are never blocked.
+    """
+    def __init__(self, dsn: str, views: dict[str, str], delay: float = MATVIEW_REFRESH_DELAY):
+        self.dsn = dsn
+        self.delay = delay
+        # live view name -> its materialized copy
+        self.views = {view: MaterializedView(name, view) for view, name in views.items()}
+        self._dependencies_loaded = False
+        self._wake = asyncio.Event()
+        self._task = None
+
+    def get(self, view: str) -> MaterializedView | None:
+        return self.views.get(view)
+
+    def start(self):
+        if self.dsn and self._task is None:
+            self._task = background_tasks.create(self._run(), name='materialized view refresh')
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def on_table_change(self, payload: str | None):
+        for mv in self.views.values():
+            if payload is None or not self._dependencies_loaded or payload in mv.tables:
+                mv.dirty = True
+        if any(mv.dirty for mv in self.views.values()):
+            self._wake.set()
+
+    def on_ddl_change(self, payload: str | None):
+        change = ddl_change(payload)
+        # the notification of our own REFRESH, were it sent, must not schedule the next one
+        if change is not None and change[0] in DATA_ONLY_TAGS:
+            return
+        name = None if change is None else change[1]
+        affected = [mv for mv in self.views.values()
+                    if name is None or name in (mv.name, mv.view) or name in mv.tables]
+        if not affected:
+            return
+        self._dependencies_loaded = False
+        for mv in affected:
+            mv.dirty = True
+        self._wake.set()
+
+    async def _run(self):
+        while True:
+            await self._wake.wait()
+            await asyncio.sleep(self.delay)
+            self._wake.clear()
+            try:
+                await self._refresh_dirty()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Materialized view refresh failed: {e}")
+
+    async def _refresh_dirty(self):
+        async with await psycopg.AsyncConnection.connect(self.dsn, autocommit=True) as conn:
+            if not self._dependencies_loaded:
+                view_tables = await get_view_tables(conn)
+                for mv in self.views.values():
+                    mv.tables = view_tables.get(mv.name, set())
+                self._dependencies_loaded = True
+            for mv in self.views.values():
+                if not mv.dirty:
+                    continue
+                # cleared first: a change arriving during the refresh marks it dirty again
+                mv.dirty = False
+                try:
+                    await conn.execute(sql.SQL("REFRESH MATERIALIZED VIEW CONCURRENTLY {}").format(sql.Identifier(mv.name)))
+                except Exception as e:
+                    mv.dirty = True
+                    print(f"Failed to refresh {mv.name}: {e}")
+                    continue
+                mv.refreshed_at = time.time()
+                result_cache.invalidate(mv.name)
+
+
+refresh_scheduler = RefreshScheduler(LISTEN_DSN, {
+    'v_ongoing_product_counts': 'mv_ongoing_product_counts',
+    'v_sections_and_chiefs_summary': 'mv_sections_and_chiefs_summary',
+})
@@ -0,0 +1,63 @@
+import asyncio
+from collections import defaultdict
+from typing import Callable
+
+import psycopg
+from psycopg import sql
+from nicegui import background_tasks
+
+from config import LISTEN_DSN
+
+RECONNECT_DELAY = 5.0
+
+
+class NotificationListener:
+    """
+    Holds one dedicated connection that LISTENs on every subscribed channel and
+    hands each NOTIFY payload to the channel's callbacks.
+
+    Callbacks take the payload string. After (re)connecting, every callback is
+    called once with None, since anything may have changed while nobody was listening.
+    """
+    def __init__(self, dsn: str):
+        self.dsn = dsn
+        self.callbacks: dict[str, list[Callable]] = defaultdict(list)
+        self._task = None
+
+    def subscribe(self, channel: str, callback: Callable):
+        self.callbacks[channel].append(callback)
+
+    def start(self):
+        if self.dsn and self._task is None:
+            self._task = background_tasks.create(self._run(), name='notification listener')
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def _dispatch(self, channel: str, payload: str | None):
+        for callback in self.callbacks.get(channel, []):
+            try:
+                callback(payload)
+            except Exception as e:
+                print(f"Notification callback for '{channel}' failed: {e}")
+
+    async def _run(self):
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(self.dsn, autocommit=True) as conn:
+                    for channel in self.callbacks:
+                        await conn.execute(sql.SQL('LISTEN {}').format(sql.Identifier(channel)))
+                    for channel in self.callbacks:
+                        self._dispatch(channel, None)
+                    async for notify in conn.notifies():
+                        self._dispatch(notify.channel, notify.payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Notification listener disconnected: {e}")
+                await asyncio.sleep(RECONNECT_DELAY)
+
+
+notification_listener = NotificationListener(LISTEN_DSN)
@@ -0,0 +1,89 @@
+from psycopg import sql
+from psycopg.rows import dict_row
+
+from config import BROWSE_ROWS_PER_PAGE, EXACT_COUNT_LIMIT
+from db import array_columns
+
+
+class KeysetPager:
+    """
+    Serves pages of one table to a server-side paginated ui.table (Quasar's @request protocol),
+    as dict rows; `arrays` names the array columns of the last page.
+
+    Rows are ordered by the requested sort column and then the primary key, and a page
+    is located by the key of the last row on the page before it:
+        WHERE (sort_col, pk...) > (%s, %s...) ORDER BY sort_col, pk... LIMIT n
+    so each page is one index range scan whatever its depth. Pages whose predecessor
+    has not been fetched yet (a jump to the last page), tables without a primary key
+    and sorts on nullable columns fall back to OFFSET.
+    """
+    def __init__(self, pool, table_name: str, primary_keys: list[str], nullable_columns: set[str]):
+        self.pool = pool
+        self.table_name = table_name
+        self.primary_keys = primary_keys
+        self.nullable_columns = nullable_columns
+        self.total = 0
+        self.arrays: list[str] = []
+        self._order = None
+        # page number -> key of the last row on the previous page
+        self._after: dict[int, tuple] = {}
+
+    async def count(self) -> int:
+        """Row count for the paginator: exact for small tables, the planner's estimate for large ones."""
+        async with self.pool.connection() as conn, conn.cursor() as cur:
+            await cur.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)",
+                [sql.Identifier(self.table_name).as_string(conn)]
+            )
+            row = await cur.fetchone()
+            estimate = row[0] if row else -1
+            if 0 <= EXACT_COUNT_LIMIT < estimate:
+                self.total = estimate
+            else:
+                await cur.execute(sql.SQL("SELECT COUNT(*) FROM {tbl}").format(tbl=sql.Identifier(self.table_name)))
+                self.total = (await cur.fetchone())[0]
+        return self.total
+
+    def _order_columns(self, sort_by):
+        if sort_by and sort_by not in self.primary_keys:
+            return [sort_by] + self.primary_keys
+        return list(self.primary_keys)
+
+    async def fetch_page(self, page: int, rows_per_page: int, sort_by=None, descending=False):
+        """Return (column names, rows) of a 1-based page."""
+        rows_per_page = rows_per_page or BROWSE_ROWS_PER_PAGE
+        if self._order != (sort_by, descending, rows_per_page):
+            self._order = (sort_by, descending, rows_per_page)
+            self._after = {1: ()}
+
+        order_cols = self._order_columns(sort_by)
+        keyset = bool(self.primary_keys) and sort_by not in self.nullable_columns
+        after = self._after.get(page) if keyset else None
+
+        parts = [sql.SQL("SELECT * FROM {tbl}").format(tbl=sql.Identifier(self.table_name))]
+        params = []
+        if after:
+            parts.append(sql.SQL("WHERE ({cols}) {op} ({phs})").format(
+                cols=sql.SQL(', ').join(map(sql.Identifier, order_cols)),
+                op=sql.SQL('<' if descending else '>'),
+                phs=sql.SQL(', ').join(sql.Placeholder() for _ in after)
+            ))
+            params.extend(after)
+        if order_cols or sort_by:
+            direction = sql.SQL('DESC' if descending else 'ASC')
+            parts.append(sql.SQL("ORDER BY {order}").format(order=sql.SQL(', ').join(
+                sql.SQL("{} {}").format(sql.Identifier(col), direction) for col in order_cols or [sort_by]
+            )))
+        parts.append(sql.SQL("LIMIT {}").format(sql.Literal(rows_per_page)))
+        if after is None and page > 1:
+            parts.append(sql.SQL("OFFSET {}").format(sql.Literal((page - 1) * rows_per_page)))
+
+        async with self.pool.connection() as conn, conn.cursor(row_factory=dict_row) as cur:
+            await cur.execute(sql.SQL(' ').join(parts), params)
+            cols = [desc[0] for desc in cur.description]
+            self.arrays = array_columns(cur.description)
+            rows = await cur.fetchall()
+
+        if keyset and rows:
+            self._after[page + 1] = tuple(rows[-1][col] for col in order_cols)
+        return cols, rows
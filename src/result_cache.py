@@ -0,0 +1,97 @@
+import time
+from collections import OrderedDict
+
+from catalog import ddl_change, DATA_ONLY_TAGS
+from config import RESULT_CACHE_TTL, RESULT_CACHE_MAX_BYTES
+
+# Channel the table change triggers (db-init/10-add-notifications.sql) notify on, with the table name as payload
+TABLE_CHANNEL = 'table_changes'
+
+
+class CachedResult:
+    def __init__(self, cols, rows, arrays, tables: frozenset[str] | None, size: int):
+        self.cols = cols
+        self.rows = rows
+        self.arrays = arrays
+        # base tables the result was computed from; None when unknown (functions)
+        self.tables = tables
+        self.size = size
+        self.created_at = time.monotonic()
+
+
+class ResultCache:
+    """
+    Results of summary views and functions, shared by every session.
+
+    Keyed by (view or function, normalized filter values, role). Least recently used
+    entries are evicted beyond RESULT_CACHE_MAX_BYTES of row data, entries older than
+    RESULT_CACHE_TTL are dropped on access, and a notification that a table changed drops
+    every entry computed from it (and every entry whose tables are unknown). A DDL notification
+    drops the same for the object it names, and the entries of that view or function.
+    """
+    def __init__(self, max_bytes: int = RESULT_CACHE_MAX_BYTES, ttl: float = RESULT_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        # bumped by every invalidation, so a result computed across one isn't cached
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[tuple, CachedResult] = OrderedDict()
+
+    @staticmethod
+    def key(name: str, filters: dict, role: str) -> tuple:
+        """Cache key with the filters that are set, in a stable order."""
+        values = tuple(sorted(
+            (k, str(sorted(v, key=str) if isinstance(v, list) else v))
+            for k, v in filters.items() if v is not None and v != 'Any' and v != []
+        ))
+        return name, values, role
+
+    def get(self, key: tuple) -> CachedResult | None:
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry.created_at > self.ttl:
+            self._drop(key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: tuple, entry: CachedResult, generation: int):
+        """Cache `entry`, unless it is too large or an invalidation happened since `generation` was read."""
+        if entry.size > self.max_bytes or generation != self.generation:
+            return
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = entry
+        self.size += entry.size
+        while self.size > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+
+    def invalidate(self, table: str | None = None):
+        """Drop the entries computed from `table` or of the view or function `table`; all of them when None."""
+        self.generation += 1
+        if table is None:
+            self._entries.clear()
+            self.size = 0
+            return
+        for key in [k for k, e in self._entries.items() if e.tables is None or table in e.tables or k[0] == table]:
+            self._drop(key)
+
+    def on_table_change(self, payload: str | None):
+        self.invalidate(payload)
+
+    def on_ddl_change(self, payload: str | None):
+        change = ddl_change(payload)
+        if change is not None and change[0] in DATA_ONLY_TAGS:
+            return
+        self.invalidate(None if change is None else change[1])
+
+    def _drop(self, key: tuple):
+        self.size -= self._entries.pop(key).size
+
+
+result_cache = ResultCache()
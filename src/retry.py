@@ -0,0 +1,83 @@
+import asyncio
+import random
+
+import psycopg
+from psycopg import IsolationLevel
+
+from config import TX_MAX_ATTEMPTS, TX_RETRY_BASE_DELAY, TX_RETRY_MAX_DELAY
+
+# serialization_failure and deadlock_detected: the transaction did nothing wrong and may succeed if run again
+RETRY_SQLSTATES = frozenset({'40001', '40P01'})
+
+
+class RetryStats:
+    """Counters of one kind of transaction."""
+    def __init__(self):
+        self.calls = 0
+        self.retries = 0
+        self.gave_up = 0
+        self.wait_seconds = 0.0
+
+    def describe(self) -> str:
+        return (f'{self.calls} call(s), {self.retries} retried, {self.gave_up} gave up, '
+                f'{self.wait_seconds:.2f} s waited')
+
+
+class RetryMetrics:
+    """Retries and backoff time of the transactions run by run_transaction, by label."""
+    def __init__(self):
+        self._stats: dict[str, RetryStats] = {}
+
+    def __getitem__(self, label: str) -> RetryStats:
+        return self._stats.setdefault(label, RetryStats())
+
+    def describe(self) -> str:
+        return '\n'.join(f'{label}: {stats.describe()}' for label, stats in sorted(self._stats.items()))
+
+
+retry_metrics = RetryMetrics()
+
+
+def backoff_delay(attempt: int) -> float:
+    """Seconds to wait before retry `attempt` (1 for the first): full jitter over an exponential cap."""
+    return random.uniform(0, min(TX_RETRY_MAX_DELAY, TX_RETRY_BASE_DELAY * 2 ** (attempt - 1)))
+
+
+async def run_transaction(pool, work, isolation_level: IsolationLevel | None = None,
+                          label: str = 'transaction', max_attempts: int = TX_MAX_ATTEMPTS):
+    """
+    Run `await work(conn)` in a transaction of a pooled connection at `isolation_level`
+    (the server default when None) and return its result.
+
+    A transaction failing with a serialization failure or a deadlock is rolled back and run
+    again, up to `max_attempts` times in all, after a jittered exponential backoff. Any other
+    error, or the last retryable one, is raised as is. Pooled connections are reset to the
+    default isolation level when they are returned, so the level set here never leaks.
+    """
+    stats = retry_metrics[label]
+    stats.calls += 1
+    for attempt in range(1, max_attempts + 1):
+        try:
+            async with pool.connection() as conn:
+                await conn.set_isolation_level(isolation_level)
+                async with conn.transaction():
+                    return await work(conn)
+        except psycopg.Error as e:
+            if e.sqlstate not in RETRY_SQLSTATES:
+                raise
+            if attempt == max_attempts:
+                stats.gave_up += 1
+                raise
+            delay = backoff_delay(attempt)
+            stats.retries += 1
+            stats.wait_seconds += delay
+            await asyncio.sleep(delay)
+
+
+async def execute_transaction(pool, query, params=None, *, label: str,
+                              isolation_level: IsolationLevel | None = None):
+    """Run one statement as a transaction with run_transaction, counted under `label`."""
+    async def work(conn):
+        await conn.execute(query, params)
+
+    await run_transaction(pool, work, isolation_level, label)
@@ -1,8 +1,15 @@
 from typing import Callable
 from nicegui import ui
 from psycopg import sql, OperationalError, IsolationLevel
-
-from ui_common import display_result
+from psycopg.rows import dict_row
+
+from catalog import catalog_cache
+from db import array_columns, result_size
+from explain import explain_and_show
+from lookups import lookup_cache, search_lookup
+from materialized import refresh_scheduler
+from result_cache import result_cache, CachedResult
+from ui_common import display_result, with_loading, search_select
 from utils import create_date_input_field
 from view_filter_config import FILTER_CONFIG
 
@@ -15,7 +22,7 @@ def register_dialog(table_name: str):
     return decorator
 
 
-def get_filter_options(conn, name) -> dict:
+async def get_filter_options(pool, name) -> dict:
     """
     Generates a dictionary of available filter options for a given view or function.
 
@@ -23,17 +30,23 @@ def get_filter_options(conn, name) -> dict:
     are available for the given `name` and how to fetch their possible values
     (e.g., from a database table, a hardcoded list, or special types like boolean/date).
 
+    Database lookups come from the shared lookups.lookup_cache, so a dimension table
+    used by several filters or views is read only once. Lookups and lists are
+    multi-selects ('multiple': True): views compare them with `col = ANY(%s)`, and
+    function parameters receive them as arrays.
+
     Args:
-        conn: An active psycopg3 database connection.
+        pool: The role's connection pool.
         name: The name of the database view or function (e.g., 'v_staff_composition').
 
     Returns:
         A dictionary where each key is a filter's name and the value is another
         dictionary containing its details.
-        - For DB lookups: {'options': ['Name1', 'Name2'], 'id_map': {'Name1': 1, 'Name2': 2}}
-        - For lists: {'options': ['Val1', 'Val2'], 'id_map': {'Val1': 'Val1', ...}}
+        - For DB lookups: {'options': ['Name1', 'Name2'], 'id_map': {'Name1': 1, 'Name2': 2}, 'multiple': True}
+        - For lists: {'options': ['Val1', 'Val2'], 'id_map': {'Val1': 'Val1', ...}, 'multiple': True}
         - For booleans: {'options': ['Yes', 'No'], 'id_map': {'Yes': True, 'No': False}}
         - For dates: {'type': 'date'}
+        - For searched DB lookups: {'type': 'search', 'lookup': ('table', 'name_col', 'id_col'), 'multiple': True}
 
     Raises:
         ValueError: If the provided `name` is not found in FILTER_CONFIG.
@@ -45,56 +58,55 @@ def get_filter_options(conn, name) -> dict:
     config = FILTER_CONFIG[name]
     filter_data = {}
 
-    with conn.cursor() as cur:
-        for filter_name, filter_config_entry in config.items(): # Renamed to avoid shadowing
-
-            # Case 1: Database lookup -> ('table', 'name_col', 'id_col')
-            if isinstance(filter_config_entry, tuple) and len(filter_config_entry) == 3:
-                table, name_col, id_col = filter_config_entry
-                query = sql.SQL("SELECT DISTINCT {id}, {name} FROM {tbl} ORDER BY {name}").format(
-                    id=sql.Identifier(id_col),
-                    name=sql.Identifier(name_col),
-                    tbl=sql.Identifier(table)
-                )
-                cur.execute(query)
-                rows = cur.fetchall()
-                options = [row[1] for row in rows]
-                id_map = {row[1]: row[0] for row in rows}
-                filter_data[filter_name] = {'options': options, 'id_map': id_map}
-
-            # Case 2: Hardcoded list of options
-            elif isinstance(filter_config_entry, list):
-                id_map = {opt: opt for opt in filter_config_entry}
-                filter_data[filter_name] = {'options': filter_config_entry, 'id_map': id_map}
-
-            # Case 3: Boolean type
-            elif filter_config_entry == 'boolean':
-                filter_data[filter_name] = {
-                    'options': ['Yes', 'No'],
-                    'id_map': {'Yes': True, 'No': False}
-                }
-
-            # Case 4: Date types (MODIFIED)
-            elif isinstance(filter_config_entry, str) and filter_config_entry == 'date':
-                filter_data[filter_name] = {'type': 'date'}
-            elif isinstance(filter_config_entry, str) and filter_config_entry.startswith('date_range_start:'):
-                parts = filter_config_entry.split(':', 1)
-                if len(parts) == 2 and parts[1]:
-                    filter_data[filter_name] = {'type': 'date_range_start', 'target_column': parts[1]}
-                else:
-                    raise ValueError(f"Invalid date_range_start format for '{filter_name}': {filter_config_entry}")
-            elif isinstance(filter_config_entry, str) and filter_config_entry.startswith('date_range_end:'):
-                parts = filter_config_entry.split(':', 1)
-                if len(parts) == 2 and parts[1]:
-                    filter_data[filter_name] = {'type': 'date_range_end', 'target_column': parts[1]}
-                else:
-                    raise ValueError(f"Invalid date_range_end format for '{filter_name}': {filter_config_entry}")
+    lookups = await lookup_cache.get_many(
+        pool, [entry for entry in config.values() if isinstance(entry, tuple) and len(entry) == 3]
+    )
+
+    for filter_name, filter_config_entry in config.items(): # Renamed to avoid shadowing
+
+        # Case 1: Database lookup -> ('table', 'name_col', 'id_col')
+        if isinstance(filter_config_entry, tuple) and len(filter_config_entry) == 3:
+            lookup = lookups[filter_config_entry]
+            filter_data[filter_name] = {'options': lookup.options, 'id_map': lookup.id_map, 'multiple': True}
+
+        # Case 1b: Database lookup searched as the user types -> ('table', 'name_col', 'id_col', 'search')
+        elif isinstance(filter_config_entry, tuple) and len(filter_config_entry) == 4 \
+                and filter_config_entry[3] == 'search':
+            filter_data[filter_name] = {'type': 'search', 'lookup': filter_config_entry[:3], 'multiple': True}
+
+        # Case 2: Hardcoded list of options
+        elif isinstance(filter_config_entry, list):
+            id_map = {opt: opt for opt in filter_config_entry}
+            filter_data[filter_name] = {'options': filter_config_entry, 'id_map': id_map, 'multiple': True}
+
+        # Case 3: Boolean type
+        elif filter_config_entry == 'boolean':
+            filter_data[filter_name] = {
+                'options': ['Yes', 'No'],
+                'id_map': {'Yes': True, 'No': False}
+            }
+
+        # Case 4: Date types (MODIFIED)
+        elif isinstance(filter_config_entry, str) and filter_config_entry == 'date':
+            filter_data[filter_name] = {'type': 'date'}
+        elif isinstance(filter_config_entry, str) and filter_config_entry.startswith('date_range_start:'):
+            parts = filter_config_entry.split(':', 1)
+            if len(parts) == 2 and parts[1]:
+                filter_data[filter_name] = {'type': 'date_range_start', 'target_column': parts[1]}
+            else:
+                raise ValueError(f"Invalid date_range_start format for '{filter_name}': {filter_config_entry}")
+        elif isinstance(filter_config_entry, str) and filter_config_entry.startswith('date_range_end:'):
+            parts = filter_config_entry.split(':', 1)
+            if len(parts) == 2 and parts[1]:
+                filter_data[filter_name] = {'type': 'date_range_end', 'target_column': parts[1]}
             else:
-                raise TypeError(f"Unsupported filter configuration for '{filter_name}': {filter_config_entry}")
+                raise ValueError(f"Invalid date_range_end format for '{filter_name}': {filter_config_entry}")
+        else:
+            raise TypeError(f"Unsupported filter configuration for '{filter_name}': {filter_config_entry}")
     return filter_data
 
 
-def common_summary_dialog_builder(conn, table_name, result_areas):
+async def common_summary_dialog_builder(pool, table_name, result_areas):
     """
     Generic builder for summary dialogs based on FILTER_CONFIG.
     `table_name` is the key from FILTER_CONFIG (view or function name).
@@ -102,7 +114,7 @@ def common_summary_dialog_builder(conn, table_name, result_areas):
     dialog_name = table_name
 
     try:
-        filter_options_data = get_filter_options(conn, dialog_name)
+        filter_options_data = await get_filter_options(pool, dialog_name)
     except Exception as e:
         ui.notify(f"Error fetching filter options for {dialog_name}: {e}", color='negative')
         return ui.dialog()
@@ -124,11 +136,26 @@ def common_summary_dialog_builder(conn, table_name, result_areas):
                     filter_type_str == 'date_range_start' or \
                     filter_type_str == 'date_range_end':
                 inputs[name] = create_date_input_field(label_text)
-            elif 'options' in data:  # Covers boolean, list, DB lookup
+            elif filter_type_str == 'search':  # value is the list of looked up ids, empty for "Any"
+                inputs[name] = search_select(
+                    label_text, lambda text, lookup=data['lookup']: search_lookup(pool, *lookup, text), multiple=True
+                ).classes('w-full')
+            elif data.get('multiple'):  # list, DB lookup; nothing chosen means "Any"
+                inputs[name] = ui.select(data['options'], label=label_text, multiple=True, value=[], clearable=True) \
+                    .props('use-chips').classes('w-full')
+            elif 'options' in data:  # boolean
                 current_options = ["Any"] + data['options']
                 inputs[name] = ui.select(current_options, label=label_text, value="Any").classes('w-full')
 
-        def on_submit():
+        # summaries with a materialized copy read it unless live data is asked for
+        materialized = refresh_scheduler.get(dialog_name)
+        if materialized:
+            live_checkbox = ui.checkbox('Live data (slower)')
+            staleness_label = ui.label(materialized.describe()).classes('text-caption text-grey')
+            ui.timer(5.0, lambda: staleness_label.set_text(materialized.describe()))
+
+        def build_query():
+            """(query, params, source) the dialog's filters ask for, or None after notifying of a missing value."""
             dialog_is_function = dialog_name.startswith("get_")
             fn_call_args = []
             fn_call_placeholders = []
@@ -148,14 +175,19 @@ def common_summary_dialog_builder(conn, table_name, result_areas):
                         # or keep them mandatory as they are often for functions.
                         # For now, assuming date params for functions are mandatory if configured.
                         ui.notify(f"{p_key[2:].replace('_', ' ').title()} is required.", color='negative')
-                        return
+                        return None
                     fn_call_args.append(p_value)
+                elif p_config_detail.get('type') == 'search':
+                    fn_call_args.append(p_value or None)
+                elif p_config_detail.get('multiple'):
+                    fn_call_args.append([p_config_detail['id_map'][v] for v in p_value] or None)
                 elif 'options' in p_config_detail:
                     if p_value == "Any":
                         fn_call_args.append(None)
                     else:
                         fn_call_args.append(p_config_detail['id_map'][p_value])
-                fn_call_placeholders.append(sql.SQL('%s'))
+                # named notation, so optional parameters can be given in any order
+                fn_call_placeholders.append(sql.SQL('{} => %s').format(sql.Identifier(p_key)))
 
             for filter_key in all_config_keys_ordered:
                 if filter_key.startswith("p_") and dialog_is_function:
@@ -165,7 +197,7 @@ def common_summary_dialog_builder(conn, table_name, result_areas):
                 ui_input_element = inputs[filter_key]
                 value = ui_input_element.value
 
-                if value is None or (isinstance(value, str) and value == "Any"):
+                if value is None or value == [] or (isinstance(value, str) and value == "Any"):
                     continue
 
                 # MODIFIED: WHERE clause construction for date filters
@@ -174,6 +206,12 @@ def common_summary_dialog_builder(conn, table_name, result_areas):
                 if filter_type == 'date':
                     where_clauses.append(sql.SQL("{} = %s").format(sql.Identifier(filter_key)))
                     where_params.append(value)
+                elif filter_type == 'search':
+                    where_clauses.append(sql.SQL("{} = ANY(%s)").format(sql.Identifier(filter_key)))
+                    where_params.append(value)
+                elif config_detail.get('multiple'):  # list, DB lookup: one array parameter
+                    where_clauses.append(sql.SQL("{} = ANY(%s)").format(sql.Identifier(filter_key)))
+                    where_params.append([config_detail['id_map'][v] for v in value])
                 elif filter_type == 'date_range_start':
                     target_col_name = config_detail.get('target_column')
                     if not target_col_name:
@@ -188,7 +226,7 @@ def common_summary_dialog_builder(conn, table_name, result_areas):
                         continue
                     where_clauses.append(sql.SQL("{} <= %s").format(sql.Identifier(target_col_name)))
                     where_params.append(value)
-                elif 'options' in config_detail:  # List, DB lookup, Boolean
+                elif 'options' in config_detail:  # Boolean
                     actual_value = config_detail['id_map'][value]
                     if isinstance(actual_value, bool):
                         where_clauses.append(
@@ -199,6 +237,9 @@ def common_summary_dialog_builder(conn, table_name, result_areas):
 
             final_query = None
             final_params = []
+            source = dialog_name
+            if materialized and materialized.available and not live_checkbox.value:
+                source = materialized.name
 
             if dialog_is_function:
                 base_fn_sql = sql.SQL("SELECT * FROM {function_name}({params})").format(
@@ -215,7 +256,7 @@ def common_summary_dialog_builder(conn, table_name, result_areas):
                 else:
                     final_query = base_fn_sql
             else:  # It's a view
-                base_view_sql = sql.SQL("SELECT * FROM {view_name}").format(view_name=sql.Identifier(dialog_name))
+                base_view_sql = sql.SQL("SELECT * FROM {view_name}").format(view_name=sql.Identifier(source))
                 final_params.extend(where_params)
                 if where_clauses:
                     final_query = sql.SQL("{base} WHERE {conditions}").format(
@@ -224,16 +265,49 @@ def common_summary_dialog_builder(conn, table_name, result_areas):
                     )
                 else:
                     final_query = base_view_sql
+            return final_query, final_params, source
+
+        async def on_submit():
+            built = build_query()
+            if built is None:
+                return
+            final_query, final_params, source = built
+
+            # pools are named after their role
+            cache_key = result_cache.key(source, {k: inputs[k].value for k in all_config_keys_ordered}, pool.name)
+            if source != dialog_name:
+                ui.notify(materialized.describe(), color='warning' if materialized.dirty else 'info')
+            cached = result_cache.get(cache_key)
+            if cached is not None:
+                if cached.rows:
+                    display_result(dialog_name, cached.cols, cached.rows, result_areas, cached.arrays)
+                else:
+                    ui.notify("No results found.", color='info')
+                dialog.close()
+                return
 
             try:
-                with conn.cursor() as cur:
+                catalog = await catalog_cache.get(pool)
+                # functions don't record what they read, so any table change drops their results;
+                # a materialized copy only changes when it is refreshed
+                if source != dialog_name:
+                    tables = frozenset([source])
+                elif dialog_name in catalog.view_tables:
+                    tables = frozenset(catalog.view_tables[dialog_name])
+                else:
+                    tables = None
+                generation = result_cache.generation
+                async with pool.connection() as conn, conn.cursor(row_factory=dict_row) as cur:
                     # print(f"Executing generic query: {final_query.as_string(conn) if conn else str(final_query)}")
                     # print(f"With generic params: {final_params}")
-                    cur.execute(final_query, final_params)
+                    await cur.execute(final_query, final_params)
                     cols = [desc[0] for desc in cur.description]
-                    rows = cur.fetchall()
+                    arrays = array_columns(cur.description)
+                    rows = await cur.fetchall()
+                    size = result_size(cur.pgresult)
+                result_cache.put(cache_key, CachedResult(cols, rows, arrays, tables, size), generation)
                 if rows:
-                    display_result(dialog_name, cols, rows, result_areas)
+                    display_result(dialog_name, cols, rows, result_areas, arrays)
                 else:
                     ui.notify("No results found.", color='info')
                 dialog.close()
@@ -242,7 +316,13 @@ def common_summary_dialog_builder(conn, table_name, result_areas):
             except Exception as e:
                 ui.notify(f"An unexpected error occurred: {e}", color='negative')
 
-        ui.button('Fetch Summary', on_click=on_submit).classes('q-mt-md')
+        async def on_explain():
+            built = build_query()
+            if built is not None:
+                await explain_and_show(pool, built[0], built[1])
+
+        ui.button('Fetch Summary', on_click=with_loading(on_submit)).classes('q-mt-md')
+        ui.button('Explain', on_click=with_loading(on_explain)).props('outline')
         ui.button('Cancel', on_click=dialog.close).props('outline')
     return dialog
 
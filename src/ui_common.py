@@ -1,128 +1,419 @@
-from nicegui import ui
-from db import db_manager
+import asyncio
+from collections import deque
 
-def get_all_views(conn) -> list[str]:
+from nicegui import ui, background_tasks, json
+from db import db_manager, is_row_query
+from catalog import catalog_cache
+from explain import explain_and_show
+from pagination import KeysetPager
+from config import BROWSE_ROWS_PER_PAGE, ROW_PUSH_MAX_BYTES, ROW_PUSH_ACK_TIMEOUT, LOOKUP_SEARCH_DEBOUNCE
+
+
+def with_loading(handler):
+    """
+    Wrap an async click handler so the clicked button shows a spinner
+    (and ignores further clicks) until the handler's DB work is done.
     """
-    Return a list of all views in the database.
+    async def wrapper(e):
+        e.sender.props('loading')
+        try:
+            await handler()
+        finally:
+            e.sender.props(remove='loading')
+    return wrapper
+
+
+def lazy_dialog_button(text, build_dialog):
     """
-    sql = """
-          SELECT table_schema, table_name
-          FROM information_schema.views
-          WHERE table_schema NOT IN ('pg_catalog', 'information_schema')
-          ORDER BY table_schema, table_name;
-          """
-    with conn.cursor() as cur:
-        cur.execute(sql)
-        return [f"{name}" for schema, name in cur.fetchall()]
-
-
-def get_all_functions(conn) -> list[str]:
+    Button that awaits `build_dialog()` on its first click and then
+    keeps reopening that same dialog for the rest of the session.
     """
-    Return a list of all functions in the database.
+    dialog = None
+
+    async def open_dialog():
+        nonlocal dialog
+        if dialog is None:
+            dialog = await build_dialog()
+        dialog.open()
+
+    return ui.button(text, on_click=with_loading(open_dialog))
+
+
+def lazy_tab_panels(tabs, builders, value):
     """
-    sql = """
-        SELECT
-        n.nspname AS schema,
-        p.proname AS function_name
-        FROM pg_proc p
-        JOIN pg_namespace n ON n.oid = p.pronamespace
-        WHERE
-        n.nspname NOT IN ('pg_catalog', 'information_schema')
-        -- Keep only normal functions
-        AND p.prokind = 'f'
-        -- Exclude trigger functions
-        AND pg_catalog.pg_get_function_result(p.oid) != 'trigger'
-        ORDER BY function_name;
+    ui.tab_panels whose panel contents are built by `builders[name]()` the first
+    time that panel is shown, and kept afterwards.
     """
-    with conn.cursor() as cur:
-        cur.execute(sql)
-        return [f"{name}" for schema, name in cur.fetchall()]
+    panels = {}
 
+    def show(name):
+        builder = builders.pop(name, None)
+        if builder:
+            with panels[name]:
+                builder()
 
-def get_user_tables(conn):
-    try:
-        """Return all public tables the current user can SELECT."""
-        query = """
-                SELECT table_name
-                FROM information_schema.tables
-                WHERE table_schema = 'public'
-                  AND table_type = 'BASE TABLE'
-                  AND has_table_privilege(table_schema || '.' || table_name, 'SELECT')
-                ORDER BY table_name;
-                """
-        with conn.cursor() as cur:
-            cur.execute(query)
-            return [row[0] for row in cur.fetchall()]
-    except Exception as e:
-        ui.notify(f"Failed to populate entities", color='negative')
-        return None
+    with ui.tab_panels(tabs, value=value, on_change=lambda e: show(e.value)) as tab_panels:
+        for name in builders:
+            panels[name] = ui.tab_panel(name)
+    show(value)
+    return tab_panels
 
 
-def check_user_privileges(conn, table_name):
+def search_select(label, search, debounce=LOOKUP_SEARCH_DEBOUNCE, multiple=False):
     """
-    Проверяет привилегии текущего пользователя для таблицы.
-    Возвращает словарь с ключами 'INSERT', 'UPDATE', 'DELETE' и булевыми значениями.
+    ui.select whose options are not loaded up front: once typing pauses for `debounce`
+    seconds, `await search(text)` returns the {value: label} options to offer.
+    Cleared input offers only the current choices, without searching.
+    The value stays None (an empty list if `multiple`) until an option is picked.
     """
-    privileges = {}
-    operations = ['INSERT', 'UPDATE', 'DELETE']
+    select = ui.select({}, label=label, with_input=True, clearable=True, multiple=multiple,
+                       value=[] if multiple else None)
+    if multiple:
+        select.props('use-chips')
+    pending = None
 
-    try:
-        with conn.cursor() as cur:
-            for operation in operations:
-                query = f"""
-                SELECT has_table_privilege(current_user, 'public.{table_name}', '{operation}')
-                """
-                cur.execute(query)
-                result = cur.fetchone()[0]
-                privileges[operation] = result
-        return privileges
-    except Exception as e:
-        ui.notify(f"Ошибка проверки привилегий: {str(e)}", color='negative')
-        return {op: False for op in operations}
+    async def run_search(text):
+        options = {}
+        if text.strip():
+            await asyncio.sleep(debounce)
+            try:
+                options = await search(text)
+            except Exception as e:
+                ui.notify(f"Search failed: {e}", color='negative')
+                return
+        # keep the current choices selectable
+        chosen = select.value if multiple else [select.value]
+        for value in chosen or []:
+            if value is not None:
+                options.setdefault(value, select.options.get(value, value))
+        select.set_options(options)
+
+    def on_input(e):
+        nonlocal pending
+        if pending is not None:
+            pending.cancel()
+        pending = background_tasks.create(run_search(e.args or ''), name='lookup search')
+
+    select.on('input-value', on_input)
+    return select
+
+
+def columns_definition(cols, sortable=False):
+    return [{'name': c, 'label': c.replace('_', ' ').title(), 'field': c, 'sortable': sortable} for c in cols]
+
+
+def prepare_rows(cols, data, arrays):
+    """
+    Turn fetched rows into the list of dicts ui.table expects, with the values of the `arrays`
+    columns (see db.array_columns) joined into strings.
+
+    Rows fetched through psycopg.rows.dict_row are used as they are and formatted in place,
+    one pass per array column; values already joined are left as they are, so rows shown again
+    (from the result cache) come out the same. Tuple rows are zipped with `cols`.
+    """
+    if data and not isinstance(data[0], dict):
+        data = [dict(zip(cols, row)) for row in data]
+    for c in arrays:
+        for row in data:
+            value = row[c]
+            if value.__class__ is list:
+                try:
+                    row[c] = ', '.join(value)
+                except TypeError:  # not an array of text
+                    row[c] = ', '.join(map(str, value))
+    return data
+
+
+def format_size(num_bytes):
+    if num_bytes < 1024:
+        return f"{num_bytes} B"
+    if num_bytes < 1024 ** 2:
+        return f"{num_bytes / 1024:.1f} KB"
+    return f"{num_bytes / 1024 ** 2:.1f} MB"
+
+
+def chunk_rows(rows, max_bytes):
+    """
+    Split rows into consecutive (rows, JSON array) chunks whose JSON stays within
+    `max_bytes`; a row larger than that gets a chunk of its own.
+    """
+    chunks = []
+    start, encoded, size = 0, [], 2
+    for i, row in enumerate(rows):
+        row_json = json.dumps(row)
+        if encoded and size + len(row_json) + 1 > max_bytes:
+            chunks.append((rows[start:i], '[' + ','.join(encoded) + ']'))
+            start, encoded, size = i, [], 2
+        encoded.append(row_json)
+        size += len(row_json) + 1
+    if encoded:
+        chunks.append((rows[start:], '[' + ','.join(encoded) + ']'))
+    return chunks
+
+
+class ResultTable(ui.table):
+    """
+    Result area of a tab: a table plus a footer that reports how much a
+    streamed result (see db.QueryStream) has fetched and pages in more rows.
+
+    Large results are not sent in one websocket message: the first ROW_PUSH_MAX_BYTES
+    of rows go out with the table itself and the rest are appended on the client in
+    messages of the same size, each sent once the browser acknowledged the previous one.
+    The table scrolls virtually, so only the visible rows are rendered.
+
+    browse() switches the table to server-side pagination: Quasar asks for each
+    page and sort through the `request` event and pagination.KeysetPager serves it.
+    """
+    def __init__(self):
+        super().__init__(columns=[], rows=[])
+        self.classes('full-width').style('max-height: 70vh')
+        self.props('virtual-scroll')
+        self.stream = None
+        self.pager = None
+        # (cols, data) behind the rows on screen, when they came from show_rows()
+        self._source = None
+        # rows waiting to be pushed to the client, and what has been sent so far
+        self._pending = deque()
+        self._push_task = None
+        self._rows_total = 0
+        self._messages = 0
+        self._largest = 0
+        self.on('request', self._handle_request)
+        self.push_stats = ui.label('').classes('text-caption text-grey')
+        self.push_stats.set_visibility(False)
+        with ui.row().classes('items-center q-gutter-sm') as self.stream_footer:
+            self.stream_stats = ui.label('')
+            self.more_button = ui.button('Fetch more', on_click=with_loading(self.fetch_more)).props('flat')
+        self.stream_footer.set_visibility(False)
+
+    def show_rows(self, cols, data, arrays):
+        if not self.stream and not self.pager and self._source == (cols, data):
+            # the same result is already on screen
+            return
+        self._release_stream()
+        self._client_side()
+        self.columns = columns_definition(cols)
+        self._set_rows(prepare_rows(cols, data, arrays))
+        self._source = (cols, data)
 
+    async def show_stream(self, stream):
+        await self.close_stream()
+        self.stream = stream
+        rows = await stream.fetch_next()
+        if not rows:
+            ui.notify('No data', color='warning')
+            return
+        self._client_side()
+        self.columns = columns_definition(stream.columns)
+        self._set_rows(prepare_rows(stream.columns, rows, stream.arrays))
+        self._update_stream_footer()
 
-def display_result(entity, cols, data, areas):
+    async def fetch_more(self):
+        if not self.stream:
+            return
+        try:
+            rows = await self.stream.fetch_next()
+        except Exception as e:
+            ui.notify(f"Error fetching rows: {e}", color='negative')
+            rows = []
+        self._append_rows(prepare_rows(self.stream.columns, rows, self.stream.arrays))
+        self._update_stream_footer()
+
+    async def close_stream(self):
+        if self.stream:
+            await self.stream.close()
+            self.stream = None
+        self.stream_footer.set_visibility(False)
+
+    async def browse(self, pager):
+        await self.close_stream()
+        self._cancel_push()
+        self.pager = pager
+        await pager.count()
+        self.props(remove='hide-pagination')
+        self._props['rows-per-page-options'] = [25, 50, 100]
+        await self._load_page({
+            'page': 1,
+            'rowsPerPage': BROWSE_ROWS_PER_PAGE,
+            'sortBy': None,
+            'descending': False,
+        })
+
+    async def _handle_request(self, e):
+        if self.pager:
+            await self._load_page(e.args['pagination'])
+
+    async def _load_page(self, pagination):
+        pager = self.pager
+        try:
+            cols, data = await pager.fetch_page(
+                pagination['page'], pagination['rowsPerPage'], pagination.get('sortBy'), pagination.get('descending')
+            )
+        except Exception as e:
+            ui.notify(f"Error fetching rows: {e}", color='negative')
+            return
+        # a newer result replaced the pager while this page was loading
+        if pager is not self.pager:
+            return
+        self.columns = columns_definition(cols, sortable=True)
+        self.rows = prepare_rows(cols, data, pager.arrays)
+        self.pagination = {**pagination, 'rowsNumber': pager.total}
+        self.push_stats.set_visibility(False)
+
+    def _set_rows(self, rows):
+        """Replace the rows: the first chunk goes out with the table update, the rest is pushed after it."""
+        self._cancel_push()
+        chunks = chunk_rows(rows, ROW_PUSH_MAX_BYTES)
+        first_rows, first_payload = chunks.pop(0) if chunks else ([], '')
+        self.rows = first_rows
+        self._rows_total = len(first_rows)
+        self._messages = 1
+        self._largest = len(first_payload)
+        self._queue_chunks(chunks)
+
+    def _append_rows(self, rows):
+        """Add rows below the current ones without re-sending those already on the client."""
+        self._queue_chunks(chunk_rows(rows, ROW_PUSH_MAX_BYTES))
+
+    def _queue_chunks(self, chunks):
+        self._pending.extend(chunks)
+        self._rows_total += sum(len(rows) for rows, _ in chunks)
+        if self._pending and self._push_task is None:
+            self._push_task = background_tasks.create(self._push_pending(), name='push result rows')
+        self._report_push()
+
+    async def _push_pending(self):
+        try:
+            while self._pending and not self.is_deleted:
+                rows, payload = self._pending.popleft()
+                start = len(self.rows)
+                # keep the server copy complete without re-sending it; the client gets just this chunk
+                with self._props.suspend_updates():
+                    self.rows.extend(rows)
+                # skipped if a full table update has delivered these rows already
+                code = (f'const rows = mounted_app.elements[{self.id}]?.props.rows;'
+                        f'if (rows && rows.length === {start}) rows.push(...{payload});')
+                try:
+                    await self.client.run_javascript(code, timeout=ROW_PUSH_ACK_TIMEOUT)
+                except TimeoutError:
+                    pass
+                self._messages += 1
+                self._largest = max(self._largest, len(payload))
+                self._report_push()
+        finally:
+            if self._push_task is asyncio.current_task():
+                self._push_task = None
+
+    def _report_push(self):
+        self.push_stats.text = (
+            f"Sent {len(self.rows)} of {self._rows_total} rows in {self._messages} messages, "
+            f"largest {format_size(self._largest)} (cap {format_size(ROW_PUSH_MAX_BYTES)})"
+        )
+        self.push_stats.set_visibility(self.pager is None and self._messages > 1)
+
+    def _cancel_push(self):
+        self._pending.clear()
+        if self._push_task is not None:
+            self._push_task.cancel()
+            self._push_task = None
+
+    def _client_side(self):
+        self._source = None
+        self.pager = None
+        self.props('hide-pagination')
+        self.pagination = {'rowsPerPage': 0}
+
+    def _update_stream_footer(self):
+        stream = self.stream
+        self.stream_stats.text = (
+            f"Fetched {stream.last_rows} rows ({format_size(stream.last_bytes)}), "
+            f"{stream.rows_fetched} rows ({format_size(stream.bytes_fetched)}) in total"
+            + ('' if stream.exhausted else f", more available (up to {stream.row_cap} per fetch)")
+        )
+        self.more_button.set_visibility(not stream.exhausted)
+        self.stream_footer.set_visibility(True)
+
+    def _release_stream(self):
+        if self.stream:
+            background_tasks.create(self.stream.close(), name='close result stream')
+            self.stream = None
+        self.stream_footer.set_visibility(False)
+
+    def _handle_delete(self):
+        self._cancel_push()
+        if self.stream:
+            background_tasks.create(self.stream.close(), name='close result stream')
+            self.stream = None
+        super()._handle_delete()
+
+
+def display_result(entity, cols, data, areas, arrays):
     if not data:
         ui.notify('No data', color='warning')
         return
 
-    cols_def = [{'name': c, 'label': c.replace('_', ' ').title(), 'field': c} for c in cols]
+    target_display_element = areas.get(entity)
+
+    if target_display_element:
+        target_display_element.show_rows(cols, data, arrays)
+    else:
+        ui.notify(f"Error: UI element for '{entity}' not found in result_areas.", color='negative')
 
-    prepared_rows = []
-    for row_tuple in data:
-        row_dict = {}
-        for i, col_name in enumerate(cols):
-            cell_value = row_tuple[i]
-            if isinstance(cell_value, list):
-                row_dict[col_name] = ', '.join(map(str, cell_value))
-            else:
-                row_dict[col_name] = cell_value
-        prepared_rows.append(row_dict)
 
+async def display_stream(entity, stream, areas):
     target_display_element = areas.get(entity)
 
     if target_display_element:
-        target_display_element.columns = cols_def
-        target_display_element.rows = prepared_rows
-        target_display_element.update()
+        await target_display_element.show_stream(stream)
     else:
+        await stream.close()
         ui.notify(f"Error: UI element for '{entity}' not found in result_areas.", color='negative')
 
 
-def show_all(entity, areas):
-    cols, data = db_manager.execute_query(f"SELECT * FROM {entity} LIMIT 100;")
-    display_result(entity, cols, data, areas)
+async def show_all(role, entity, areas):
+    pool = db_manager.pool(role)
+    if not pool:
+        ui.notify('No DB connection', color='negative')
+        return
+    target_display_element = areas.get(entity)
+    if not target_display_element:
+        ui.notify(f"Error: UI element for '{entity}' not found in result_areas.", color='negative')
+        return
+    catalog = await catalog_cache.get(pool)
+    nullable_columns = {name for name, _, is_nullable in catalog.columns[entity] if is_nullable == 'YES'}
+    pager = KeysetPager(pool, entity, catalog.primary_keys[entity], nullable_columns)
+    try:
+        await target_display_element.browse(pager)
+    except Exception as e:
+        ui.notify(f"DB error: {e}", color='negative')
 
 
-def count_rows(entity, areas):
-    cols, data = db_manager.execute_query(f"SELECT COUNT(*) AS count FROM {entity};")
-    display_result(entity, cols, data, areas)
+async def count_rows(role, entity, areas):
+    cols, data, arrays = await db_manager.execute_query(f"SELECT COUNT(*) AS count FROM {entity};", role)
+    display_result(entity, cols, data, areas, arrays)
 
 
-def custom_query(entity, query_input, areas):
+async def custom_query(role, entity, query_input, areas):
     sql = query_input.value.strip()
     if not sql:
         ui.notify('Empty query', color='negative')
         return
-    cols, data = db_manager.execute_query(sql)
-    display_result(entity, cols, data, areas)
+    if is_row_query(sql):
+        stream = await db_manager.open_stream(sql, role)
+        if stream:
+            await display_stream(entity, stream, areas)
+        return
+    cols, data, arrays = await db_manager.execute_query(sql, role)
+    display_result(entity, cols, data, areas, arrays)
+
+
+async def explain_custom_query(role, query_input):
+    sql = query_input.value.strip()
+    if not sql:
+        ui.notify('Empty query', color='negative')
+        return
+    pool = db_manager.pool(role)
+    if not pool:
+        ui.notify('No DB connection', color='negative')
+        return
+    await explain_and_show(pool, sql)
@@ -2,12 +2,16 @@ from nicegui import ui
 
 
 def build_login(on_login) -> any:
-    def handle_login_click():
+    async def handle_login_click():
         if not username.value or not password.value:
             ui.notify('Пожалуйста, заполните все поля', color='orange')
             return
 
-        on_login(username.value, password.value, role_select.value)
+        login_button.props('loading')
+        try:
+            await on_login(username.value, password.value, role_select.value)
+        finally:
+            login_button.props(remove='loading')
 
     with ui.column().classes('w-full h-screen flex justify-center items-center') as login_page:
         with ui.card().classes('w-96 p-6'):
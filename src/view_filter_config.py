@@ -2,9 +2,13 @@
 # This dictionary maps a view/function name to its available filters.
 # The format for each filter is as follows:
 # 'filter_key': ('table_name', 'display_name_column', 'id_column') -> Fetches from DB
+# 'filter_key': ('table_name', 'display_name_column', 'id_column', 'search') -> Searches the DB as the user types,
+#                for lookups too large to load whole (see lookups.search_lookup)
 # 'filter_key': ['Option1', 'Option2'] -> A hardcoded list of options
 # 'filter_key': 'boolean' -> A True/False choice
 # 'filter_key': 'date' -> Indicates a date input is required
+# DB lookups (fetched or searched) and lists are multi-selects: a view filter becomes `col = ANY(%s)`,
+# and a function parameter ('p_...') receives an array, so the function must declare it as one.
 
 FILTER_CONFIG = {
     'v_product_types': {
@@ -14,7 +18,8 @@ FILTER_CONFIG = {
     'get_product_assembly_summary': {
         'p_start_date': 'date',
         'p_end_date': 'date',
-        'agg_level': [
+        # function parameters: the function only computes the requested level and scope
+        'p_agg_level': [
             'enterprise_total',
             'enterprise_by_category',
             'workshop_total',
@@ -22,9 +27,9 @@ FILTER_CONFIG = {
             'section_total',
             'section_by_category'
         ],
-        'workshop': ('workshops', 'name', 'name'),
-        'section': ('sections', 'name', 'name'),
-        'category': ('product_categories', 'name', 'name'),
+        'p_workshop': ('workshops', 'name', 'name'),
+        'p_section': ('sections', 'name', 'name'),
+        'p_category': ('product_categories', 'name', 'name'),
     },
     'v_staff_composition': {
         'worker_type_name': ('worker_types', 'name', 'name'),
@@ -38,7 +43,7 @@ FILTER_CONFIG = {
         'workshop_id': ('workshops', 'name', 'wsh_id'),
     },
     'v_product_assembly_history': {
-        'product_id': ('products', 'name', 'p_id'),
+        'product_id': ('products', 'name', 'p_id', 'search'),
     },
     'v_brigade_composition': {
         'workshop_id': ('workshops', 'name', 'wsh_id'),
@@ -54,11 +59,11 @@ FILTER_CONFIG = {
         'category_id': ('product_categories', 'name', 'c_id'),
     },
     'v_product_brigade_composition': {
-        'product_id': ('products', 'name', 'p_id'),
+        'product_id': ('products', 'name', 'p_id', 'search'),
         'brigade_id': ('brigade', 'name', 'b_id'),
     },
     'v_product_test_labs': {
-        'product_id': ('products', 'name', 'p_id'),
+        'product_id': ('products', 'name', 'p_id', 'search'),
         'lab_id': ('labs', 'name', 'l_id'),
     },
     'v_lab_tested_products': {
@@ -69,7 +74,7 @@ FILTER_CONFIG = {
     },
     'v_testers_activity': {
         'lab_id': ('labs', 'name', 'l_id'),
-        'tester_w_id': ('employees', 'full_name', 'w_id'),
+        'tester_w_id': ('employees', 'full_name', 'w_id', 'search'),
         'category_id': ('product_categories', 'name', 'c_id'),
         'start_date': 'date_range_start:test_date',
         'end_date': 'date_range_end:test_date',
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the application modules import each other as top-level modules, as when run from src/
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
@@ -0,0 +1,62 @@
+import json
+
+from catalog import CatalogCache
+from materialized import RefreshScheduler
+from result_cache import ResultCache, CachedResult
+
+VIEWS = {'v_ongoing_product_counts': 'mv_ongoing_product_counts'}
+
+
+def payload(tag: str, identity: str | None) -> str:
+    return json.dumps({'tag': tag, 'object': identity})
+
+
+def cached_result_cache() -> ResultCache:
+    cache = ResultCache()
+    cache.put(('mv_ongoing_product_counts', (), 'admin'),
+              CachedResult(['n'], [{'n': 1}], [], frozenset({'products'}), 10), cache.generation)
+    return cache
+
+
+def settled_scheduler() -> RefreshScheduler:
+    """A scheduler as after a refresh: dependencies loaded, nothing dirty."""
+    scheduler = RefreshScheduler(None, VIEWS)
+    for mv in scheduler.views.values():
+        mv.tables = {'products'}
+        mv.dirty = False
+    scheduler._dependencies_loaded = True
+    return scheduler
+
+
+REFRESH = payload('REFRESH MATERIALIZED VIEW', 'public.mv_ongoing_product_counts')
+
+
+def test_refresh_notification_marks_nothing_dirty():
+    scheduler = settled_scheduler()
+    scheduler.on_ddl_change(REFRESH)
+    assert not any(mv.dirty for mv in scheduler.views.values())
+    assert scheduler._dependencies_loaded
+    assert not scheduler._wake.is_set()
+
+
+def test_refresh_notification_keeps_caches():
+    results = cached_result_cache()
+    results.on_ddl_change(REFRESH)
+    assert results.size == 10 and results.generation == 0
+
+    catalogs = CatalogCache()
+    catalogs._catalogs['admin'] = object()
+    catalogs.on_ddl_change(REFRESH)
+    assert 'admin' in catalogs._catalogs
+
+
+def test_definition_change_still_invalidates():
+    scheduler = settled_scheduler()
+    scheduler.on_ddl_change(payload('ALTER TABLE', 'public.products'))
+    assert all(mv.dirty for mv in scheduler.views.values())
+
+    results = cached_result_cache()
+    results.on_ddl_change(payload('CREATE INDEX', 'public.products_name_idx'))
+    assert results.size == 10
+    results.on_ddl_change(payload('ALTER TABLE', 'public.products'))
+    assert results.size == 0